@@ -1,16 +1,42 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.routes.contacts import router_contacts as contact_router
 from src.routes.auth import router as auth_router
+from src.routes.avatars import router as avatar_router
+from src.routes.tags import router_tags as tag_router
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from settings import limiter,origins
+from src.jobs.assign_owner import count_unowned
+from src.services.autocomplete import contact_index
+from src.services.change_feed import change_broker
+from src.middleware.profiling import ProfilingMiddleware
+from src.middleware.tracing import TracingMiddleware
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.admission import AdmissionMiddleware
+from src.middleware.deadline import DeadlineMiddleware
 import uvicorn
 
+logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    contact_index.start(change_broker)
+    unowned = count_unowned()
+    if unowned:
+        logger.warning("%d contacts have no owner; assign them with python -m src.jobs.assign_owner USER_ID", unowned)
+    yield
 
+
+app = FastAPI(lifespan=lifespan)
+
+# Innermost, so that shed requests still get CORS headers and are traced.
+app.add_middleware(AdmissionMiddleware)
+# Outside admission control, so time spent waiting for a slot counts against the deadline.
+app.add_middleware(DeadlineMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -19,11 +45,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TracingMiddleware)
+
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 app.include_router(auth_router, prefix='/api')
 app.include_router(contact_router, prefix='/api')
+app.include_router(avatar_router, prefix='/api')
+app.include_router(tag_router, prefix='/api')
 
 
 if __name__ == '__main__':
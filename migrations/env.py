@@ -4,6 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
+from settings import MIGRATION_LOCK_TIMEOUT
 from src.configuration.models import Base
 
 # this is the Alembic Config object, which provides
@@ -65,8 +66,15 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Fail fast instead of queuing every write behind a lock the migration waits for;
+            # see migrations/online.py for the helpers large tables need.
+            connection.exec_driver_sql(f"SET lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'")
+            connection.commit()
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            # One transaction per revision, so a revision can leave it for CONCURRENTLY or batched backfills.
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
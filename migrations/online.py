@@ -0,0 +1,195 @@
+"""Helpers for schema changes that must not block writes on large tables.
+
+Conventions for revisions that touch a large table:
+
+* Add columns as nullable and without a volatile default (``add_column``), so the
+  change only updates the catalog. Fill them with ``backfill`` and tighten them with
+  ``set_not_null`` in a later revision, once the application writes the column.
+* Build and drop indexes with ``create_index`` and ``drop_index``, which run
+  ``CONCURRENTLY`` outside the migration transaction on Postgres.
+* Rename or retype a column in expand/contract steps, never in place: add the new
+  column, deploy code that writes both, backfill, deploy code that reads the new
+  one, and only then drop the old column in a separate revision.
+
+``env.py`` runs every revision in its own transaction and sets a short
+``lock_timeout``, so a statement that cannot get its lock fails fast instead of
+queuing every other write behind it; rerun the migration when that happens.
+"""
+import logging
+import time
+from typing import Callable, Optional, Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from settings import MIGRATION_BATCH_SIZE, MIGRATION_BATCH_PAUSE
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def add_column(table: str, column: sa.Column) -> None:
+    """
+    Add a column without rewriting the table.
+
+    Args:
+        table (str): The table name.
+        column (sa.Column): The new column.
+
+    Raises:
+        ValueError: If the column is ``NOT NULL`` without a server default, which needs a table rewrite
+            or fails on a non-empty table.
+    """
+    if not column.nullable and column.server_default is None:
+        raise ValueError(f"add {table}.{column.name} as nullable, backfill it, then use set_not_null")
+    op.add_column(table, column)
+
+
+def create_index(name: str, table: str, columns: Sequence[str], unique: bool = False) -> None:
+    """
+    Build an index without blocking writes.
+
+    On Postgres the index is built with ``CREATE INDEX CONCURRENTLY`` in autocommit
+    mode. A concurrent build that failed earlier leaves an invalid index behind,
+    which is dropped first so the migration can simply be rerun.
+
+    Args:
+        name (str): The index name.
+        table (str): The table name.
+        columns (Sequence[str]): The indexed columns.
+        unique (bool): Whether the index is unique.
+    """
+    if not _is_postgres():
+        op.create_index(name, table, list(columns), unique=unique)
+        return
+    with op.get_context().autocommit_block():
+        invalid = op.get_bind().execute(
+            sa.text("SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                    "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"),
+            {"name": name},
+        ).first()
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, list(columns), unique=unique, postgresql_concurrently=True,
+                        if_not_exists=True)
+
+
+def drop_index(name: str, table: str) -> None:
+    """
+    Drop an index without blocking reads and writes.
+
+    Args:
+        name (str): The index name.
+        table (str): The table name.
+    """
+    if not _is_postgres():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def set_not_null(table: str, column: str) -> None:
+    """
+    Make a backfilled column ``NOT NULL`` without a long exclusive lock.
+
+    On Postgres a ``NOT VALID`` check constraint is added and validated first, which
+    only blocks schema changes while it scans; ``SET NOT NULL`` then relies on the
+    constraint instead of scanning the table again.
+
+    Args:
+        table (str): The table name.
+        column (str): The column name.
+    """
+    if not _is_postgres():
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, nullable=False)
+        return
+    constraint = f"ck_{table}_{column}_not_null"
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK ({column} IS NOT NULL) NOT VALID")
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+    op.alter_column(table, column, nullable=False)
+    op.drop_constraint(constraint, table)
+
+
+def _load_checkpoint(name: str) -> Optional[str]:
+    return op.get_bind().execute(sa.text("SELECT value FROM job_checkpoints WHERE name = :name"),
+                                 {"name": name}).scalar()
+
+
+def _save_checkpoint(name: str, value: Optional[str]) -> None:
+    connection = op.get_bind()
+    connection.execute(sa.text("DELETE FROM job_checkpoints WHERE name = :name"), {"name": name})
+    if value is not None:
+        connection.execute(sa.text("INSERT INTO job_checkpoints (name, value, updated_at) "
+                                   "VALUES (:name, :value, CURRENT_TIMESTAMP)"), {"name": name, "value": value})
+
+
+def backfill(table: str, values: Union[dict, Callable[[sa.Row], dict]], *, columns: Sequence[str] = (),
+             where: Optional[str] = None, key: str = "id", batch_size: int = MIGRATION_BATCH_SIZE,
+             pause: float = MIGRATION_BATCH_PAUSE, checkpoint: Optional[str] = None) -> int:
+    """
+    Update every row of a table in short batches, each committed on its own.
+
+    Rows are walked in ``key`` order. ``values`` is either a mapping of column names
+    to SQL expressions, applied by one ``UPDATE`` per key range, or a function that
+    receives a row with ``key`` and ``columns`` and returns the new values for it.
+    Sleeping ``pause`` seconds between batches leaves room for replication and
+    regular traffic. With ``checkpoint`` set, the last key done is saved in
+    ``job_checkpoints`` after every batch, so a rerun resumes where the previous
+    one stopped; the checkpoint is removed once the table is done.
+
+    Args:
+        table (str): The table name.
+        values (dict | Callable): The new values, as SQL expressions or computed per row.
+        columns (Sequence[str]): The columns the function reads.
+        where (Optional[str]): An SQL condition limiting the rows to update.
+        key (str): A unique, indexed column to walk the table by.
+        batch_size (int): The number of rows per batch.
+        pause (float): The number of seconds to sleep between batches.
+        checkpoint (Optional[str]): The checkpoint name, usually ``migration:<revision>``.
+
+    Returns:
+        int: The number of rows visited.
+    """
+    visited = 0
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last = _load_checkpoint(checkpoint) if checkpoint else None
+        last = int(last) if last is not None else None
+        while True:
+            conditions = [f"({where})"] if where else []
+            if last is not None:
+                conditions.append(f"{key} > :last")
+            rows = connection.execute(
+                sa.text(f"SELECT {', '.join([key, *columns])} FROM {table} "
+                        f"WHERE {' AND '.join(conditions or ['1 = 1'])} ORDER BY {key} LIMIT :limit"),
+                {"last": last, "limit": batch_size},
+            ).all()
+            if not rows:
+                break
+            high = rows[-1][0]
+            if callable(values):
+                updates = [dict(values(row), _key=row[0]) for row in rows]
+                assignments = ", ".join(f"{name} = :{name}" for name in updates[0] if name != "_key")
+                connection.execute(sa.text(f"UPDATE {table} SET {assignments} WHERE {key} = :_key"), updates)
+            else:
+                assignments = ", ".join(f"{name} = {expression}" for name, expression in values.items())
+                connection.execute(
+                    sa.text(f"UPDATE {table} SET {assignments} WHERE {' AND '.join([*conditions, f'{key} <= :high'])}"),
+                    {"last": last, "high": high},
+                )
+            if checkpoint:
+                _save_checkpoint(checkpoint, str(high))
+            visited += len(rows)
+            last = high
+            logger.info("backfill %s: %d rows, up to %s = %s", table, visited, key, high)
+            if pause:
+                time.sleep(pause)
+        if checkpoint:
+            _save_checkpoint(checkpoint, None)
+    return visited
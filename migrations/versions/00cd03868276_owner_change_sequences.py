@@ -0,0 +1,41 @@
+"""Number contact changes per owner
+
+Revision ID: 00cd03868276
+Revises: a6d023e2ed46
+Create Date: 2026-10-19 23:58:41.274108
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '00cd03868276'
+down_revision: Union[str, None] = 'a6d023e2ed46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_sequences',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Every owner continues from their highest change so far; contacts without an owner count as owner 0.
+    op.execute(
+        "INSERT INTO contact_sequences (user_id, value) "
+        "SELECT owner, MAX(change_seq) FROM ("
+        "SELECT COALESCE(user_id, 0) AS owner, change_seq FROM contacts "
+        "UNION ALL SELECT COALESCE(user_id, 0) AS owner, change_seq FROM contact_tombstones"
+        ") AS changes GROUP BY owner"
+    )
+    # The global counter now only hands out contact and tag IDs.
+    op.execute("UPDATE change_counters SET name = 'ids' WHERE name = 'contacts'")
+
+
+def downgrade() -> None:
+    op.execute("UPDATE change_counters SET name = 'contacts' WHERE name = 'ids'")
+    op.drop_table('contact_sequences')
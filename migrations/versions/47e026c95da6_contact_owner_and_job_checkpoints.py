@@ -0,0 +1,37 @@
+"""Add contact owner and job checkpoints
+
+Revision ID: 47e026c95da6
+Revises: 49411293b560
+Create Date: 2026-10-19 11:40:02.713590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = '47e026c95da6'
+down_revision: Union[str, None] = '49411293b560'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online.add_column('contacts', sa.Column('user_id', sa.Integer(), nullable=True))
+    online.create_index('ix_contacts_user_id', 'contacts', ['user_id'])
+    op.create_table('job_checkpoints',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.String(length=255), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_checkpoints')
+    online.drop_index('ix_contacts_user_id', 'contacts')
+    op.drop_column('contacts', 'user_id')
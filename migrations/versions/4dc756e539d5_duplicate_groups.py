@@ -0,0 +1,42 @@
+"""Store duplicate contact groups
+
+Revision ID: 4dc756e539d5
+Revises: 5bc35c93c222
+Create Date: 2026-10-20 01:12:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4dc756e539d5'
+down_revision: Union[str, None] = '5bc35c93c222'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('duplicate_scans',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=True),
+    sa.Column('requested_seq', sa.BigInteger(), nullable=True),
+    sa.Column('scanned_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('duplicate_groups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('contact_ids', sa.JSON(), nullable=False),
+    sa.Column('keys', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_duplicate_groups_user_id', 'duplicate_groups', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_duplicate_groups_user_id', table_name='duplicate_groups')
+    op.drop_table('duplicate_groups')
+    op.drop_table('duplicate_scans')
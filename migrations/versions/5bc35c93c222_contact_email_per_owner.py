@@ -0,0 +1,32 @@
+"""Make contact emails unique per owner
+
+Revision ID: 5bc35c93c222
+Revises: 00cd03868276
+Create Date: 2026-10-20 00:31:09.518274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5bc35c93c222'
+down_revision: Union[str, None] = '00cd03868276'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Emails were unique across all owners, so the new index cannot find duplicates.
+    online.create_index('ix_contacts_user_email', 'contacts', ['user_id', 'email'], unique=True)
+    online.drop_index('ix_contacts_email', 'contacts')
+
+
+def downgrade() -> None:
+    # Fails while two owners keep a contact with the same email.
+    online.create_index('ix_contacts_email', 'contacts', ['email'], unique=True)
+    online.drop_index('ix_contacts_user_email', 'contacts')
@@ -0,0 +1,34 @@
+"""Add contact statistics
+
+Revision ID: a6d023e2ed46
+Revises: f59749d334b0
+Create Date: 2026-10-19 23:48:12.406518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d023e2ed46'
+down_revision: Union[str, None] = 'f59749d334b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'kind', 'key')
+    )
+    op.create_index('ix_contact_stats_user_kind_count', 'contact_stats', ['user_id', 'kind', 'count'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_stats_user_kind_count', table_name='contact_stats')
+    op.drop_table('contact_stats')
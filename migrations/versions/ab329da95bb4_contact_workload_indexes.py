@@ -0,0 +1,49 @@
+"""Replace single-column contact indexes with owner-scoped composites
+
+Revision ID: ab329da95bb4
+Revises: 5a6e2e0f45a1
+Create Date: 2026-10-19 16:40:03.512907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ab329da95bb4'
+down_revision: Union[str, None] = '5a6e2e0f45a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes no query uses on their own: the primary key already covers id, and every
+# lookup is scoped to one owner, which the composites below lead with.
+SINGLE_COLUMN_INDEXES = ['id', 'first_name', 'last_name', 'phone_number', 'phone_e164', 'user_id']
+
+
+def upgrade() -> None:
+    online.add_column('contacts', sa.Column('birth_md', sa.SmallInteger(), nullable=True))
+    if op.get_bind().dialect.name == 'sqlite':
+        birth_md = "CAST(strftime('%m', birth_date) AS INTEGER) * 100 + CAST(strftime('%d', birth_date) AS INTEGER)"
+    else:
+        birth_md = "EXTRACT(MONTH FROM birth_date) * 100 + EXTRACT(DAY FROM birth_date)"
+    online.backfill('contacts', {'birth_md': birth_md}, where='birth_date IS NOT NULL',
+                    checkpoint=f'migration:{revision}')
+    online.create_index('ix_contacts_user_name', 'contacts', ['user_id', 'last_name', 'first_name', 'id'])
+    online.create_index('ix_contacts_user_phone_e164', 'contacts', ['user_id', 'phone_e164'])
+    online.create_index('ix_contacts_user_birth_md', 'contacts', ['user_id', 'birth_md'])
+    # The old indexes go last, so lookups never run without one while the new ones build.
+    for column in SINGLE_COLUMN_INDEXES:
+        online.drop_index(f'ix_contacts_{column}', 'contacts')
+
+
+def downgrade() -> None:
+    for column in SINGLE_COLUMN_INDEXES:
+        online.create_index(f'ix_contacts_{column}', 'contacts', [column])
+    online.drop_index('ix_contacts_user_birth_md', 'contacts')
+    online.drop_index('ix_contacts_user_phone_e164', 'contacts')
+    online.drop_index('ix_contacts_user_name', 'contacts')
+    op.drop_column('contacts', 'birth_md')
@@ -0,0 +1,30 @@
+"""Add the user shard directory
+
+Revision ID: c28d74ab52a9
+Revises: ab329da95bb4
+Create Date: 2026-10-19 19:52:18.604113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c28d74ab52a9'
+down_revision: Union[str, None] = 'ab329da95bb4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_shards',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_shards')
@@ -0,0 +1,30 @@
+"""Store the content hash of user avatars
+
+Revision ID: d8df7ecb5323
+Revises: c28d74ab52a9
+Create Date: 2026-10-19 21:08:41.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8df7ecb5323'
+down_revision: Union[str, None] = 'c28d74ab52a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online.add_column('users', sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+    online.create_index('ix_users_avatar_hash', 'users', ['avatar_hash'])
+
+
+def downgrade() -> None:
+    online.drop_index('ix_users_avatar_hash', 'users')
+    op.drop_column('users', 'avatar_hash')
@@ -0,0 +1,40 @@
+"""Add contact tags
+
+Revision ID: f59749d334b0
+Revises: d8df7ecb5323
+Create Date: 2026-10-19 22:31:07.884120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f59749d334b0'
+down_revision: Union[str, None] = 'd8df7ecb5323'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_name')
+    )
+    op.create_table('contact_tags',
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('contact_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('tag_id', 'contact_id')
+    )
+    op.create_index('ix_contact_tags_contact_tag', 'contact_tags', ['contact_id', 'tag_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_tags_contact_tag', table_name='contact_tags')
+    op.drop_table('contact_tags')
+    op.drop_table('tags')
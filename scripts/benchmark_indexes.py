@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import create_engine, extract, select, text
+from sqlalchemy.orm import Session
+
+from scripts.generate_data import generate
+from src.configuration import models
+from src.configuration.models import Base
+from src.repository import contact_crud
+
+# The contact indexes before the workload audit: one per column, none scoped to the owner.
+LEGACY_INDEXES = {
+    "ix_contacts_id": ["id"],
+    "ix_contacts_first_name": ["first_name"],
+    "ix_contacts_last_name": ["last_name"],
+    "ix_contacts_phone_number": ["phone_number"],
+    "ix_contacts_phone_e164": ["phone_e164"],
+    "ix_contacts_user_id": ["user_id"],
+    "ix_contacts_user_change_seq": ["user_id", "change_seq"],
+}
+
+READS = {
+    "get_contacts": lambda db, owner: contact_crud.get_contacts(db, user_id=owner),
+    "get_contacts_by_phone": lambda db, owner: contact_crud.get_contacts_by_phone(db, "+380671234567",
+                                                                                 user_id=owner),
+    "search_contacts": lambda db, owner: contact_crud.search_contacts(db, "olen", user_id=owner),
+    "get_upcoming_birthdays": lambda db, owner: contact_crud.get_upcoming_birthdays(db, 7, user_id=owner,
+                                                                                     today=date(2024, 6, 1)),
+    "get_changes": lambda db, owner: contact_crud.get_changes(db, since=0, limit=100, user_id=owner),
+}
+
+
+def _create_schema(engine, legacy: bool):
+    Base.metadata.create_all(engine)
+    if not legacy:
+        return
+    with engine.begin() as connection:
+        for index in models.Contact.__table__.indexes:
+            if not index.unique:
+                connection.execute(text(f"DROP INDEX {index.name}"))
+        for name, columns in LEGACY_INDEXES.items():
+            connection.execute(text(f"CREATE INDEX {name} ON contacts ({', '.join(columns)})"))
+
+
+def _legacy_upcoming_birthdays(db, owner):
+    """The birthday query as it ran before ``birth_md`` was stored."""
+    birth_date = models.Contact.birth_date
+    month_day = extract("month", birth_date) * 100 + extract("day", birth_date)
+    month_days = contact_crud.upcoming_month_days(date(2024, 6, 1), 7)
+    return db.execute(select(models.Contact).where(models.Contact.user_id == owner)
+                      .where(month_day.in_(month_days))).scalars().all()
+
+
+def run(path: Path, legacy: bool, users: int, contacts: int, repeat: int) -> dict:
+    """
+    Fill one database and time the writes and the reads.
+
+    Args:
+        path (Path): The SQLite file to create.
+        legacy (bool): Whether to use the index set from before the audit.
+        users (int): The number of users to add.
+        contacts (int): The number of contacts to add.
+        repeat (int): The number of times every read is timed.
+
+    Returns:
+        dict: Insert throughput in rows per second and the median latency of every read in milliseconds.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    _create_schema(engine, legacy)
+    started = time.perf_counter()
+    generate(engine, users, contacts, batch_size=2_000)
+    results = {"inserts/s": contacts / (time.perf_counter() - started)}
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    reads = dict(READS, get_upcoming_birthdays=_legacy_upcoming_birthdays) if legacy else READS
+    with Session(engine) as db:
+        owner = db.scalar(select(models.Contact.user_id).group_by(models.Contact.user_id)
+                          .order_by(text("count(*) DESC")).limit(1))
+        for name, query in reads.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = query(db, owner)
+                if asyncio.iscoroutine(result):
+                    asyncio.run(result)
+                timings.append((time.perf_counter() - started) * 1000)
+                db.expunge_all()
+            results[f"{name} ms"] = statistics.median(timings)
+    engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the contact index set before and after the audit.")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--contacts", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        before = run(Path(directory) / "before.db", True, args.users, args.contacts, args.repeat)
+        after = run(Path(directory) / "after.db", False, args.users, args.contacts, args.repeat)
+    print(f"{'':<28}{'before':>12}{'after':>12}")
+    for key in before:
+        print(f"{key:<28}{before[key]:>12.2f}{after[key]:>12.2f}")
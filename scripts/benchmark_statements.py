@@ -0,0 +1,107 @@
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from scripts.generate_data import generate
+from src.configuration import models
+from src.configuration.database import engine_options
+from src.configuration.models import Base
+from src.repository import contact_crud
+from src.repository.users import UserService
+
+
+def _legacy_user_by_email(db, email):
+    """The user lookup as it ran before the statement was built once."""
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _legacy_find_contact(db, contact_id, user_id):
+    """The contact lookup as it ran before the statement was built once."""
+    statement = select(models.Contact).filter(models.Contact.id == contact_id)
+    return db.execute(statement.filter(models.Contact.user_id == user_id)).scalar_one_or_none()
+
+
+# Each lookup as it ran before and as it runs now, called with a session and one key.
+LOOKUPS = {
+    "user by email": (_legacy_user_by_email, lambda db, email: UserService.get_user_by_email(email, db)),
+    "contact by id": (lambda db, row: _legacy_find_contact(db, *row),
+                      lambda db, row: contact_crud._find_contact(db, *row)),
+}
+
+
+def _time(db, call, keys: list, calls: int, rounds: int) -> float:
+    """
+    Time a lookup on a warm session.
+
+    Args:
+        db (Session): The database session.
+        call (Callable): Takes the session and one key and runs the lookup.
+        keys (list): The keys to look up in turn.
+        calls (int): The number of lookups per round.
+        rounds (int): The number of rounds.
+
+    Returns:
+        float: The median time of one lookup in microseconds.
+    """
+    for key in keys[:100]:
+        call(db, key)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for number in range(calls):
+            call(db, keys[number % len(keys)])
+        timings.append((time.perf_counter() - started) / calls * 1_000_000)
+        db.expunge_all()
+    return statistics.median(timings)
+
+
+def run(url: str, users: int, contacts: int, calls: int, rounds: int) -> dict:
+    """
+    Fill a database and time every hot lookup built per call and built once.
+
+    Args:
+        url (str): The database URL; the database must be empty.
+        users (int): The number of users to add.
+        contacts (int): The number of contacts to add.
+        calls (int): The number of lookups per round.
+        rounds (int): The number of timed rounds.
+
+    Returns:
+        dict: The median microseconds per call of the per-call and the pre-built statement, by lookup.
+    """
+    engine = create_engine(url, **engine_options(url))
+    Base.metadata.create_all(engine)
+    generate(engine, users, contacts)
+    results = {}
+    with Session(engine) as db:
+        keys = {
+            "user by email": db.scalars(select(models.User.email).order_by(models.User.id)).all(),
+            "contact by id": db.execute(select(models.Contact.id, models.Contact.user_id)
+                                        .order_by(models.Contact.id)).all(),
+        }
+        for name, calls_before_and_after in LOOKUPS.items():
+            results[name] = [_time(db, call, keys[name], calls, rounds) for call in calls_before_and_after]
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare hot lookups built per call with pre-built statements.")
+    parser.add_argument("--url", default=None, help="an empty database, a temporary SQLite file by default")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--contacts", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url or f"sqlite:///{Path(directory) / 'statements.db'}"
+        results = run(url, args.users, args.contacts, args.calls, args.rounds)
+    print(f"{'µs per call':<20}{'per call':>12}{'pre-built':>12}{'saved':>10}")
+    for name, (before, after) in results.items():
+        print(f"{name:<20}{before:>12.1f}{after:>12.1f}{1 - after / before:>10.0%}")
@@ -0,0 +1,186 @@
+import argparse
+import itertools
+import random
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from settings import SQLALCHEMY_DATABASE_URL
+from src.configuration import models
+from src.repository.contact_crud import month_day
+from src.repository.contact_stats import apply_deltas, stat_keys
+from src.repository.ids import id_allocator
+from src.services.hashing import make_context
+from src.utils.phone import normalize_phone
+
+FIRST_NAMES = [
+    "Olena", "Oleksandr", "Maria", "Andrii", "Iryna", "Dmytro", "Natalia", "Serhii", "Tetiana", "Volodymyr",
+    "Yulia", "Mykola", "Oksana", "Ivan", "Kateryna", "Yurii", "Anna", "Vasyl", "Svitlana", "Petro",
+    "Olha", "Taras", "Viktoria", "Bohdan", "Halyna", "Roman", "Liudmyla", "Maksym", "Daria", "Artem",
+    "John", "Mary", "James", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "Zoriana", "Ostap", "Solomiia", "Yaroslav", "Marta", "Nazar", "Khrystyna", "Orest", "Uliana", "Lev",
+]
+LAST_NAMES = [
+    "Melnyk", "Shevchenko", "Boiko", "Kovalenko", "Bondarenko", "Tkachenko", "Kovalchuk", "Kravchenko",
+    "Oliinyk", "Shevchuk", "Koval", "Polishchuk", "Bondar", "Tkachuk", "Moroz", "Marchenko", "Lysenko",
+    "Rudenko", "Savchenko", "Petrenko", "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hnatiuk", "Kuzmenko", "Zinchenko", "Pavlenko", "Levchenko",
+    "Kharchenko", "Karpenko", "Ponomarenko", "Vasylenko", "Ivanenko",
+]
+EMAIL_DOMAINS = ["gmail.com", "ukr.net", "i.ua", "outlook.com", "yahoo.com", "meta.ua", "icloud.com", "proton.me"]
+EMAIL_DOMAIN_WEIGHTS = [45, 20, 8, 8, 6, 5, 5, 3]
+MOBILE_CODES = ["50", "63", "66", "67", "68", "73", "93", "95", "96", "97", "98", "99"]
+PHONE_FORMATS = ["+380{code}{number}", "0{code}{number}", "+380 ({code}) {a}-{b}-{c}", "0{code} {a} {b} {c}"]
+
+TAG_NAMES = ["family", "friends", "work", "clients", "school", "neighbours", "sport", "vip"]
+TAG_COUNTS = [0, 1, 2, 3]
+TAG_COUNT_WEIGHTS = [30, 70, 90, 100]
+
+
+def _zipf_weights(count: int, exponent: float = 1.0) -> list[float]:
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+class ContactFactory:
+    """
+    Produce realistic contact rows.
+
+    Names follow a Zipf-like frequency, email domains a fixed market share, birth
+    years span 1945–2008 with every day of the year possible, and phone numbers
+    come in the formats people actually type. Owners are skewed, so a few users
+    hold many contacts and most hold a few.
+    """
+
+    def __init__(self, user_ids: list[int], seed: int = 0):
+        self.random = random.Random(seed)
+        self.user_ids = user_ids
+        self._first_weights = _zipf_weights(len(FIRST_NAMES))
+        self._last_weights = _zipf_weights(len(LAST_NAMES))
+        self._domain_weights = list(itertools.accumulate(EMAIL_DOMAIN_WEIGHTS))
+        self._owner_weights = _zipf_weights(len(user_ids), exponent=0.8)
+        self._tag_weights = _zipf_weights(len(TAG_NAMES))
+
+    def _birth_date(self) -> date:
+        year = self.random.randint(1945, 2008)
+        days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+        return date(year, 1, 1) + timedelta(days=self.random.randrange(days))
+
+    def _phone_number(self) -> str:
+        code = self.random.choice(MOBILE_CODES)
+        number = f"{self.random.randrange(10 ** 7):07d}"
+        return self.random.choice(PHONE_FORMATS).format(code=code, number=number, a=number[:3], b=number[3:5],
+                                                         c=number[5:])
+
+    def contact(self, serial: int) -> dict:
+        """
+        Build one contact row.
+
+        Args:
+            serial (int): A number unique to this contact, used to keep emails unique.
+
+        Returns:
+            dict: The column values.
+        """
+        first_name = self.random.choices(FIRST_NAMES, cum_weights=self._first_weights)[0]
+        last_name = self.random.choices(LAST_NAMES, cum_weights=self._last_weights)[0]
+        domain = self.random.choices(EMAIL_DOMAINS, cum_weights=self._domain_weights)[0]
+        phone_number = self._phone_number()
+        birth_date = self._birth_date()
+        return {
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": f"{first_name}.{last_name}.{serial}@{domain}".lower(),
+            "phone_number": phone_number,
+            "phone_e164": normalize_phone(phone_number),
+            "birth_date": birth_date,
+            "birth_md": month_day(birth_date),
+            "additional_data": None if self.random.random() < 0.8 else "Met at a conference",
+            "user_id": self.random.choices(self.user_ids, cum_weights=self._owner_weights)[0],
+        }
+
+    def tags(self) -> set[str]:
+        """
+        Pick the tags of one contact: none to three, the first tags being the most common.
+
+        Returns:
+            set[str]: The tag names.
+        """
+        count = self.random.choices(TAG_COUNTS, cum_weights=TAG_COUNT_WEIGHTS)[0]
+        return set(self.random.choices(TAG_NAMES, cum_weights=self._tag_weights, k=count))
+
+
+
+def generate(engine, users: int, contacts: int, batch_size: int = 10_000, seed: int = 0) -> None:
+    """
+    Insert synthetic users and contacts, and tag the contacts.
+
+    Every new user gets the tags of ``TAG_NAMES``, and the contact statistics of
+    the users are added up as the contacts are generated.
+
+    Args:
+        engine (Engine): The database to fill.
+        users (int): The number of users to add.
+        contacts (int): The number of contacts to add, spread over the new users.
+        batch_size (int): The number of rows per INSERT.
+        seed (int): The random seed, for reproducible datasets.
+    """
+    password = make_context(rounds=4).hash("password")
+    with Session(engine) as db:
+        first_user = (db.execute(select(func.max(models.User.id))).scalar() or 0) + 1
+        for start in range(0, users, batch_size):
+            db.execute(insert(models.User), [
+                {"username": f"user{number}", "email": f"user{number}@example.com", "password": password,
+                 "confirmed": True}
+                for number in range(first_user + start, first_user + min(start + batch_size, users))
+            ])
+            db.commit()
+        user_ids = db.scalars(select(models.User.id).where(models.User.id >= first_user)
+                              .order_by(models.User.id)).all()
+        factory = ContactFactory(user_ids, seed)
+        first_tag = id_allocator.allocate(db, len(user_ids) * len(TAG_NAMES))
+        tag_ids = {(user_id, name): tag_id for tag_id, (user_id, name) in
+                   enumerate(itertools.product(user_ids, TAG_NAMES), start=first_tag)}
+        if tag_ids:
+            db.execute(insert(models.Tag), [{"id": tag_id, "user_id": user_id, "name": name}
+                                            for (user_id, name), tag_id in tag_ids.items()])
+        db.commit()
+        first_serial = (db.execute(select(func.max(models.Contact.id))).scalar() or 0) + 1
+        stats = defaultdict(Counter)
+        sequences = Counter()
+        for start in range(0, contacts, batch_size):
+            count = min(batch_size, contacts - start)
+            first_id = id_allocator.allocate(db, count)
+            rows = [factory.contact(first_serial + start + number) for number in range(count)]
+            for number, row in enumerate(rows):
+                row["id"] = first_id + number
+                sequences[row["user_id"]] += 1
+                row["change_seq"] = sequences[row["user_id"]]
+            links = [{"tag_id": tag_ids[row["user_id"], name], "contact_id": row["id"]}
+                     for row in rows for name in factory.tags()]
+            for row in rows:
+                stats[row["user_id"]].update(stat_keys(row["email"], row["birth_md"]))
+            db.execute(insert(models.Contact), rows)
+            if links:
+                db.execute(insert(models.ContactTag), links)
+            db.commit()
+            print(f"{start + count} / {contacts} contacts", end="\r", flush=True)
+        for user_id, deltas in stats.items():
+            apply_deltas(db, user_id, deltas)
+        if sequences:
+            db.execute(insert(models.ContactSequence), [{"user_id": user_id, "value": value}
+                                                        for user_id, value in sequences.items()])
+        db.commit()
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic users and contacts.")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--contacts", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", default=SQLALCHEMY_DATABASE_URL, help="the database URL")
+    args = parser.parse_args()
+    generate(create_engine(args.url), args.users, args.contacts, args.batch_size, args.seed)
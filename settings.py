@@ -11,6 +11,10 @@ load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv('SQLALCHEMY_DATABASE_URL')
 SQLALCHEMY_TEST_DATABASE_URL = os.getenv('SQLALCHEMY_TEST_DATABASE_URL')
+SHARD_DATABASE_URLS = [url.strip() for url in os.getenv("SHARD_DATABASE_URLS", "").split(",") if url.strip()]
+SHARD_DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", 60))
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", 100))
+DB_PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD", 1))
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
 
@@ -35,6 +39,96 @@ CLOUDINARY_NAME=os.getenv("CLOUDINARY_NAME")
 CLOUDINARY_API_KEY=os.getenv("CLOUDINARY_API_KEY")
 CLOUDINARY_API_SECRET=os.getenv("CLOUDINARY_API_SECRET")
 
+AUTOCOMPLETE_MAX_RESULTS = int(os.getenv("AUTOCOMPLETE_MAX_RESULTS", 10))
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv("DEFAULT_PHONE_COUNTRY_CODE", "380")
+DUPLICATES_MAX_BLOCK_SIZE = int(os.getenv("DUPLICATES_MAX_BLOCK_SIZE", 50))
+
+BIRTHDAY_DIGEST_DAYS = int(os.getenv("BIRTHDAY_DIGEST_DAYS", 7))
+BIRTHDAY_DIGEST_CHUNK_SIZE = int(os.getenv("BIRTHDAY_DIGEST_CHUNK_SIZE", 1000))
+BIRTHDAY_DIGEST_BATCH_SIZE = int(os.getenv("BIRTHDAY_DIGEST_BATCH_SIZE", 100))
+
+CONTACT_STATS_TOP_DOMAINS = int(os.getenv("CONTACT_STATS_TOP_DOMAINS", 10))
+CONTACT_STATS_CHUNK_SIZE = int(os.getenv("CONTACT_STATS_CHUNK_SIZE", 1000))
+
+JOB_CONCURRENCY = {
+    job_type: int(workers)
+    for job_type, workers in (
+        item.split("=") for item in os.getenv("JOB_CONCURRENCY", "email=4,avatar=2,duplicates=1").split(",")
+    )
+}
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", 30))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", 3600))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 600))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+AVATAR_SPOOL_DIR = Path(os.getenv("AVATAR_SPOOL_DIR", Path(__file__).parent / "spool" / "avatars"))
+AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "cloudinary")
+AVATAR_LOCAL_DIR = Path(os.getenv("AVATAR_LOCAL_DIR", Path(__file__).parent / "media" / "avatars"))
+AVATAR_BASE_URL = os.getenv("AVATAR_BASE_URL", "/api/avatars")
+AVATAR_VARIANTS = {
+    name: int(size)
+    for name, size in (
+        item.split("=") for item in os.getenv("AVATAR_VARIANTS", "small=64,medium=250,large=512").split(",")
+    )
+}
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.005))
+PROFILING_DIR = Path(os.getenv("PROFILING_DIR", Path(__file__).parent / "profiles"))
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+CONTACT_CACHE_TTL = float(os.getenv("CONTACT_CACHE_TTL", 30))
+CONTACT_CACHE_MAX_ENTRIES = int(os.getenv("CONTACT_CACHE_MAX_ENTRIES", 10_000))
+CONTACT_CACHE_MAX_BYTES = int(os.getenv("CONTACT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+SINGLE_FLIGHT_GRACE = float(os.getenv("SINGLE_FLIGHT_GRACE", 0))
+
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", 5))
+LOGIN_MAX_IP_FAILURES = int(os.getenv("LOGIN_MAX_IP_FAILURES", 50))
+LOGIN_LOCKOUT_SECONDS = float(os.getenv("LOGIN_LOCKOUT_SECONDS", 30))
+LOGIN_LOCKOUT_MAX_SECONDS = float(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", 3600))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", 3600))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+CHANGE_FEED_BACKEND = os.getenv("CHANGE_FEED_BACKEND", "local")
+CHANGE_FEED_CHANNEL = os.getenv("CHANGE_FEED_CHANNEL", "contact_changes")
+CHANGE_FEED_BUFFER = int(os.getenv("CHANGE_FEED_BUFFER", 100))
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT", 15))
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6))
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 64))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 128))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 0.5))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+ADMISSION_ROUTE_LIMITS = {
+    route_class: int(limit)
+    for route_class, limit in (
+        item.split("=") for item in os.getenv("ADMISSION_ROUTE_LIMITS", "search=8,export=4,import=2,avatar=4").split(",")
+    )
+}
+
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 30))
+REQUEST_TIMEOUT_MAX = float(os.getenv("REQUEST_TIMEOUT_MAX", 60))
+REQUEST_ROUTE_TIMEOUTS = {
+    route_class: float(timeout)
+    for route_class, timeout in (
+        item.split("=") for item in os.getenv("REQUEST_ROUTE_TIMEOUTS", "search=5,export=15").split(",")
+    )
+}
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", 1))
+TRACING_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "contacts")
+
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 5000))
+MIGRATION_BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", 0))
+
 
 origins = [ 
     "*"
@@ -1,26 +1,241 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from settings import SQLALCHEMY_DATABASE_URL,SQLALCHEMY_TEST_DATABASE_URL
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
 
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import Pool
+from starlette.requests import HTTPConnection
+from settings import SQLALCHEMY_DATABASE_URL,SQLALCHEMY_TEST_DATABASE_URL, SHARD_DATABASE_URLS, SHARD_DIRECTORY_TTL, \
+    DB_PREPARE_THRESHOLD
+from src.services.tracing import instrument_engines
+
+
+
+def engine_options(url: Optional[str], prepare_threshold: int = DB_PREPARE_THRESHOLD) -> dict:
+    """
+    Choose the driver options for a database URL.
+
+    With psycopg 3 (``postgresql+psycopg://``) a statement that has run
+    ``prepare_threshold`` times on a connection is prepared on the server, and
+    later executions send only its parameters; a negative threshold turns this
+    off, as PgBouncer in transaction mode needs. psycopg2 cannot prepare statements.
+
+    Args:
+        url (Optional[str]): The database URL.
+        prepare_threshold (int): The number of executions before a statement is prepared.
+
+    Returns:
+        dict: Keyword arguments for ``create_engine``.
+    """
+    if url is None or make_url(url).get_driver_name() != "psycopg":
+        return {}
+    return {"connect_args": {"prepare_threshold": prepare_threshold if prepare_threshold >= 0 else None}}
 
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,echo=True
+    SQLALCHEMY_DATABASE_URL,echo=True, **engine_options(SQLALCHEMY_DATABASE_URL)
 )
 
 test_engine = create_engine(
-    SQLALCHEMY_TEST_DATABASE_URL,echo=True
+    SQLALCHEMY_TEST_DATABASE_URL,echo=True, **engine_options(SQLALCHEMY_TEST_DATABASE_URL)
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class ShardMap:
+    """
+    Place the contacts of every user on one of several databases.
+
+    The ``user_shards`` directory table in the primary database records the shard of
+    every user. A user without an entry is placed by a stable hash of their ID and
+    the entry is written, so adding shards later only affects new users. Entries are
+    cached for ``ttl`` seconds; a user moved by the rebalancer is picked up by other
+    processes once their cached entry expires.
+    """
+
+    def __init__(self, directory, shards: list, ttl: float = SHARD_DIRECTORY_TTL):
+        self.directory = directory
+        self.shards = shards
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def hash_shard(self, user_id: int) -> int:
+        """
+        Compute the default shard of a user.
+
+        Args:
+            user_id (int): The user's ID.
+
+        Returns:
+            int: The shard index.
+        """
+        return zlib.crc32(str(user_id).encode()) % len(self.shards)
+
+    def shard_for(self, user_id: int) -> int:
+        """
+        Look up the shard holding a user's contacts, placing the user if needed.
+
+        Args:
+            user_id (int): The user's ID.
+
+        Returns:
+            int: The shard index.
+        """
+        if len(self.shards) == 1:
+            return 0
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        select_shard = text("SELECT shard FROM user_shards WHERE user_id = :user_id")
+        with self.directory.begin() as connection:
+            shard = connection.execute(select_shard, {"user_id": user_id}).scalar()
+        if shard is None:
+            try:
+                with self.directory.begin() as connection:
+                    connection.execute(text("INSERT INTO user_shards (user_id, shard) VALUES (:user_id, :shard)"),
+                                       {"user_id": user_id, "shard": self.hash_shard(user_id)})
+            except IntegrityError:
+                pass
+            with self.directory.begin() as connection:
+                shard = connection.execute(select_shard, {"user_id": user_id}).scalar()
+        with self._lock:
+            self._cache[user_id] = (shard, time.monotonic() + self.ttl)
+        return shard
+
+    def assign(self, user_id: int, shard: int):
+        """
+        Record a user's shard in the directory.
+
+        Args:
+            user_id (int): The user's ID.
+            shard (int): The shard index.
+        """
+        with self.directory.begin() as connection:
+            updated = connection.execute(text("UPDATE user_shards SET shard = :shard WHERE user_id = :user_id"),
+                                         {"user_id": user_id, "shard": shard}).rowcount
+            if not updated:
+                connection.execute(text("INSERT INTO user_shards (user_id, shard) VALUES (:user_id, :shard)"),
+                                   {"user_id": user_id, "shard": shard})
+        with self._lock:
+            self._cache[user_id] = (shard, time.monotonic() + self.ttl)
+
+
+class ShardedSession(Session):
+    """
+    A session that sends contact tables to the shard of the current user.
+
+    Tables marked with ``info={"sharded": True}`` are read and written on the shard
+    of ``session.info["user_id"]``, which ``get_current_user`` sets, or on the shard
+    index in ``session.info["shard"]`` when that is given; everything else stays on
+    the primary database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        table = getattr(mapper, "persist_selectable", None)
+        if table is not None and table.info.get("sharded"):
+            return shard_map.shards[self.shard_index()]
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def shard_index(self) -> int:
+        """
+        Return the shard the session's contact queries go to.
+
+        Returns:
+            int: The shard index.
+
+        Raises:
+            LookupError: If there are several shards and neither a user nor a shard was set.
+        """
+        if "shard" in self.info:
+            return self.info["shard"]
+        if self.info.get("user_id") is not None:
+            return shard_map.shard_for(self.info["user_id"])
+        if len(shard_map.shards) == 1:
+            return 0
+        raise LookupError("set session.info['user_id'] or ['shard'] to query contacts")
+
+
+def each_shard(db: Session):
+    """
+    Point a session at every shard in turn, for jobs that read all contacts.
+
+    Args:
+        db (Session): The database session.
+
+    Yields:
+        int: The index of the shard the session is pointed at.
+    """
+    previous = db.info.pop("shard", None)
+    try:
+        for index in range(len(shard_map.shards)):
+            db.info["shard"] = index
+            yield index
+    finally:
+        db.info.pop("shard", None)
+        if previous is not None:
+            db.info["shard"] = previous
+
+
+def set_deadline(db: Session, deadline: Optional[float]):
+    """
+    Bound the time the statements of a session may run.
+
+    Every transaction the session begins afterwards gets the time left until the
+    deadline: as ``statement_timeout`` on Postgres, or as a progress handler that
+    interrupts the statement on SQLite. A statement still running at the deadline
+    fails with ``OperationalError``, which frees the connection for other requests.
+
+    Args:
+        db (Session): The database session.
+        deadline (Optional[float]): The ``time.monotonic()`` value to stop at, or None for no limit.
+    """
+    if deadline is None:
+        db.info.pop("deadline", None)
+    else:
+        db.info["deadline"] = deadline
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session, transaction, connection):
+    deadline = session.info.get("deadline")
+    if deadline is None:
+        return
+    if connection.dialect.name == "postgresql":
+        milliseconds = max(1, int((deadline - time.monotonic()) * 1000))
+        connection.execute(text("SELECT set_config('statement_timeout', :timeout, true)"),
+                           {"timeout": str(milliseconds)})
+    elif connection.dialect.name == "sqlite":
+        connection.connection.driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+
+
+@event.listens_for(Pool, "checkin")
+def _clear_deadline(dbapi_connection, connection_record):
+    # Postgres resets the transaction-local timeout by itself; SQLite keeps the handler.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+shard_engines = [create_engine(url, **engine_options(url)) for url in SHARD_DATABASE_URLS]
+instrument_engines([engine, test_engine, *shard_engines])
+# Without SHARD_DATABASE_URLS the primary database is the only shard.
+shard_map = ShardMap(engine, shard_engines or [engine])
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=ShardedSession)
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db(is_test: bool = False):
+def get_db(is_test: bool = False, connection: HTTPConnection = None):
     if is_test:
         db = TestSessionLocal
     else:
         db = SessionLocal()
+        if connection is not None:
+            set_deadline(db, connection.scope.get("state", {}).get("deadline"))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Date,Boolean,DateTime,func
-from sqlalchemy.orm import declarative_base
-from src.configuration.database import engine
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Date,Boolean,DateTime,JSON,Index,UniqueConstraint,func
+from sqlalchemy.orm import declarative_base, validates
+from src.configuration.database import engine, shard_engines
 
 
 
@@ -11,13 +11,108 @@ Base = declarative_base()
 class Contact(Base):
     __tablename__ = 'contacts'
 
-    id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String, index=True)
-    last_name = Column(String, index=True)
-    email = Column(String, index=True, unique=True)
-    phone_number = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    first_name = Column(String)
+    last_name = Column(String)
+    email = Column(String)
+    phone_number = Column(String)
+    phone_e164 = Column(String(16), nullable=True)
     birth_date = Column(Date)
+    birth_md = Column(SmallInteger, nullable=True)
     additional_data = Column(String, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=True)
+
+    # Every contact query is scoped to one owner, so each index leads with user_id.
+    __table_args__ = (
+        Index("ix_contacts_user_name", "user_id", "last_name", "first_name", "id"),
+        Index("ix_contacts_user_phone_e164", "user_id", "phone_e164"),
+        Index("ix_contacts_user_birth_md", "user_id", "birth_md"),
+        Index("ix_contacts_user_change_seq", "user_id", "change_seq"),
+        # Emails are unique per owner; different users may keep the same person.
+        Index("ix_contacts_user_email", "user_id", "email", unique=True),
+        {"info": {"sharded": True}},
+    )
+
+    @validates("birth_date")
+    def _set_birth_md(self, key, birth_date):
+        # Keeps the indexed month-day in step when a contact is built or edited through the ORM.
+        self.birth_md = birth_date.month * 100 + birth_date.day if birth_date else None
+        return birth_date
+
+
+class ContactTombstone(Base):
+    __tablename__ = "contact_tombstones"
+    contact_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=True)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_contact_tombstones_user_change_seq", "user_id", "change_seq"),
+        {"info": {"sharded": True}},
+    )
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    name = Column(String(50), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_tags_user_name"),
+        {"info": {"sharded": True}},
+    )
+
+
+class ContactTag(Base):
+    __tablename__ = "contact_tags"
+    # The primary key lists a tag's contacts; the index lists a contact's tags.
+    tag_id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_contact_tags_contact_tag", "contact_id", "tag_id"),
+        {"info": {"sharded": True}},
+    )
+
+
+class ContactStat(Base):
+    __tablename__ = "contact_stats"
+    # One counter per user, statistic and value: the contact total, the birthdays of
+    # a month, or the contacts of an email domain.
+    user_id = Column(Integer, primary_key=True)
+    kind = Column(String(20), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_contact_stats_user_kind_count", "user_id", "kind", "count"),
+        {"info": {"sharded": True}},
+    )
+
+
+class ContactSequence(Base):
+    __tablename__ = "contact_sequences"
+    # The last change sequence number of every owner, kept on the owner's shard.
+    user_id = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False)
+
+    __table_args__ = ({"info": {"sharded": True}},)
+
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False)
+
+
+class UserShard(Base):
+    __tablename__ = "user_shards"
+    user_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, nullable=False)
 
 class User(Base):
     __tablename__ = "users"
@@ -27,8 +122,55 @@ class User(Base):
     password = Column(String(255), nullable=False)
     created_at = Column('crated_at', DateTime, default=func.now())
     avatar = Column(String(255), nullable=True)
+    avatar_hash = Column(String(64), nullable=True, index=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
+
+
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+    name = Column(String(100), primary_key=True)
+    value = Column(String(255), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    type = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (Index("ix_jobs_claim", "status", "type", "run_at"),)
+
+
+class DuplicateScan(Base):
+    __tablename__ = "duplicate_scans"
+    # The last duplicates job of every owner: the stored groups reflect the owner's
+    # contacts as of change_seq; requested_seq is the sequence the last queued job was asked for.
+    user_id = Column(Integer, primary_key=True)
+    change_seq = Column(BigInteger, nullable=True)
+    requested_seq = Column(BigInteger, nullable=True)
+    scanned_at = Column(DateTime, nullable=True)
+
+
+class DuplicateGroup(Base):
+    __tablename__ = "duplicate_groups"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    contact_ids = Column(JSON, nullable=False)
+    keys = Column(JSON, nullable=False)
+
+    __table_args__ = (Index("ix_duplicate_groups_user_id", "user_id"),)
     
 
-Base.metadata.create_all(bind = engine)
\ No newline at end of file
+Base.metadata.create_all(bind = engine)
+for shard_engine in shard_engines:
+    Base.metadata.create_all(bind=shard_engine, tables=[table for table in Base.metadata.sorted_tables
+                                                        if table.info.get("sharded")])
\ No newline at end of file
@@ -0,0 +1,84 @@
+import argparse
+import sys
+
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.orm import aliased
+
+from settings import CONTACT_STATS_CHUNK_SIZE
+from src.configuration import models
+from src.configuration.database import SessionLocal, each_shard
+from src.repository.cache import contact_cache
+from src.repository.contact_crud import next_change_seq
+from src.repository.contact_stats import rebuild_user_stats
+
+
+def count_unowned(session_factory=SessionLocal) -> int:
+    """
+    Count the contacts that have no owner on every shard.
+
+    Contacts created before contacts had owners are not visible to any user until
+    they are assigned one.
+
+    Args:
+        session_factory (sessionmaker): Creates the database session.
+
+    Returns:
+        int: The number of contacts without an owner.
+    """
+    with session_factory() as db:
+        return sum(db.execute(select(func.count()).where(models.Contact.user_id.is_(None))).scalar()
+                   for _ in each_shard(db))
+
+
+def assign_unowned_contacts(user_id: int, session_factory=SessionLocal,
+                            chunk_size: int = CONTACT_STATS_CHUNK_SIZE) -> int:
+    """
+    Give the contacts without an owner on a user's shard to that user.
+
+    The contacts take new numbers from the user's change sequence, so their delta
+    sync clients pick them up, and the user's statistics are recounted. Contacts
+    created before owners existed live in the primary database, which is the only
+    shard until ``SHARD_DATABASE_URLS`` is set. Contacts with an email the user
+    already has a contact with are left without an owner, and ``count_unowned``
+    reports them together with any on other shards.
+
+    Args:
+        user_id (int): The new owner's ID.
+        session_factory (sessionmaker): Creates the database session.
+        chunk_size (int): The number of contacts updated per transaction.
+
+    Returns:
+        int: The number of contacts assigned.
+    """
+    assigned = 0
+    with session_factory() as db:
+        db.info["user_id"] = user_id
+        owned = aliased(models.Contact)
+        taken = exists().where(owned.user_id == user_id, owned.email == models.Contact.email)
+        contact_ids = db.scalars(select(models.Contact.id).where(models.Contact.user_id.is_(None), ~taken)
+                                 .order_by(models.Contact.id)).all()
+        for start in range(0, len(contact_ids), chunk_size):
+            chunk = contact_ids[start:start + chunk_size]
+            first_seq = next_change_seq(db, user_id, len(chunk)) - len(chunk) + 1
+            db.execute(update(models.Contact), [{"id": contact_id, "user_id": user_id, "change_seq": first_seq + number}
+                                                for number, contact_id in enumerate(chunk)])
+            db.commit()
+            assigned += len(chunk)
+        if assigned:
+            rebuild_user_stats(db, user_id)
+            contact_cache.invalidate(user_id)
+    return assigned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Give the contacts created before contacts had owners to a user.")
+    parser.add_argument("user_id", type=int, nargs="?", help="the new owner; leave out with --check")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 while contacts without an owner remain")
+    args = parser.parse_args()
+    if args.user_id is not None:
+        print(f"Assigned {assign_unowned_contacts(args.user_id)} contacts to user {args.user_id}")
+    unowned = count_unowned()
+    if unowned:
+        print(f"{unowned} contacts have no owner and are hidden from every user")
+    if args.check and unowned:
+        sys.exit(1)
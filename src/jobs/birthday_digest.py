@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date
+
+from fastapi_mail import MessageSchema, MessageType
+from sqlalchemy import select
+
+from settings import conf, BIRTHDAY_DIGEST_DAYS, BIRTHDAY_DIGEST_CHUNK_SIZE, BIRTHDAY_DIGEST_BATCH_SIZE
+from src.configuration import models
+from src.configuration.database import SessionLocal, each_shard
+from src.repository.checkpoints import get_checkpoint, save_checkpoint
+from src.repository.contact_crud import birth_month_day, upcoming_month_days
+from src.services.email import send_messages
+
+
+def _next_birthday(birth_date: date, today: date) -> date:
+    """
+    Find the next occurrence of a birthday on or after today.
+
+    Args:
+        birth_date (date): The date of birth.
+        today (date): The day to count from.
+
+    Returns:
+        date: The next birthday; February 29 falls on March 1 in non-leap years.
+    """
+    for year in (today.year, today.year + 1):
+        try:
+            birthday = birth_date.replace(year=year)
+        except ValueError:
+            birthday = date(year, 3, 1)
+        if birthday >= today:
+            return birthday
+
+
+def render_digests(template, users: list, contacts: dict, today: date, days: int) -> list[MessageSchema]:
+    """
+    Render the digest emails for a batch of users.
+
+    Args:
+        template (Template): The compiled digest template.
+        users (list): The ``(id, email, username)`` rows of the users to notify.
+        contacts (dict): The upcoming ``(first_name, last_name, birth_date)`` rows by user ID.
+        today (date): The day the digest is sent.
+        days (int): The number of days the digest covers.
+
+    Returns:
+        list[MessageSchema]: The messages ready to be sent.
+    """
+    messages = []
+    for user_id, email, username in users:
+        birthdays = sorted(
+            (
+                {"first_name": first_name, "last_name": last_name, "birthday": _next_birthday(birth_date, today)}
+                for first_name, last_name, birth_date in contacts[user_id]
+            ),
+            key=lambda contact: contact["birthday"],
+        )
+        messages.append(MessageSchema(
+            subject="Upcoming birthdays",
+            recipients=[email],
+            body=template.render(username=username, days=days, contacts=birthdays),
+            subtype=MessageType.html,
+        ))
+    return messages
+
+
+async def send_birthday_digests(session_factory=SessionLocal, today: date | None = None,
+                                days: int = BIRTHDAY_DIGEST_DAYS, chunk_size: int = BIRTHDAY_DIGEST_CHUNK_SIZE,
+                                batch_size: int = BIRTHDAY_DIGEST_BATCH_SIZE, send=send_messages) -> int:
+    """
+    Email every confirmed user a digest of their contacts' upcoming birthdays.
+
+    Users are read in chunks of ``chunk_size`` ordered by ID, and the upcoming
+    birthdays of a whole chunk are streamed with one query per shard. Digests are
+    rendered and sent in batches of ``batch_size`` over one SMTP connection, and the
+    last user ID of every sent batch is saved as a checkpoint for the day, so a
+    restarted run continues where the previous one stopped instead of emailing
+    everyone again.
+
+    Args:
+        session_factory (sessionmaker): Creates the database session.
+        today (date | None): The day of the digest, today by default.
+        days (int): The number of days after today to include.
+        chunk_size (int): The number of users read per query.
+        batch_size (int): The number of digests sent per SMTP connection.
+        send (Callable): Sends a list of messages.
+
+    Returns:
+        int: The number of digests sent.
+    """
+    today = today or date.today()
+    checkpoint = f"birthday_digest:{today.isoformat()}"
+    month_days = upcoming_month_days(today, days)
+    template = conf.template_engine().get_template("birthday_digest.html")
+    sent = 0
+    with session_factory() as db:
+        last_user_id = int(get_checkpoint(db, checkpoint) or 0)
+        while True:
+            users = db.execute(
+                select(models.User.id, models.User.email, models.User.username)
+                .where(models.User.id > last_user_id, models.User.confirmed.is_(True))
+                .order_by(models.User.id)
+                .limit(chunk_size)
+            ).all()
+            if not users:
+                break
+            contacts = defaultdict(list)
+            for _ in each_shard(db):
+                rows = db.execute(
+                    select(models.Contact.user_id, models.Contact.first_name, models.Contact.last_name,
+                           models.Contact.birth_date)
+                    .where(models.Contact.user_id.in_([user.id for user in users]),
+                           birth_month_day().in_(month_days))
+                    .execution_options(yield_per=chunk_size)
+                )
+                for user_id, first_name, last_name, birth_date in rows:
+                    contacts[user_id].append((first_name, last_name, birth_date))
+
+            recipients = [user for user in users if user.id in contacts]
+            for start in range(0, len(recipients), batch_size):
+                batch = recipients[start:start + batch_size]
+                await send(render_digests(template, batch, contacts, today, days))
+                sent += len(batch)
+                save_checkpoint(db, checkpoint, str(batch[-1].id))
+            last_user_id = users[-1].id
+            save_checkpoint(db, checkpoint, str(last_user_id))
+    return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the daily birthday digest emails.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="Digest day, YYYY-MM-DD.")
+    args = parser.parse_args()
+    print(f"Sent {asyncio.run(send_birthday_digests(today=args.date))} birthday digests")
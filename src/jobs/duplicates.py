@@ -0,0 +1,226 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from settings import DUPLICATES_MAX_BLOCK_SIZE
+from src.configuration import models
+from src.configuration.database import each_shard
+from src.jobs.queue import enqueue
+
+JOB_TYPE = "duplicates"
+
+_NON_LETTERS = re.compile(r"[^\w\s]|\d|_")
+
+
+def _fold(value: str) -> str:
+    """
+    Lowercase a string and strip accents and punctuation from it.
+
+    Args:
+        value (str): The string to fold.
+
+    Returns:
+        str: The folded string.
+    """
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return _NON_LETTERS.sub(" ", value.casefold())
+
+
+def blocking_keys(first_name: str, last_name: str, email: str, phone_e164: str | None) -> list[str]:
+    """
+    Build the blocking keys of a contact.
+
+    Contacts sharing at least one key are compared as duplicate candidates: the
+    normalized full name (word order ignored), the normalized phone number and the
+    email local part without dots and ``+tags``.
+
+    Args:
+        first_name (str): The contact's first name.
+        last_name (str): The contact's last name.
+        email (str): The contact's email.
+        phone_e164 (str | None): The contact's normalized phone number.
+
+    Returns:
+        list[str]: The blocking keys.
+    """
+    keys = []
+    name = " ".join(sorted(_fold(f"{first_name} {last_name}").split()))
+    if name:
+        keys.append(f"name:{name}")
+    if phone_e164:
+        keys.append(f"phone:{phone_e164}")
+    local_part = (email or "").split("@", 1)[0].split("+", 1)[0].replace(".", "").casefold()
+    if local_part:
+        keys.append(f"email:{local_part}")
+    return keys
+
+
+def find_duplicate_groups(db: Session, user_id: int | None = None,
+                          max_block_size: int = DUPLICATES_MAX_BLOCK_SIZE) -> list[dict]:
+    """
+    Group contacts that are likely to be the same person.
+
+    Contacts are streamed once and bucketed by their owner and blocking keys; buckets
+    are then joined with a union-find, so the work grows linearly with the number of
+    contacts instead of comparing every pair. Buckets larger than ``max_block_size``
+    (for example the ``info@`` local part) are ignored as not discriminating.
+
+    Args:
+        db (Session): The database session.
+        user_id (int | None): The owner whose contacts are checked, or None for every owner.
+        max_block_size (int): The largest bucket that is still considered.
+
+    Returns:
+        list[dict]: The candidate groups, each with ``contact_ids`` and the ``keys`` they share.
+    """
+    blocks = defaultdict(list)
+    query = select(models.Contact.id, models.Contact.user_id, models.Contact.first_name,
+                   models.Contact.last_name, models.Contact.email, models.Contact.phone_e164)
+    if user_id is not None:
+        query = query.filter(models.Contact.user_id == user_id)
+    # The contacts of one owner live on one shard; a run over every owner visits them all.
+    for _ in (each_shard(db) if user_id is None else [user_id]):
+        rows = db.execute(query.execution_options(yield_per=1000))
+        for contact_id, owner, first_name, last_name, email, phone_e164 in rows:
+            for key in blocking_keys(first_name, last_name, email, phone_e164):
+                blocks[owner, key].append(contact_id)
+
+    parent = {}
+
+    def find(contact_id):
+        root = contact_id
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while contact_id != root:
+            next_id = parent[contact_id]
+            parent[contact_id] = root
+            contact_id = next_id
+        return root
+
+    shared_keys = {}
+    for key, contact_ids in blocks.items():
+        if len(contact_ids) < 2 or len(contact_ids) > max_block_size:
+            continue
+        root = find(contact_ids[0])
+        for contact_id in contact_ids[1:]:
+            other = find(contact_id)
+            if other != root:
+                parent[other] = root
+        shared_keys[key] = contact_ids[0]
+
+    groups = defaultdict(lambda: {"contact_ids": set(), "keys": []})
+    for (owner, key), contact_id in shared_keys.items():
+        group = groups[find(contact_id)]
+        group["contact_ids"].update(blocks[owner, key])
+        group["keys"].append(key)
+    return [
+        {"contact_ids": sorted(group["contact_ids"]), "keys": sorted(group["keys"])}
+        for group in sorted(groups.values(), key=lambda group: min(group["contact_ids"]))
+    ]
+
+
+def _change_seq(db: Session, user_id: int) -> int:
+    """
+    Read the last change sequence number of an owner's contacts.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+
+    Returns:
+        int: The number, 0 if the owner never changed a contact.
+    """
+    db.info["user_id"] = user_id
+    sequences = models.ContactSequence
+    return db.execute(select(sequences.value).where(sequences.user_id == user_id)).scalar() or 0
+
+
+def save_duplicate_groups(db: Session, user_id: int) -> int:
+    """
+    Find the duplicate candidates of a user and store them for the duplicates endpoint.
+
+    The groups replace the ones stored before, and the scan records the change
+    sequence read before the contacts, so changes made during the scan make the
+    next request queue another one.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner whose contacts are checked.
+
+    Returns:
+        int: The number of groups found.
+    """
+    change_seq = _change_seq(db, user_id)
+    groups = find_duplicate_groups(db, user_id=user_id)
+    db.execute(delete(models.DuplicateGroup).where(models.DuplicateGroup.user_id == user_id))
+    if groups:
+        db.execute(insert(models.DuplicateGroup), [{"user_id": user_id, **group} for group in groups])
+    scan = db.get(models.DuplicateScan, user_id)
+    if scan is None:
+        scan = models.DuplicateScan(user_id=user_id)
+        db.add(scan)
+    scan.change_seq = change_seq
+    scan.scanned_at = func.now()
+    db.commit()
+    return len(groups)
+
+
+def request_duplicate_scan(db: Session, user_id: int) -> bool:
+    """
+    Queue a duplicates job for a user whose contacts changed since the last one.
+
+    A job is queued at most once for every state of the user's contacts.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+
+    Returns:
+        bool: True if the stored groups are up to date, False if a job is queued or running.
+    """
+    change_seq = _change_seq(db, user_id)
+    scan = db.get(models.DuplicateScan, user_id)
+    if scan is not None and scan.change_seq is not None and scan.change_seq >= change_seq:
+        return True
+    if scan is None:
+        scan = models.DuplicateScan(user_id=user_id)
+        db.add(scan)
+    if scan.requested_seq is None or scan.requested_seq < change_seq:
+        scan.requested_seq = change_seq
+        enqueue(db, JOB_TYPE, {"user_id": user_id}, commit=False)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request created the scan and queued the job first.
+            db.rollback()
+    return False
+
+
+def get_duplicate_groups(db: Session, user_id: int) -> list[dict]:
+    """
+    Read the duplicate groups stored for a user by the last duplicates job.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+
+    Returns:
+        list[dict]: The groups, each with ``contact_ids`` and the ``keys`` they share.
+    """
+    groups = db.execute(select(models.DuplicateGroup.contact_ids, models.DuplicateGroup.keys)
+                        .where(models.DuplicateGroup.user_id == user_id)
+                        .order_by(models.DuplicateGroup.id)).all()
+    return [{"contact_ids": contact_ids, "keys": keys} for contact_ids, keys in groups]
+
+
+if __name__ == "__main__":
+    from src.configuration.database import SessionLocal
+
+    with SessionLocal() as session:
+        for group in find_duplicate_groups(session):
+            print(", ".join(map(str, group["contact_ids"])), "|", ", ".join(group["keys"]))
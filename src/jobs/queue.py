@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from settings import JOB_MAX_ATTEMPTS, JOB_BACKOFF_SECONDS, JOB_BACKOFF_MAX_SECONDS
+from src.configuration.models import Job
+from src.services.tracing import inject
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+def utcnow() -> datetime:
+    """
+    Return the current UTC time as a naive datetime, as stored in the jobs table.
+
+    Returns:
+        datetime: The current time.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(db: Session, job_type: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS,
+            delay: float = 0, commit: bool = True) -> Job:
+    """
+    Add a job to the queue.
+
+    Args:
+        db (Session): The database session.
+        job_type (str): The job type, which selects the handler and the worker pool.
+        payload (dict): The JSON-serializable job arguments. The ``traceparent`` of the active
+            span is added to it, so the job continues the enqueuing request's trace.
+        max_attempts (int): How many times the job is tried before it is dead-lettered.
+        delay (float): The number of seconds to wait before the job may run.
+        commit (bool): Whether to commit the job at once. With False it is only flushed and
+            committed with the caller's transaction, so it is queued if and only if the
+            caller's own writes are.
+
+    Returns:
+        Job: The queued job.
+    """
+    job = Job(type=job_type, payload=inject(payload), status=QUEUED, attempts=0, max_attempts=max_attempts,
+              run_at=utcnow() + timedelta(seconds=delay))
+    db.add(job)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return job
+
+
+def claim(db: Session, job_type: str) -> Optional[Job]:
+    """
+    Take the next due job of a type for this worker.
+
+    On Postgres the candidate row is selected with ``FOR UPDATE SKIP LOCKED`` so
+    concurrent workers never wait on each other; the conditional UPDATE that marks
+    the job as running makes the claim safe on SQLite as well.
+
+    Args:
+        db (Session): The database session.
+        job_type (str): The job type to take.
+
+    Returns:
+        Optional[Job]: The claimed job, or None if no job is due.
+    """
+    now = utcnow()
+    job_id = db.execute(
+        select(Job.id)
+        .where(Job.type == job_type, Job.status == QUEUED, Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar()
+    if job_id is None:
+        db.rollback()
+        return None
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == QUEUED)
+        .values(status=RUNNING, locked_at=now, attempts=Job.attempts + 1)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    return db.get(Job, job_id)
+
+
+def complete(db: Session, job: Job) -> None:
+    """
+    Mark a job as done.
+
+    Args:
+        db (Session): The database session.
+        job (Job): The finished job.
+    """
+    job.status = DONE
+    job.locked_at = None
+    db.commit()
+
+
+def fail(db: Session, job: Job, error: str) -> None:
+    """
+    Record a failed attempt and schedule a retry with exponential backoff.
+
+    Jobs that have used up their attempts are moved to the ``dead`` status and
+    stay in the table for inspection.
+
+    Args:
+        db (Session): The database session.
+        job (Job): The failed job.
+        error (str): The error description.
+    """
+    job.last_error = error[:2000]
+    job.locked_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = DEAD
+    else:
+        backoff = min(JOB_BACKOFF_SECONDS * 2 ** (job.attempts - 1), JOB_BACKOFF_MAX_SECONDS)
+        job.status = QUEUED
+        job.run_at = utcnow() + timedelta(seconds=backoff)
+    db.commit()
+
+
+def requeue_stale(db: Session, stale_after: float) -> int:
+    """
+    Return jobs whose worker died while running them to the queue.
+
+    The attempt was counted when the job was claimed, so a job that has used up its
+    attempts is moved to the ``dead`` status instead, like a job that failed.
+
+    Args:
+        db (Session): The database session.
+        stale_after (float): The number of seconds after which a running job is considered abandoned.
+
+    Returns:
+        int: The number of requeued jobs.
+    """
+    stale = (Job.status == RUNNING, Job.locked_at < utcnow() - timedelta(seconds=stale_after))
+    db.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status=DEAD, locked_at=None, last_error="The worker stopped while running the job")
+    )
+    requeued = db.execute(
+        update(Job)
+        .where(*stale)
+        .values(status=QUEUED, locked_at=None)
+    ).rowcount
+    db.commit()
+    return requeued
@@ -0,0 +1,216 @@
+import argparse
+import time
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from src.configuration import models
+from src.configuration.database import ShardMap, shard_map
+from src.repository.contact_crud import next_change_seq
+from src.repository.contact_stats import rebuild_user_stats
+
+BATCH_SIZE = 1000
+
+
+# How far the target's change sequence starts above the source's when the
+# directory switches, so the numbers written on the target after the switch stay
+# above those a process that still routes to the source hands out meanwhile.
+SEQUENCE_GAP = 2 ** 32
+
+
+def _sequence(connection, user_id: int) -> int:
+    """
+    Read a user's change sequence on a shard.
+
+    Args:
+        connection (Connection): A connection to the shard.
+        user_id (int): The user's ID.
+
+    Returns:
+        int: The last change sequence number the shard handed out to the user.
+    """
+    value = connection.execute(select(models.ContactSequence.value)
+                               .where(models.ContactSequence.user_id == user_id)).scalar()
+    if value is not None:
+        return value
+    # Before the user's first write on this shard, the sequence starts from the highest number stored.
+    return max(connection.execute(select(func.coalesce(func.max(table.c.change_seq), 0))
+                                  .where(table.c.user_id == user_id)).scalar()
+               for table in (models.Contact.__table__, models.ContactTombstone.__table__))
+
+
+def _newer(db: Session, rows: list[dict], key: str) -> list[dict]:
+    """
+    Keep the copied rows that changed after the target's version of the same contact.
+
+    Args:
+        db (Session): A session on the target shard.
+        rows (list[dict]): Contact or tombstone rows from the source shard.
+        key (str): The column that holds the contact ID.
+
+    Returns:
+        list[dict]: The rows with a higher change sequence number than the target's contact or tombstone.
+    """
+    contacts = models.Contact.__table__
+    tombstones = models.ContactTombstone.__table__
+    ids = [row[key] for row in rows]
+    present = dict(db.execute(select(contacts.c.id, contacts.c.change_seq).where(contacts.c.id.in_(ids))).tuples().all())
+    for contact_id, change_seq in db.execute(select(tombstones.c.contact_id, tombstones.c.change_seq)
+                                             .where(tombstones.c.contact_id.in_(ids))).tuples():
+        present[contact_id] = max(present.get(contact_id) or 0, change_seq)
+    return [row for row in rows if (row["change_seq"] or 0) > (present.get(row[key]) or 0)]
+
+
+def _copy_changes(user_id: int, source, target, since: int | None = None):
+    """
+    Copy a user's contacts and tombstones changed after ``since`` from one shard to another.
+
+    A tombstone removes the contact it belongs to. When catching up, a row replaces
+    the target's contact only if its change sequence number is higher, so edits made
+    on the target after the directory switch are kept, and it takes a new number
+    from the target's sequence, so delta sync clients see it.
+
+    Args:
+        user_id (int): The user's ID.
+        source (Engine): The shard to copy from.
+        target (Engine): The shard to copy to.
+        since (int | None): The source's change sequence number before the first copy,
+            or None to copy everything.
+    """
+    contacts = models.Contact.__table__
+    tombstones = models.ContactTombstone.__table__
+    for table, key in ((contacts, contacts.c.id), (tombstones, tombstones.c.contact_id)):
+        last_key = 0
+        while True:
+            query = select(table).where(table.c.user_id == user_id, key > last_key).order_by(key).limit(BATCH_SIZE)
+            if since is not None:
+                query = query.where(table.c.change_seq > since)
+            with source.connect() as connection:
+                rows = [row._asdict() for row in connection.execute(query)]
+            if not rows:
+                break
+            last_key = rows[-1][key.name]
+            with Session(target) as db:
+                if since is not None:
+                    rows = _newer(db, rows, key.name)
+                    if rows:
+                        last_seq = next_change_seq(db, user_id, len(rows))
+                        for seq, row in enumerate(rows, start=last_seq - len(rows) + 1):
+                            row["change_seq"] = seq
+                if rows:
+                    ids = [row[key.name] for row in rows]
+                    db.execute(delete(contacts).where(contacts.c.id.in_(ids)))
+                    db.execute(delete(tombstones).where(tombstones.c.contact_id.in_(ids)))
+                    db.execute(insert(table), rows)
+                db.commit()
+
+
+def _start_sequence(user_id: int, source, target):
+    """
+    Continue a user's change sequence on the target shard ``SEQUENCE_GAP`` above the source's.
+
+    Args:
+        user_id (int): The user's ID.
+        source (Engine): The shard the user leaves.
+        target (Engine): The shard the user moves to.
+    """
+    sequences = models.ContactSequence.__table__
+    with source.connect() as connection:
+        value = _sequence(connection, user_id) + SEQUENCE_GAP
+    with target.begin() as connection:
+        connection.execute(delete(sequences).where(sequences.c.user_id == user_id))
+        connection.execute(insert(sequences).values(user_id=user_id, value=value))
+
+
+def _copy_tags(user_id: int, source, target):
+    """
+    Copy a user's tags and tag assignments that the target shard does not have yet.
+
+    Rows on the target are left alone, so tags written there after the directory
+    switch are kept.
+
+    Args:
+        user_id (int): The user's ID.
+        source (Engine): The shard to copy from.
+        target (Engine): The shard to copy to.
+    """
+    tags = models.Tag.__table__
+    links = models.ContactTag.__table__
+    user_tags = select(tags.c.id).where(tags.c.user_id == user_id)
+    with source.connect() as connection:
+        tag_rows = [row._asdict() for row in connection.execute(select(tags).where(tags.c.user_id == user_id))]
+        link_rows = [row._asdict() for row in connection.execute(select(links).where(links.c.tag_id.in_(user_tags)))]
+    with target.begin() as connection:
+        present = set(connection.execute(user_tags).scalars())
+        missing = [row for row in tag_rows if row["id"] not in present]
+        if missing:
+            connection.execute(insert(tags), missing)
+        present = set(connection.execute(select(links.c.tag_id, links.c.contact_id)
+                                          .where(links.c.tag_id.in_(user_tags))).tuples())
+        missing = [row for row in link_rows if (row["tag_id"], row["contact_id"]) not in present]
+        for start in range(0, len(missing), BATCH_SIZE):
+            connection.execute(insert(links), missing[start:start + BATCH_SIZE])
+
+
+def move_user(user_id: int, target: int, shards: ShardMap = shard_map, settle: float | None = None) -> int:
+    """
+    Move a user's contacts to another shard without stopping their writes.
+
+    The contacts are copied, the directory is switched to the target, and after
+    ``settle`` seconds, when no process routes to the old shard anymore, whatever
+    changed on it meanwhile is copied again by change sequence before the user's
+    rows are deleted from it. The catch-up takes every change numbered after the
+    source's sequence as it stood before the first copy, so changes made while
+    copying are not missed. Contact and tag IDs are unique across shards, so they
+    are kept, and the user's change sequence continues on the target
+    ``SEQUENCE_GAP`` above the source's, so delta sync tokens stay valid. Tags
+    are copied the same way, but only added: a tag removed from the old shard while
+    the directory switch settles comes back on the new one. The contact statistics
+    are recounted on the target at the end.
+
+    Args:
+        user_id (int): The user's ID.
+        target (int): The index of the destination shard.
+        shards (ShardMap): The shard map.
+        settle (float | None): The seconds to wait for cached directory entries to expire,
+            the directory TTL by default.
+
+    Returns:
+        int: The number of contacts the user has on the target shard.
+    """
+    source = shards.shard_for(user_id)
+    target_engine = shards.shards[target]
+    if source != target:
+        source_engine = shards.shards[source]
+        with source_engine.connect() as connection:
+            since = _sequence(connection, user_id)
+        _copy_changes(user_id, source_engine, target_engine)
+        _copy_tags(user_id, source_engine, target_engine)
+        _start_sequence(user_id, source_engine, target_engine)
+        shards.assign(user_id, target)
+        time.sleep(shards.ttl if settle is None else settle)
+        _copy_changes(user_id, source_engine, target_engine, since=since)
+        _copy_tags(user_id, source_engine, target_engine)
+        with source_engine.begin() as connection:
+            user_tags = select(models.Tag.id).where(models.Tag.user_id == user_id)
+            connection.execute(delete(models.ContactTag.__table__).where(models.ContactTag.tag_id.in_(user_tags)))
+            connection.execute(delete(models.Tag.__table__).where(models.Tag.user_id == user_id))
+            connection.execute(delete(models.Contact.__table__).where(models.Contact.user_id == user_id))
+            connection.execute(delete(models.ContactTombstone.__table__)
+                               .where(models.ContactTombstone.user_id == user_id))
+            connection.execute(delete(models.ContactStat.__table__).where(models.ContactStat.user_id == user_id))
+            connection.execute(delete(models.ContactSequence.__table__)
+                               .where(models.ContactSequence.user_id == user_id))
+        with Session(target_engine) as db:
+            rebuild_user_stats(db, user_id)
+    with target_engine.connect() as connection:
+        return connection.execute(select(func.count()).where(models.Contact.user_id == user_id)).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move a user's contacts to another shard.")
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("shard", type=int, help="the index of the destination shard in SHARD_DATABASE_URLS")
+    args = parser.parse_args()
+    moved = move_user(args.user_id, args.shard)
+    print(f"User {args.user_id} is on shard {args.shard} with {moved} contacts")
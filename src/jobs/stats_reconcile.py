@@ -0,0 +1,52 @@
+import argparse
+
+from sqlalchemy import select
+
+from settings import CONTACT_STATS_CHUNK_SIZE
+from src.configuration import models
+from src.configuration.database import SessionLocal
+from src.repository.checkpoints import get_checkpoint, save_checkpoint
+from src.repository.contact_stats import rebuild_user_stats
+
+CHECKPOINT = "contact_stats_reconcile"
+
+
+def reconcile_contact_stats(session_factory=SessionLocal, chunk_size: int = CONTACT_STATS_CHUNK_SIZE) -> int:
+    """
+    Recount the contact statistics of every user and repair the ones that drifted.
+
+    Users are read in chunks of ``chunk_size`` ordered by ID and recounted on their
+    shard one at a time. The last user ID of every chunk is saved as a checkpoint,
+    so a restarted run continues where the previous one stopped; a finished run
+    clears it, and the next run starts from the first user again.
+
+    Args:
+        session_factory (sessionmaker): Creates the database session.
+        chunk_size (int): The number of users read per query.
+
+    Returns:
+        int: The number of users whose statistics were repaired.
+    """
+    repaired = 0
+    with session_factory() as db:
+        last_user_id = int(get_checkpoint(db, CHECKPOINT) or 0)
+        while True:
+            user_ids = db.scalars(
+                select(models.User.id).where(models.User.id > last_user_id).order_by(models.User.id).limit(chunk_size)
+            ).all()
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                db.info["user_id"] = user_id
+                repaired += rebuild_user_stats(db, user_id)
+            db.info.pop("user_id", None)
+            last_user_id = user_ids[-1]
+            save_checkpoint(db, CHECKPOINT, str(last_user_id))
+        save_checkpoint(db, CHECKPOINT, "0")
+    return repaired
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recount the contact statistics and repair any drift.")
+    parser.parse_args()
+    print(f"Repaired the contact statistics of {reconcile_contact_stats()} users")
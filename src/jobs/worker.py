@@ -0,0 +1,175 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from pathlib import Path
+
+from fastapi_mail import FastMail, MessageSchema, MessageType
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy.orm import Session
+
+from settings import conf, JOB_CONCURRENCY, JOB_POLL_INTERVAL, JOB_STALE_SECONDS
+from src.configuration.database import SessionLocal
+from src.jobs.duplicates import save_duplicate_groups
+from src.jobs.queue import claim, complete, fail, requeue_stale
+from src.repository.users import UserService
+from src.services.email import send_email
+from src.services.tracing import extract, tracer
+from src.utils.avatars import file_digest
+
+
+async def handle_email(payload: dict, db: Session):
+    """
+    Send an email job.
+
+    Args:
+        payload (dict): ``kind`` is ``confirmation`` (with ``email``, ``username`` and ``host``)
+            or ``test`` (with ``email``).
+        db (Session): The database session.
+    """
+    if payload["kind"] == "confirmation":
+        await send_email(payload["email"], payload["username"], payload["host"])
+    elif payload["kind"] == "test":
+        message = MessageSchema(
+            subject="Fastapi mail module",
+            recipients=[payload["email"]],
+            template_body={"fullname": "Billy Jones"},
+            subtype=MessageType.html
+        )
+        await FastMail(conf).send_message(message, template_name='example_template.html')
+    else:
+        raise ValueError(f"Unknown email kind {payload['kind']!r}")
+
+
+async def handle_avatar(payload: dict, db: Session):
+    """
+    Store a spooled avatar image and make it the user's avatar.
+
+    Args:
+        payload (dict): ``user_id``, the ``path`` of the spooled upload and its ``digest``.
+        db (Session): The database session.
+    """
+    path = Path(payload["path"])
+    UserService.set_avatar(payload["user_id"], payload.get("digest") or file_digest(path), path, db)
+    path.unlink(missing_ok=True)
+
+
+async def handle_duplicates(payload: dict, db: Session):
+    """
+    Find and store the duplicate contact candidates of a user.
+
+    Args:
+        payload (dict): ``user_id``, the owner whose contacts are checked.
+        db (Session): The database session.
+    """
+    save_duplicate_groups(db, payload["user_id"])
+
+
+HANDLERS = {
+    "email": handle_email,
+    "avatar": handle_avatar,
+    "duplicates": handle_duplicates,
+}
+
+
+async def process_next(db: Session, job_type: str, handlers: dict = HANDLERS) -> bool:
+    """
+    Claim and run one job.
+
+    Args:
+        db (Session): The database session.
+        job_type (str): The job type to take.
+        handlers (dict): The handler coroutine for every job type.
+
+    Returns:
+        bool: True if a job was run, False if the queue had nothing due.
+    """
+    job = claim(db, job_type)
+    if job is None:
+        return False
+    attributes = {"job.id": job.id, "job.type": job.type, "job.attempt": job.attempts}
+    with tracer.start_as_current_span(f"job {job.type}", context=extract(job.payload), kind=SpanKind.CONSUMER,
+                                      attributes=attributes) as span:
+        try:
+            await handlers[job.type](job.payload, db)
+        except Exception as err:
+            db.rollback()
+            fail(db, job, repr(err))
+            span.record_exception(err)
+            span.set_status(Status(StatusCode.ERROR, repr(err)))
+        else:
+            complete(db, job)
+    return True
+
+
+async def work(job_type: str, stop: multiprocessing.Event):
+    """
+    Run jobs of one type until asked to stop.
+
+    Args:
+        job_type (str): The job type to take.
+        stop (multiprocessing.Event): Set by the supervisor on shutdown.
+    """
+    while not stop.is_set():
+        with SessionLocal() as db:
+            ran = await process_next(db, job_type)
+        if not ran:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+def run_worker(job_type: str, stop: multiprocessing.Event):
+    """
+    Entry point of a worker process.
+
+    Args:
+        job_type (str): The job type to take.
+        stop (multiprocessing.Event): Set by the supervisor on shutdown.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(work(job_type, stop))
+
+
+def main(concurrency: dict = JOB_CONCURRENCY):
+    """
+    Start a pool of worker processes and keep it running.
+
+    Every job type gets its own number of processes, which bounds how many jobs of
+    that type run at once. Crashed workers are restarted and jobs abandoned by them
+    are returned to the queue.
+
+    Args:
+        concurrency (dict): The number of worker processes for every job type.
+    """
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    shutdown = []
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.append(True))
+    workers = {}
+
+    def start(slot):
+        process = context.Process(target=run_worker, args=(slot[0], stop), name=f"worker-{slot[0]}-{slot[1]}")
+        process.start()
+        workers[slot] = process
+
+    for job_type, count in concurrency.items():
+        for number in range(count):
+            start((job_type, number))
+    print(f"Job worker {os.getpid()} started: {concurrency}")
+    try:
+        while not shutdown:
+            with SessionLocal() as db:
+                requeue_stale(db, JOB_STALE_SECONDS)
+            for slot, process in list(workers.items()):
+                if not process.is_alive():
+                    start(slot)
+            time.sleep(JOB_POLL_INTERVAL * 5)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    for process in workers.values():
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
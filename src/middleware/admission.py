@@ -0,0 +1,176 @@
+import asyncio
+import json
+import re
+import time
+
+from settings import (
+    ADMISSION_MAX_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER,
+    ADMISSION_ROUTE_LIMITS,
+)
+
+ROUTE_CLASSES = [
+    ("GET", re.compile(r"^/api/contacts/search/?$"), "search"),
+    ("GET", re.compile(r"^/api/contacts/?$"), "export"),
+    ("POST", re.compile(r"^/api/contacts/import/?$"), "import"),
+    ("PATCH", re.compile(r"^/api/auth/avatar/?$"), "avatar"),
+]
+
+# Long-lived streams would hold a slot for as long as the client listens.
+EXEMPT_PATHS = re.compile(r"^/api/contacts/events/?$")
+
+
+def route_class(method: str, path: str) -> str | None:
+    """
+    Find the class of an expensive route.
+
+    Args:
+        method (str): The HTTP method.
+        path (str): The request path.
+
+    Returns:
+        str | None: The route class, or None for ordinary routes.
+    """
+    for route_method, pattern, name in ROUTE_CLASSES:
+        if method == route_method and pattern.match(path):
+            return name
+    return None
+
+
+class Gate:
+    """
+    A concurrency limit with a bounded wait queue.
+
+    Up to ``limit`` holders are admitted at once and up to ``queue_size`` more may
+    wait for a slot. A request that finds the queue full, or waits past its
+    deadline, is turned away.
+    """
+
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._waiters = []
+
+    async def acquire(self, deadline: float) -> bool:
+        """
+        Wait for a slot until the deadline.
+
+        Args:
+            deadline (float): The ``time.monotonic()`` value after which to give up.
+
+        Returns:
+            bool: True if a slot was taken and must be released, False if the request is shed.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        timeout = deadline - time.monotonic()
+        if self.waiting >= self.queue_size or timeout <= 0:
+            self.shed += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                self.shed += 1
+                return False
+            # The slot was handed over just as the wait timed out; keep it.
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        """Give a slot back, handing it to the longest waiting request if there is one."""
+        if self._waiters:
+            self._waiters.pop(0).set_result(True)
+        else:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        """
+        Report the gate's load.
+
+        Returns:
+            dict: The limit, queue size, active and waiting requests, and the admitted and shed counts.
+        """
+        return {"limit": self.limit, "queue_size": self.queue_size, "active": self.active,
+                "waiting": self.waiting, "admitted": self.admitted, "shed": self.shed}
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that bounds the number of requests being worked on.
+
+    Every HTTP request needs a slot of the global gate, and requests to expensive
+    route classes (search, export, bulk import and avatar upload) also need a slot
+    of their class's gate, whose queue is as long as its limit. A request that
+    cannot get its slots within ``queue_timeout`` seconds is answered at once with
+    ``503 Service Unavailable`` and ``Retry-After``, instead of piling up behind a
+    slow database while holding a session and memory. Event streams are exempt.
+    """
+
+    def __init__(self, app, max_concurrency: int = ADMISSION_MAX_CONCURRENCY, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, retry_after: int = ADMISSION_RETRY_AFTER,
+                 route_limits: dict = ADMISSION_ROUTE_LIMITS):
+        self.app = app
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.gate = Gate(max_concurrency, queue_size)
+        self.route_gates = {name: Gate(limit, limit) for name, limit in route_limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or EXEMPT_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        deadline = time.monotonic() + self.queue_timeout
+        gates = []
+        route_gate = self.route_gates.get(route_class(scope["method"], scope["path"]))
+        try:
+            for gate in (route_gate, self.gate):
+                if gate is None:
+                    continue
+                if not await gate.acquire(deadline):
+                    await self._reject(send)
+                    return
+                gates.append(gate)
+            await self.app(scope, receive, send)
+        finally:
+            for gate in gates:
+                gate.release()
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server is overloaded, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> dict:
+        """
+        Report the load of every gate.
+
+        Returns:
+            dict: The global gate's stats under ``all`` and every route class's under its name.
+        """
+        return {"all": self.gate.stats(), **{name: gate.stats() for name, gate in self.route_gates.items()}}
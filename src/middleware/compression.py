@@ -0,0 +1,153 @@
+import zlib
+
+from settings import COMPRESSION_MINIMUM_SIZE, COMPRESSION_LEVEL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encodings() -> dict:
+    """
+    Return the supported content codings in order of preference.
+
+    Returns:
+        dict: The compressor class for every coding whose library is installed.
+    """
+    encodings = {}
+    if brotli is not None:
+        encodings["br"] = _Brotli
+    if zstandard is not None:
+        encodings["zstd"] = _Zstd
+    encodings["gzip"] = _Gzip
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, encodings: dict) -> str | None:
+    """
+    Pick the content coding for an ``Accept-Encoding`` header.
+
+    Args:
+        accept_encoding (str): The header value.
+        encodings (dict): The supported codings in order of preference.
+
+    Returns:
+        str | None: The coding with the highest client weight, ties broken by server preference,
+        or None if the client accepts none of them.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    candidates = [(weights.get(coding, wildcard), -rank, coding) for rank, coding in enumerate(encodings)]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses responses according to ``Accept-Encoding``.
+
+    Brotli and zstd are offered when their libraries are installed, gzip always.
+    Every body chunk is compressed and flushed as it passes through, so streaming
+    responses stay streaming and nothing is buffered beyond the first chunk, which
+    is held only to compare single-chunk responses against ``minimum_size``.
+    Responses that already have a ``Content-Encoding`` are left alone.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE, level: int = COMPRESSION_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        coding = choose_encoding(accept_encoding, self.encodings) if accept_encoding else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            more_body = message.get("more_body", False)
+            body = message.get("body", b"")
+            if compressor is None:
+                headers = start.get("headers", [])
+                if any(name.lower() == b"content-encoding" for name, _ in headers) or (
+                        not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = self.encodings[coding](self.level)
+                start["headers"] = [
+                    (name, value) for name, value in headers if name.lower() != b"content-length"
+                ] + [(b"content-encoding", coding.encode()), (b"vary", b"Accept-Encoding")]
+                await send(start)
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
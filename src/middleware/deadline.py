@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+import json
+import time
+
+from settings import REQUEST_TIMEOUT, REQUEST_TIMEOUT_MAX, REQUEST_ROUTE_TIMEOUTS
+from src.middleware.admission import EXEMPT_PATHS, route_class
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that gives every request a deadline.
+
+    The time allowed is ``REQUEST_TIMEOUT`` seconds, or the route class's entry in
+    ``REQUEST_ROUTE_TIMEOUTS``; a client may ask for another limit, up to
+    ``timeout_max`` seconds, with the ``X-Request-Timeout`` header. The deadline is
+    put in the request state, where ``get_db`` turns it into a statement timeout
+    for the request's database session. Work still running at the deadline is
+    cancelled and answered with ``504 Gateway Timeout``, and work for a client that
+    disconnects is cancelled at once. Once the response is complete, background
+    tasks run to the end. Event streams are exempt.
+    """
+
+    def __init__(self, app, timeout: float = REQUEST_TIMEOUT, timeout_max: float = REQUEST_TIMEOUT_MAX,
+                 route_timeouts: dict = REQUEST_ROUTE_TIMEOUTS):
+        self.app = app
+        self.timeout = timeout
+        self.timeout_max = timeout_max
+        self.route_timeouts = route_timeouts
+
+    def timeout_for(self, scope) -> float:
+        """
+        Choose the time allowed for a request.
+
+        Args:
+            scope (dict): The ASGI connection scope.
+
+        Returns:
+            float: The number of seconds.
+        """
+        requested = dict(scope["headers"]).get(TIMEOUT_HEADER)
+        if requested is not None:
+            try:
+                return min(max(float(requested), 0.0), self.timeout_max)
+            except ValueError:
+                pass
+        return self.route_timeouts.get(route_class(scope["method"], scope["path"]), self.timeout)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or EXEMPT_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        timeout = self.timeout_for(scope)
+        deadline = time.monotonic() + timeout
+        scope.setdefault("state", {})["deadline"] = deadline
+
+        # The client's messages are passed on one at a time, so request bodies are
+        # not read ahead, and a disconnect is noticed even while the app is not reading.
+        messages = asyncio.Queue(maxsize=1)
+        disconnected = asyncio.Event()
+        response = {"started": False, "complete": False}
+
+        async def listen():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                await messages.put(message)
+                if disconnected.is_set():
+                    return
+
+        async def tracking_send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        work = asyncio.ensure_future(self.app(scope, messages.get, tracking_send))
+        listener = asyncio.ensure_future(listen())
+        disconnect = asyncio.ensure_future(disconnected.wait())
+        try:
+            await asyncio.wait({work, disconnect}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not work.done() and response["complete"]:
+                await work
+            if work.done():
+                if work.cancelled() or work.exception() is None or response["started"] \
+                        or time.monotonic() < deadline:
+                    return work.result()
+                # The database gave up at the deadline.
+                await self._timeout(send)
+                return
+            work.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await work
+            if not disconnected.is_set() and not response["started"]:
+                await self._timeout(send)
+        finally:
+            listener.cancel()
+            disconnect.cancel()
+
+    async def _timeout(self, send):
+        body = json.dumps({"detail": "Request deadline exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,144 @@
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from settings import ADMIN_TOKEN, PROFILING_SAMPLE_RATE, PROFILING_INTERVAL, PROFILING_DIR
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9]+")
+
+
+class StackSampler:
+    """
+    Sample the call stack of one thread at a fixed interval.
+
+    The samples are kept as collapsed stacks (``outer;inner count``), the input
+    format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILING_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path):
+        """
+        Write the collapsed stacks to a file.
+
+        Args:
+            path (Path): The output file.
+        """
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles individual requests on demand.
+
+    A request is profiled when it carries ``X-Profile-Token`` equal to the admin
+    token, with ``X-Profile: cpu``, ``alloc`` or ``cpu,alloc``, or when it is picked
+    by the sampling rate (CPU only). The CPU profile is a stack sample of the event
+    loop thread written as ``<id>.folded``; the allocation profile is the top
+    ``tracemalloc`` differences written as ``<id>.alloc.txt``. The profile id is
+    returned in the ``X-Profile-Id`` response header. Only one request is profiled
+    at a time, and with no token and a zero sampling rate every request is passed
+    straight through.
+
+    Both profiles cover the process, not the request alone: the event loop thread
+    runs every request, so the stacks and allocations of requests handled
+    concurrently are attributed to the profiled one, and work the request hands to
+    the thread pool (sync dependencies and routes, ``run_in_threadpool``) is not
+    sampled at all. Profile on an otherwise idle instance for a clean picture.
+    """
+
+    def __init__(self, app, token: str | None = ADMIN_TOKEN, sample_rate: float = PROFILING_SAMPLE_RATE,
+                 output_dir: Path = PROFILING_DIR, top_allocations: int = 30):
+        self.app = app
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.output_dir = Path(output_dir)
+        self.top_allocations = top_allocations
+        self._busy = threading.Lock()
+
+    def _requested_modes(self, scope) -> set:
+        if self.token is not None:
+            headers = dict(scope["headers"])
+            if hmac.compare_digest(headers.get(b"x-profile-token", b""), self.token):
+                modes = headers.get(b"x-profile", b"cpu").decode().split(",")
+                return {mode.strip() for mode in modes} & {"cpu", "alloc"}
+        if self.sample_rate and random.random() < self.sample_rate:
+            return {"cpu"}
+        return set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.token is None and not self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+        modes = self._requested_modes(scope)
+        if not modes or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, modes)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send, modes):
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}{_UNSAFE_CHARS.sub('_', scope['path'])}"
+        profile_id = f"{profile_id}-{os.getpid()}-{random.randrange(16 ** 4):04x}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident()) if "cpu" in modes else None
+        trace_allocations = "alloc" in modes
+        started_tracing = trace_allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        before = tracemalloc.take_snapshot() if trace_allocations else None
+        if sampler:
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if sampler:
+                sampler.stop()
+            after = tracemalloc.take_snapshot() if trace_allocations else None
+            if started_tracing:
+                tracemalloc.stop()
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            if sampler:
+                sampler.write(self.output_dir / f"{profile_id}.folded")
+            if after is not None:
+                stats = after.compare_to(before, "lineno")[:self.top_allocations]
+                (self.output_dir / f"{profile_id}.alloc.txt").write_text("".join(f"{stat}\n" for stat in stats))
@@ -0,0 +1,20 @@
+from opentelemetry.instrumentation.asgi import OpenTelemetryMiddleware
+from opentelemetry.instrumentation.propagators import TraceResponsePropagator, set_global_response_propagator
+
+from src.services.tracing import tracer
+
+# Returns the request's trace context to the client in the ``traceresponse`` header.
+set_global_response_propagator(TraceResponsePropagator())
+
+
+class TracingMiddleware(OpenTelemetryMiddleware):
+    """
+    ASGI middleware that wraps every request in an OpenTelemetry server span.
+
+    An incoming W3C ``traceparent`` header makes the request span a child of the
+    caller's span. The spans OpenTelemetry would add for every message received
+    and sent are left out.
+    """
+
+    def __init__(self, app):
+        super().__init__(app, tracer=tracer, exclude_spans=["receive", "send"])
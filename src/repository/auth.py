@@ -2,7 +2,6 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from starlette import status
@@ -10,7 +9,10 @@ from settings import SECRET_KEY,ALGORITHM
 
 from src.configuration.database import get_db
 from src.configuration.models import User
+from src.repository.statements import USER_BY_EMAIL
 from settings import oauth2_scheme
+from src.services.hashing import pwd_context
+from src.services.tracing import tracer
 
 
 class Hash:
@@ -20,7 +22,7 @@ class Hash:
     Attributes
     ----------
     pwd_context : CryptContext
-        The context for hashing passwords, using bcrypt.
+        The shared password hashing policy from ``src.services.hashing``.
 
     Methods
     -------
@@ -30,7 +32,7 @@ class Hash:
         Returns the hashed version of the provided password.
     """
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -48,7 +50,8 @@ class Hash:
         bool
             True if the passwords match, otherwise False.
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        with tracer.start_as_current_span("auth.verify_password"):
+            return self.pwd_context.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password: str):
         """
@@ -64,7 +67,8 @@ class Hash:
         str
             The hashed password.
         """
-        return self.pwd_context.hash(password)
+        with tracer.start_as_current_span("auth.hash_password"):
+            return self.pwd_context.hash(password)
 
 
 
@@ -124,14 +128,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with tracer.start_as_current_span("auth.decode_token"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload["sub"]
         if email is None:
             raise credentials_exception
     except JWTError as e:
         raise credentials_exception
 
-    user: User = db.query(User).filter(User.email == email).first()
+    with tracer.start_as_current_span("auth.lookup_user"):
+        user: User = db.scalars(USER_BY_EMAIL, {"email": email}).first()
     if user is None:
         raise credentials_exception
+    # Routes the session's contact queries to this user's shard.
+    db.info["user_id"] = user.id
     return user
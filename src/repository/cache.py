@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from settings import CONTACT_CACHE_TTL, CONTACT_CACHE_MAX_ENTRIES, CONTACT_CACHE_MAX_BYTES
+from src.utils.kvstore import RedisStore, store
+
+
+class LRUCache:
+    """
+    Process-local least-recently-used cache with per-entry expiry.
+
+    Values are byte strings, so the cache can hold both ``max_entries`` entries and
+    ``max_bytes`` bytes at most; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int = CONTACT_CACHE_MAX_ENTRIES, max_bytes: int = CONTACT_CACHE_MAX_BYTES,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Read an entry and mark it as recently used.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[bytes]: The value, or None if the key is missing or expired.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] <= self.clock():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        """
+        Store an entry, evicting the least recently used ones to stay within bounds.
+
+        Args:
+            key (str): The key.
+            value (bytes): The value.
+            ttl (float): The number of seconds to keep the entry.
+        """
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (value, self.clock() + ttl)
+            self.size += len(value)
+            while len(self._data) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= len(item[0])
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+class ContactCache:
+    """
+    Read-through cache of contact query results, scoped by owner.
+
+    Every key contains the owner's generation number, kept in the shared key-value
+    store. A write to an owner's contacts increments that number, which retires all
+    of the owner's cached contacts and pages in every process at once while leaving
+    other owners' entries alone. Results are cached as JSON in a local ``LRUCache``
+    and, when the key-value store is shared, also in the store, so processes warm
+    each other's caches.
+    """
+
+    def __init__(self, local: LRUCache, store, shared: bool, ttl: float = CONTACT_CACHE_TTL):
+        self.local = local
+        self.store = store
+        self.shared = shared
+        self.ttl = ttl
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _generation(self, owner: int) -> int:
+        return int(self.store.get(f"contacts:generation:{owner}") or 0)
+
+    async def get_or_load(self, owner: Optional[int], kind: str, params, load: Callable[[str], Awaitable]):
+        """
+        Return a cached result, loading and caching it on a miss.
+
+        ``load`` is given the cache key, which contains the owner's generation, so
+        loads that share work between callers can key on it: a read started before
+        a write must not be shared with readers that arrive after the write.
+
+        Args:
+            owner (Optional[int]): The owner's ID; results without an owner are not cached.
+            kind (str): The name of the query.
+            params: The query parameters, JSON-serializable.
+            load (Callable[[str], Awaitable]): Runs the query and returns a JSON-serializable result.
+
+        Returns:
+            The result.
+        """
+        generation = self._generation(owner) if owner is not None else 0
+        key = f"contacts:{owner}:{generation}:{kind}:{json.dumps(params)}"
+        if owner is None or self.ttl <= 0:
+            return await load(key)
+        data = self.local.get(key)
+        if data is not None:
+            self.local_hits += 1
+            return json.loads(data)
+        if self.shared:
+            data = self.store.get(key)
+            if data is not None:
+                self.shared_hits += 1
+                self.local.set(key, data, self.ttl)
+                return json.loads(data)
+        self.misses += 1
+        result = await load(key)
+        data = json.dumps(result).encode()
+        self.local.set(key, data, self.ttl)
+        if self.shared:
+            self.store.set(key, data, self.ttl)
+        return result
+
+    def invalidate(self, owner: Optional[int]):
+        """
+        Retire every cached result of an owner.
+
+        Args:
+            owner (Optional[int]): The owner's ID.
+        """
+        if owner is None:
+            return
+        self.store.incr(f"contacts:generation:{owner}")
+        self.invalidations += 1
+
+    def clear(self):
+        """Drop the local entries and reset the counters."""
+        self.local.clear()
+        self.local_hits = self.shared_hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> dict:
+        """
+        Report the cache's effectiveness and size.
+
+        Returns:
+            dict: The hit and miss counts, the hit rate, and the local entry count, bytes and evictions.
+        """
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.shared_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self.local),
+            "bytes": self.local.size,
+            "evictions": self.local.evictions,
+        }
+
+
+contact_cache = ContactCache(LRUCache(), store, shared=isinstance(store, RedisStore))
@@ -0,0 +1,37 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from src.configuration.models import JobCheckpoint
+
+
+def get_checkpoint(db: Session, name: str) -> Optional[str]:
+    """
+    Read the saved progress of a job.
+
+    Args:
+        db (Session): The database session.
+        name (str): The checkpoint name.
+
+    Returns:
+        Optional[str]: The saved value, or None if the job has not saved any progress.
+    """
+    checkpoint = db.get(JobCheckpoint, name)
+    return checkpoint.value if checkpoint else None
+
+
+def save_checkpoint(db: Session, name: str, value: str) -> None:
+    """
+    Save the progress of a job and commit it.
+
+    Args:
+        db (Session): The database session.
+        name (str): The checkpoint name.
+        value (str): The value to save.
+    """
+    checkpoint = db.get(JobCheckpoint, name)
+    if checkpoint is None:
+        db.add(JobCheckpoint(name=name, value=value))
+    else:
+        checkpoint.value = value
+    db.commit()
@@ -1,55 +1,401 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 from settings import limiter
 from src.configuration import models
 from src import schemas
+from src.repository import contact_stats, single_flight, statements
+from src.repository.cache import contact_cache
+from src.repository.ids import id_allocator
+from src.services.change_feed import change_broker, contact_event
+from src.utils.phone import normalize_phone
+
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class ContactExists(Exception):
+    """Exception raised when the user already has a contact with this email."""
+    pass
+
+
+def _contact_values(contact: schemas.ContactBase) -> dict:
+    """
+    Build the column values for a contact, including the normalized phone number.
+
+    Args:
+        contact (schemas.ContactBase): The contact data.
+
+    Returns:
+        dict: The values to store on the contact row.
+    """
+    values = contact.dict()
+    values["phone_e164"] = normalize_phone(contact.phone_number)
+    values["birth_md"] = month_day(contact.birth_date) if contact.birth_date else None
+    return values
+
+
+def next_change_seq(db: Session, user_id: Optional[int], count: int = 1) -> int:
+    """
+    Reserve numbers from an owner's change sequence.
+
+    The owner's sequence row lives on their shard, next to the contacts it
+    numbers, and stays locked until the caller's transaction ends, so the owner's
+    changes become visible in sequence order and a sync token never skips a change
+    that commits later with a smaller number. Writes of other owners do not wait
+    for it.
+
+    Args:
+        db (Session): The database session.
+        user_id (Optional[int]): The owner's ID; contacts without an owner share sequence 0.
+        count (int): How many numbers to reserve.
+
+    Returns:
+        int: The last reserved number; the reserved range ends with it.
+    """
+    sequences = models.ContactSequence
+    owner = user_id or 0
+    value = db.execute(
+        update(sequences).where(sequences.user_id == owner)
+        .values(value=sequences.value + count).returning(sequences.value)
+    ).scalar()
+    if value is not None:
+        return value
+    start = max(db.execute(select(func.coalesce(func.max(table.change_seq), 0))
+                           .where(table.user_id == user_id)).scalar()
+                for table in (models.Contact, models.ContactTombstone))
+    dialect_insert = _DIALECT_INSERTS.get(db.get_bind(sequences.__mapper__).dialect.name)
+    if dialect_insert is None:
+        db.add(sequences(user_id=owner, value=start + count))
+        db.flush()
+        return start + count
+    # Two first writes of an owner may race; the loser adds to the winner's row.
+    statement = dialect_insert(sequences).values(user_id=owner, value=start + count)
+    return db.execute(
+        statement.on_conflict_do_update(index_elements=[sequences.user_id],
+                                        set_={"value": sequences.value + count})
+        .returning(sequences.value)
+    ).scalar()
+
+
+def _owned(statement, user_id: Optional[int]):
+    """
+    Restrict a contacts query to the contacts of one user.
+
+    Args:
+        statement (Select): The query over contacts.
+        user_id (Optional[int]): The owner's ID, or None to leave the query unrestricted.
+
+    Returns:
+        Select: The restricted query.
+    """
+    if user_id is None:
+        return statement
+    return statement.filter(models.Contact.user_id == user_id)
+
+
+def upcoming_month_days(today: date, days: int) -> list[int]:
+    """
+    List the birthdays falling within the next days as ``month * 100 + day`` numbers.
+
+    Contacts born on February 29 are included on March 1 of non-leap years.
+
+    Args:
+        today (date): The first day of the period.
+        days (int): The number of days after today to include.
+
+    Returns:
+        list[int]: The month-day numbers of the period.
+    """
+    month_days = []
+    for offset in range(days + 1):
+        day = today + timedelta(days=offset)
+        month_days.append(day.month * 100 + day.day)
+        if day.month == 3 and day.day == 1 and (day - timedelta(days=1)).day == 28:
+            month_days.append(229)
+    return month_days
+
 
-async def create_contact(db: Session, contact: schemas.ContactCreate):
+def month_day(value: date) -> int:
+    """
+    Encode a date's month and day as ``month * 100 + day``.
+
+    Args:
+        value (date): The date.
+
+    Returns:
+        int: The month-day number, for example 1231 for December 31.
+    """
+    return value.month * 100 + value.day
+
+
+def birth_month_day():
+    """
+    Return the column holding a contact's birthday as ``month * 100 + day``.
+
+    The value is stored by the repository and indexed together with the owner, so
+    birthday lookups do not have to evaluate the birth date of every contact.
+
+    Returns:
+        Column: The month-day column.
+    """
+    return models.Contact.birth_md
+
+
+async def create_contact(db: Session, contact: schemas.ContactCreate, user_id: Optional[int] = None):
     """
     Create a new contact in the database.
 
     Args:
         db (AsyncSession): The database session.
         contact (schemas.ContactCreate): The contact data to create.
+        user_id (Optional[int]): The ID of the user who owns the contact.
 
     Returns:
         models.Contact: The created contact object.
+
+    Raises:
+        ContactExists: If the user already has a contact with this email.
     """
-    db_contact = models.Contact(**contact.dict())
+    contact_id = id_allocator.allocate(db)
+    db_contact = models.Contact(**_contact_values(contact), id=contact_id, user_id=user_id,
+                                change_seq=next_change_seq(db, user_id))
     db.add(db_contact)
-    db.commit()
+    contact_stats.apply_deltas(db, user_id, contact_stats.contact_deltas(
+        added=[(db_contact.email, db_contact.birth_md)]))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ContactExists(contact.email)
     db.refresh(db_contact)
+    contact_cache.invalidate(user_id)
+    change_broker.publish(contact_event("created", db_contact))
     return db_contact
 
 
-async def get_contact(db: Session, contact_id: int):
+async def get_contact(db: Session, contact_id: int, user_id: Optional[int] = None):
     """
-    Retrieve a contact by its ID.
+    Retrieve a contact by its ID, from the cache when possible.
 
     Args:
         db (AsyncSession): The database session.
         contact_id (int): The ID of the contact to retrieve.
+        user_id (Optional[int]): The owner's ID; contacts of other users are not found.
+
+    Returns:
+        Optional[schemas.Contact]: The contact if found, else None.
+    """
+    async def load(key):
+        db_contact = _find_contact(db, contact_id, user_id)
+        return _dump(db_contact) if db_contact is not None else None
+
+    data = await contact_cache.get_or_load(user_id, "contact", contact_id, load)
+    return schemas.Contact.model_validate(data) if data is not None else None
+
+
+def _find_contact(db: Session, contact_id: int, user_id: Optional[int]) -> Optional[models.Contact]:
+    if user_id is None:
+        return db.scalars(statements.CONTACT_BY_ID, {"contact_id": contact_id}).one_or_none()
+    return db.scalars(statements.OWNED_CONTACT_BY_ID, {"contact_id": contact_id, "user_id": user_id}).one_or_none()
+
+
+def _dump(db_contact: models.Contact) -> dict:
+    return schemas.Contact.model_validate(db_contact).model_dump(mode="json")
+
+
+async def _coalesced(db: Session, user_id: Optional[int], kind: str, params, statement) -> list[schemas.Contact]:
+    """
+    Run a contacts query through the cache, sharing one execution among concurrent identical calls.
+
+    Args:
+        db (Session): The database session.
+        user_id (Optional[int]): The owner's ID.
+        kind (str): The name of the query.
+        params: The query parameters, JSON-serializable.
+        statement (Select): The read-only query over contacts.
 
     Returns:
-        Optional[models.Contact]: The contact object if found, else None.
+        list[schemas.Contact]: The contacts the query returns.
     """
-    result =  db.execute(select(models.Contact).filter(models.Contact.id == contact_id))
-    return result.scalar_one_or_none()
+    def run(session: Session):
+        return [_dump(db_contact) for db_contact in session.execute(statement).scalars()]
+
+    async def load(key):
+        return await single_flight.read(db, key, run)
+
+    return [schemas.Contact.model_validate(data) for data in await contact_cache.get_or_load(user_id, kind, params, load)]
 
-async def get_contacts(db: Session):
+
+async def create_contacts(db: Session, contacts: list[schemas.ContactCreate], user_id: Optional[int] = None):
     """
-    Retrieve all contacts from the database.
+    Create many contacts with a single multi-row INSERT.
 
     Args:
-        db (AsyncSession): The database session.
+        db (Session): The database session.
+        contacts (list[schemas.ContactCreate]): The contacts to import.
+        user_id (Optional[int]): The ID of the user who owns the contacts.
 
     Returns:
-        List[models.Contact]: A list of all contact objects.
+        list[schemas.Contact]: The created contacts.
+
+    Raises:
+        ContactExists: If two contacts share an email, or the user already has a contact with one of them;
+            nothing is imported then.
     """
-    result = db.execute(select(models.Contact))
+    if not contacts:
+        return []
+    first_id = id_allocator.allocate(db, len(contacts))
+    first_seq = next_change_seq(db, user_id, len(contacts)) - len(contacts) + 1
+    try:
+        db_contacts = db.scalars(
+            insert(models.Contact).returning(models.Contact),
+            [{**_contact_values(contact), "id": first_id + number, "user_id": user_id,
+              "change_seq": first_seq + number} for number, contact in enumerate(contacts)],
+        ).all()
+    except IntegrityError:
+        db.rollback()
+        raise ContactExists()
+    created = [schemas.Contact.model_validate(db_contact) for db_contact in db_contacts]
+    contact_stats.apply_deltas(db, user_id, contact_stats.contact_deltas(
+        added=[(db_contact.email, db_contact.birth_md) for db_contact in db_contacts]))
+    db.commit()
+    contact_cache.invalidate(user_id)
+    for contact in created:
+        change_broker.publish(contact_event("created", contact, user_id))
+    return created
+
+
+async def get_contacts_by_phone(db: Session, phone_e164: str, user_id: Optional[int] = None):
+    """
+    Retrieve contacts by their normalized phone number.
+
+    Args:
+        db (Session): The database session.
+        phone_e164 (str): The phone number in E.164 format.
+        user_id (Optional[int]): The owner's ID.
+
+    Returns:
+        List[models.Contact]: The contacts with this phone number.
+    """
+    result = db.execute(_owned(select(models.Contact).filter(models.Contact.phone_e164 == phone_e164), user_id))
     return result.scalars().all()
 
-async def update_contact(db: Session, contact_id: int, contact: schemas.ContactUpdate):
+async def get_contacts_by_ids(db: Session, contact_ids: list[int], user_id: Optional[int] = None):
+    """
+    Retrieve the contacts with the given IDs.
+
+    Args:
+        db (Session): The database session.
+        contact_ids (list[int]): The IDs of the contacts.
+        user_id (Optional[int]): The owner's ID.
+
+    Returns:
+        List[models.Contact]: The contacts that exist, ordered by ID.
+    """
+    result = db.execute(
+        _owned(select(models.Contact).filter(models.Contact.id.in_(contact_ids)), user_id).order_by(models.Contact.id)
+    )
+    return result.scalars().all()
+
+def _tagged(statement, tags: schemas.TagFilter, user_id: Optional[int]):
+    """
+    Restrict a contacts query by the owner's tags.
+
+    Each required tag becomes a semi-join on the ``contact_tags`` primary key, so
+    the database can start from the members of the smallest tag, and excluded tags
+    become anti-joins probed through the contact index of the join table.
+
+    Args:
+        statement (Select): The query over contacts.
+        tags (schemas.TagFilter): The contacts must have ``all`` of the tags, at least
+            one of the ``any`` tags, and ``none`` of the ``none`` tags. Unknown tags
+            match no contact.
+        user_id (Optional[int]): The owner's ID.
+
+    Returns:
+        Select: The restricted query.
+    """
+    links = models.ContactTag
+
+    def tag_ids(names):
+        return select(models.Tag.id).where(models.Tag.user_id == user_id, models.Tag.name.in_(names))
+
+    for name in dict.fromkeys(tags.all):
+        tag_id = tag_ids([name]).scalar_subquery()
+        statement = statement.filter(models.Contact.id.in_(select(links.contact_id).where(links.tag_id == tag_id)))
+    if tags.any:
+        statement = statement.filter(
+            models.Contact.id.in_(select(links.contact_id).where(links.tag_id.in_(tag_ids(tags.any))))
+        )
+    if tags.none:
+        statement = statement.filter(~select(links.tag_id).where(links.contact_id == models.Contact.id,
+                                                                 links.tag_id.in_(tag_ids(tags.none))).exists())
+    return statement
+
+
+async def get_contacts(db: Session, user_id: Optional[int] = None, tags: Optional[schemas.TagFilter] = None):
+    """
+    Retrieve all contacts from the database, from the cache when possible.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (Optional[int]): The owner's ID.
+        tags (Optional[schemas.TagFilter]): Only return the contacts matching these tags.
+
+    Returns:
+        List[schemas.Contact]: All contacts, sorted by last and first name.
+    """
+    statement = _owned(select(models.Contact), user_id)
+    if tags is not None:
+        statement = _tagged(statement, tags, user_id)
+    statement = statement.order_by(models.Contact.last_name, models.Contact.first_name, models.Contact.id)
+    return await _coalesced(db, user_id, "list", tags.model_dump() if tags is not None else None, statement)
+
+async def search_contacts(db: Session, query: str, user_id: Optional[int] = None):
+    """
+    Search contacts by first name, last name, or email.
+
+    Args:
+        db (Session): The database session.
+        query (str): The text to look for.
+        user_id (Optional[int]): The owner's ID.
+
+    Returns:
+        List[schemas.Contact]: The contacts that match the query.
+    """
+    pattern = f"%{query}%"
+    statement = _owned(select(models.Contact), user_id).filter(
+        (models.Contact.first_name.ilike(pattern)) |
+        (models.Contact.last_name.ilike(pattern)) |
+        (models.Contact.email.ilike(pattern))
+    )
+    return await _coalesced(db, user_id, "search", query, statement)
+
+async def get_upcoming_birthdays(db: Session, days: int = 7, user_id: Optional[int] = None, today: Optional[date] = None):
+    """
+    Retrieve contacts whose birthday falls within the next days, whatever their birth year.
+
+    Args:
+        db (Session): The database session.
+        days (int): The number of days after today to include.
+        user_id (Optional[int]): The owner's ID.
+        today (Optional[date]): The first day of the period, today by default.
+
+    Returns:
+        List[schemas.Contact]: The contacts with upcoming birthdays.
+    """
+    today = today or date.today()
+    month_days = upcoming_month_days(today, days)
+
+    statement = _owned(select(models.Contact), user_id).filter(birth_month_day().in_(month_days))
+    return await _coalesced(db, user_id, "birthdays", [days, today.isoformat()], statement)
+
+async def update_contact(db: Session, contact_id: int, contact: schemas.ContactUpdate, user_id: Optional[int] = None):
     """
     Update an existing contact in the database.
 
@@ -57,33 +403,163 @@ async def update_contact(db: Session, contact_id: int, contact: schemas.ContactU
         db (AsyncSession): The database session.
         contact_id (int): The ID of the contact to update.
         contact (schemas.ContactUpdate): The updated contact data.
+        user_id (Optional[int]): The owner's ID.
 
     Returns:
         Optional[models.Contact]: The updated contact object if found, else None.
+
+    Raises:
+        ContactExists: If the user already has another contact with this email.
     """
-    db_contact = await get_contact(db, contact_id)
+    db_contact = _find_contact(db, contact_id, user_id)
     if db_contact is None:
         return None
-    for key, value in contact.dict().items():
+    old = (db_contact.email, db_contact.birth_md)
+    for key, value in _contact_values(contact).items():
         setattr(db_contact, key, value)
-    db.commit()
+    db_contact.change_seq = next_change_seq(db, db_contact.user_id)
+    contact_stats.apply_deltas(db, db_contact.user_id, contact_stats.contact_deltas(
+        added=[(db_contact.email, db_contact.birth_md)], removed=[old]))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ContactExists(contact.email)
     db.refresh(db_contact)
+    contact_cache.invalidate(db_contact.user_id)
+    change_broker.publish(contact_event("updated", db_contact))
     return db_contact
 
-async def delete_contact(db: Session, contact_id: int):
+async def delete_contact(db: Session, contact_id: int, user_id: Optional[int] = None):
     """
     Delete a contact from the database.
 
     Args:
         db (AsyncSession): The database session.
         contact_id (int): The ID of the contact to delete.
+        user_id (Optional[int]): The owner's ID.
 
     Returns:
         Optional[models.Contact]: The deleted contact object if found, else None.
     """
-    db_contact = await get_contact(db, contact_id)
+    db_contact = _find_contact(db, contact_id, user_id)
     if db_contact is None:
         return None
     db.delete(db_contact)
+    db.execute(delete(models.ContactTag).where(models.ContactTag.contact_id == contact_id))
+    db.merge(models.ContactTombstone(contact_id=contact_id, user_id=db_contact.user_id,
+                                     change_seq=next_change_seq(db, db_contact.user_id)))
+    contact_stats.apply_deltas(db, db_contact.user_id, contact_stats.contact_deltas(
+        removed=[(db_contact.email, db_contact.birth_md)]))
     db.commit()
+    contact_cache.invalidate(db_contact.user_id)
+    change_broker.publish(contact_event("deleted", db_contact))
+    return db_contact
+
+async def merge_contacts(db: Session, keep_id: int, merge_ids: list[int], user_id: Optional[int] = None):
+    """
+    Collapse duplicate contacts into one in a single transaction.
+
+    Empty fields of the kept contact are filled from the duplicates, their
+    additional data is appended, and the duplicates are deleted.
+
+    Args:
+        db (Session): The database session.
+        keep_id (int): The ID of the contact to keep.
+        merge_ids (list[int]): The IDs of the contacts to merge into it.
+        user_id (Optional[int]): The owner's ID.
+
+    Returns:
+        Optional[models.Contact]: The kept contact, or None if any of the contacts does not exist.
+    """
+    merge_ids = [contact_id for contact_id in dict.fromkeys(merge_ids) if contact_id != keep_id]
+    contacts = {contact.id: contact for contact in await get_contacts_by_ids(db, [keep_id, *merge_ids], user_id)}
+    if len(contacts) != len(merge_ids) + 1:
+        return None
+    db_contact = contacts.pop(keep_id)
+    duplicates = [schemas.Contact.model_validate(duplicate) for duplicate in contacts.values()]
+    notes = [db_contact.additional_data] if db_contact.additional_data else []
+    removed = [(contact.email, contact.birth_md) for contact in (db_contact, *contacts.values())]
+    try:
+        last_seq = next_change_seq(db, db_contact.user_id, len(contacts) + 1)
+        for seq, duplicate in enumerate(contacts.values(), start=last_seq - len(contacts)):
+            for key in ("first_name", "last_name", "phone_number", "phone_e164", "birth_date", "birth_md"):
+                if not getattr(db_contact, key):
+                    setattr(db_contact, key, getattr(duplicate, key))
+            if duplicate.additional_data and duplicate.additional_data not in notes:
+                notes.append(duplicate.additional_data)
+            db.delete(duplicate)
+            db.merge(models.ContactTombstone(contact_id=duplicate.id, user_id=duplicate.user_id, change_seq=seq))
+        db_contact.additional_data = "\n".join(notes) or None
+        db_contact.change_seq = last_seq
+        _move_tags(db, list(contacts), keep_id)
+        contact_stats.apply_deltas(db, db_contact.user_id, contact_stats.contact_deltas(
+            added=[(db_contact.email, db_contact.birth_md)], removed=removed))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(db_contact)
+    contact_cache.invalidate(db_contact.user_id)
+    for duplicate in duplicates:
+        change_broker.publish(contact_event("deleted", duplicate, db_contact.user_id))
+    change_broker.publish(contact_event("updated", db_contact))
     return db_contact
+
+
+def _move_tags(db: Session, from_ids: list[int], to_id: int):
+    """
+    Give a contact the tags of other contacts and remove those contacts' tags.
+
+    Args:
+        db (Session): The database session.
+        from_ids (list[int]): The IDs of the contacts to take the tags from.
+        to_id (int): The ID of the contact to give the tags to.
+    """
+    links = models.ContactTag
+    kept = set(db.scalars(select(links.tag_id).where(links.contact_id == to_id)))
+    moved = set(db.scalars(select(links.tag_id).where(links.contact_id.in_(from_ids)))) - kept
+    db.execute(delete(links).where(links.contact_id.in_(from_ids)))
+    if moved:
+        db.execute(insert(links), [{"tag_id": tag_id, "contact_id": to_id} for tag_id in sorted(moved)])
+
+
+async def get_changes(db: Session, since: int = 0, limit: int = 500, user_id: Optional[int] = None) -> dict:
+    """
+    Return the contact changes of a user after a sync token.
+
+    Upserts and deletions are read from the ``(user_id, change_seq)`` indexes of the
+    contacts and tombstones tables and merged in sequence order, so the work depends
+    on the number of changes, not on the number of contacts.
+
+    Args:
+        db (Session): The database session.
+        since (int): The token returned by the previous sync, 0 for a full sync.
+        limit (int): The maximum number of changes in one page.
+        user_id (Optional[int]): The owner's ID.
+
+    Returns:
+        dict: ``upserts`` (contacts), ``deletions`` (contact IDs), the ``next`` token and
+        ``has_more`` if another page is waiting.
+    """
+    upserts = db.scalars(
+        _owned(select(models.Contact).filter(models.Contact.change_seq > since), user_id)
+        .order_by(models.Contact.change_seq).limit(limit + 1)
+    ).all()
+    tombstones = db.execute(
+        select(models.ContactTombstone.contact_id, models.ContactTombstone.change_seq)
+        .filter(models.ContactTombstone.user_id == user_id, models.ContactTombstone.change_seq > since)
+        .order_by(models.ContactTombstone.change_seq).limit(limit + 1)
+    ).all()
+    changes = sorted(
+        [(contact.change_seq, contact, None) for contact in upserts]
+        + [(seq, None, contact_id) for contact_id, seq in tombstones],
+        key=lambda change: change[0],
+    )
+    page = changes[:limit]
+    return {
+        "upserts": [contact for _, contact, _ in page if contact is not None],
+        "deletions": [contact_id for _, _, contact_id in page if contact_id is not None],
+        "next": page[-1][0] if page else since,
+        "has_more": len(changes) > limit,
+    }
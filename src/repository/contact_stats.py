@@ -0,0 +1,195 @@
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from settings import CONTACT_STATS_TOP_DOMAINS, CONTACT_STATS_CHUNK_SIZE
+from src import schemas
+from src.configuration import models
+
+TOTAL = ("total", "")
+
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def email_domain(email: Optional[str]) -> Optional[str]:
+    """
+    Extract the domain of an email address.
+
+    Args:
+        email (Optional[str]): The email address.
+
+    Returns:
+        Optional[str]: The lowercased domain, or None if the address has none.
+    """
+    if not email or "@" not in email:
+        return None
+    return email.rsplit("@", 1)[1].strip().lower() or None
+
+
+def stat_keys(email: Optional[str], birth_md: Optional[int]) -> list[tuple[str, str]]:
+    """
+    List the counters a contact adds one to.
+
+    Args:
+        email (Optional[str]): The contact's email address.
+        birth_md (Optional[int]): The contact's birthday as ``month * 100 + day``.
+
+    Returns:
+        list[tuple[str, str]]: The ``(kind, key)`` pairs of the counters.
+    """
+    keys = [TOTAL]
+    if birth_md:
+        keys.append(("birth_month", str(birth_md // 100)))
+    domain = email_domain(email)
+    if domain is not None:
+        keys.append(("email_domain", domain))
+    return keys
+
+
+def contact_deltas(added=(), removed=()) -> Counter:
+    """
+    Compute the counter changes for contacts that were added and removed.
+
+    An update is the removal of the old values and the addition of the new ones.
+
+    Args:
+        added: The ``(email, birth_md)`` pairs of the added contacts.
+        removed: The ``(email, birth_md)`` pairs of the removed contacts.
+
+    Returns:
+        Counter: The change of every affected counter by ``(kind, key)``.
+    """
+    deltas = Counter()
+    for email, birth_md in added:
+        deltas.update(stat_keys(email, birth_md))
+    for email, birth_md in removed:
+        deltas.subtract(stat_keys(email, birth_md))
+    return deltas
+
+
+def _write_counts(db: Session, user_id: int, counts: dict, add: bool):
+    """
+    Add to, or overwrite, a user's counters in one statement.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+        counts (dict): The values by ``(kind, key)``.
+        add (bool): Whether to add the values to the stored counts instead of replacing them.
+    """
+    stats = models.ContactStat
+    # A fixed order, the total first, makes concurrent writers and recounts lock the rows in the same order.
+    rows = [{"user_id": user_id, "kind": kind, "key": key, "count": count}
+            for (kind, key), count in sorted(counts.items(), key=lambda item: (item[0] != TOTAL, item[0]))]
+    dialect_insert = _DIALECT_INSERTS.get(db.get_bind(stats.__mapper__).dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(stats).values(rows)
+        value = stats.count + statement.excluded["count"] if add else statement.excluded["count"]
+        db.execute(statement.on_conflict_do_update(index_elements=[stats.user_id, stats.kind, stats.key],
+                                                   set_={"count": value}))
+        return
+    for row in rows:
+        updated = db.execute(
+            update(stats)
+            .where(stats.user_id == user_id, stats.kind == row["kind"], stats.key == row["key"])
+            .values(count=stats.count + row["count"] if add else row["count"])
+        )
+        if updated.rowcount == 0:
+            db.execute(insert(stats).values(row))
+
+
+def apply_deltas(db: Session, user_id: Optional[int], deltas: Counter):
+    """
+    Add counter changes to a user's statistics within the caller's transaction.
+
+    The user's total counter is always written, with a change of 0 if the total
+    stays the same, so every write that changes a counter takes the lock that
+    ``rebuild_user_stats`` holds while it recounts.
+
+    Args:
+        db (Session): The database session.
+        user_id (Optional[int]): The owner's ID; contacts without an owner are not counted.
+        deltas (Counter): The change of every counter by ``(kind, key)``.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if user_id is None or not deltas:
+        return
+    deltas.setdefault(TOTAL, 0)
+    _write_counts(db, user_id, deltas, add=True)
+
+
+async def get_contact_stats(db: Session, user_id: int, top_domains: int = CONTACT_STATS_TOP_DOMAINS):
+    """
+    Read a user's contact statistics from the summary table.
+
+    The cost depends on the number of counters read, not on the number of contacts.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+        top_domains (int): The number of email domains to report.
+
+    Returns:
+        schemas.ContactStats: The total, the birthdays of every month and the most common email domains.
+    """
+    stats = models.ContactStat
+    rows = db.execute(
+        select(stats.kind, stats.key, stats.count)
+        .where(stats.user_id == user_id, stats.kind.in_(("total", "birth_month")))
+    ).all()
+    domains = db.execute(
+        select(stats.key, stats.count)
+        .where(stats.user_id == user_id, stats.kind == "email_domain", stats.count > 0)
+        .order_by(stats.count.desc(), stats.key)
+        .limit(top_domains)
+    ).all()
+    counts = {(kind, key): count for kind, key, count in rows}
+    return schemas.ContactStats(
+        total=max(counts.get(TOTAL, 0), 0),
+        birthdays_by_month={month: max(counts.get(("birth_month", str(month)), 0), 0) for month in range(1, 13)},
+        email_domains={domain: count for domain, count in domains},
+    )
+
+
+def rebuild_user_stats(db: Session, user_id: int, chunk_size: int = CONTACT_STATS_CHUNK_SIZE) -> bool:
+    """
+    Recount a user's statistics from their contacts and repair the counters that drifted.
+
+    The user's total counter is locked first. Every contact write that changes a
+    counter writes the total first in its transaction, even when the total does not
+    change, so such writes wait for the recount and none is missed or counted twice.
+    The session must be pointed at the user's shard.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+        chunk_size (int): The number of contacts read at a time.
+
+    Returns:
+        bool: True if any counter was wrong.
+    """
+    stats = models.ContactStat
+    try:
+        _write_counts(db, user_id, {TOTAL: 0}, add=True)
+        stored = {(kind, key): count for kind, key, count in db.execute(
+            select(stats.kind, stats.key, stats.count).where(stats.user_id == user_id))}
+        actual = contact_deltas(added=db.execute(
+            select(models.Contact.email, models.Contact.birth_md)
+            .where(models.Contact.user_id == user_id)
+            .execution_options(yield_per=chunk_size)
+        ).tuples())
+        actual[TOTAL] += 0
+        wrong = {key: actual[key] for key in stored.keys() | actual.keys() if stored.get(key) != actual[key]}
+        for kind, key in [key for key in stored if actual[key] == 0 and key != TOTAL]:
+            db.execute(delete(stats).where(stats.user_id == user_id, stats.kind == kind, stats.key == key))
+        repaired = {key: count for key, count in wrong.items() if count or key == TOTAL}
+        if repaired:
+            _write_counts(db, user_id, repaired, add=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return bool(wrong)
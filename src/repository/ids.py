@@ -0,0 +1,94 @@
+import threading
+import weakref
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from settings import ID_BLOCK_SIZE
+from src.configuration import models
+
+COUNTER = "ids"
+
+
+def _reserve(connection, count: int) -> int:
+    """
+    Advance the ID counter of the primary database.
+
+    Args:
+        connection (Connection): A connection to the primary database.
+        count (int): How many IDs to reserve.
+
+    Returns:
+        int: The first reserved ID.
+
+    Raises:
+        IntegrityError: If another process created the counter at the same time.
+    """
+    counters = models.ChangeCounter
+    value = connection.execute(
+        update(counters).where(counters.name == COUNTER)
+        .values(value=counters.value + count).returning(counters.value)
+    ).scalar()
+    if value is not None:
+        return value - count + 1
+    # The migration creates the counter; a new database starts above the IDs it already holds.
+    start = max(connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+                for table in (models.Contact.__table__, models.Tag.__table__))
+    connection.execute(insert(counters).values(name=COUNTER, value=start + count))
+    return start + 1
+
+
+class IdAllocator:
+    """
+    Hand out contact and tag IDs that are unique across all shards.
+
+    IDs are reserved from the ``ids`` counter of the primary database in blocks
+    of ``block_size``, each in a short transaction of its own, so writers never
+    hold the counter until they commit; the IDs of a block are then handed out by
+    this process. IDs increase in the order one process hands them out, but not
+    across processes, and the rest of a block is skipped when the process exits.
+    """
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = weakref.WeakKeyDictionary()
+
+    def allocate(self, db: Session, count: int = 1) -> int:
+        """
+        Take IDs for new rows.
+
+        Call it before the transaction's first write: on SQLite the block is
+        reserved on another connection, which would wait for the session's lock.
+
+        Args:
+            db (Session): The database session.
+            count (int): How many IDs to take.
+
+        Returns:
+            int: The first of ``count`` consecutive IDs.
+        """
+        bind = db.get_bind()
+        if not isinstance(bind, Engine):
+            # A session bound to a connection reserves in its own transaction, which may roll back.
+            return _reserve(bind, count)
+        with self._lock:
+            block = self._blocks.get(bind)
+            if block is None or block[1] - block[0] < count:
+                size = max(count, self.block_size)
+                while True:
+                    try:
+                        with bind.begin() as connection:
+                            start = _reserve(connection, size)
+                        break
+                    except IntegrityError:
+                        continue
+                block = self._blocks[bind] = [start, start + size]
+            first = block[0]
+            block[0] += count
+            return first
+
+
+id_allocator = IdAllocator()
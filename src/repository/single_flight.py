@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Hashable
+
+from sqlalchemy.orm import Session
+
+from settings import SINGLE_FLIGHT_GRACE
+
+MAX_RECENT = 1000
+
+
+class SingleFlight:
+    """
+    Share one execution of an identical read among concurrent callers.
+
+    The first caller for a key starts the work as a task of its own; callers that
+    arrive while it runs await the same task instead of repeating the query. Each
+    caller awaits through ``asyncio.shield``, so a caller that is cancelled, for
+    example because its client disconnected, does not cancel the work for the
+    others. A successful result is kept for ``grace`` seconds after it completes,
+    so callers arriving just behind the herd are served too; errors are not kept.
+    """
+
+    def __init__(self, grace: float = SINGLE_FLIGHT_GRACE, clock=time.monotonic):
+        self.grace = grace
+        self.clock = clock
+        self.executions = 0
+        self.shared = 0
+        self._flights = {}
+        self._recent = {}
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable]):
+        """
+        Run ``work`` for a key unless an identical call is running or just finished.
+
+        Args:
+            key (Hashable): Identifies identical calls, for example owner, query name and parameters.
+            work (Callable[[], Awaitable]): Starts the read; its result must not be mutated by callers.
+
+        Returns:
+            The result of the shared execution.
+        """
+        recent = self._recent.get(key)
+        if recent is not None:
+            if recent[0] > self.clock():
+                self.shared += 1
+                return recent[1]
+            del self._recent[key]
+        task = self._flights.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(work())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if self.grace > 0 and not task.cancelled() and task.exception() is None:
+            now = self.clock()
+            if len(self._recent) >= MAX_RECENT:
+                self._recent = {key: item for key, item in self._recent.items() if item[0] > now}
+            self._recent[key] = (now + self.grace, task.result())
+
+
+def clone_session(db: Session) -> Session:
+    """
+    Open a new session like ``db``, for work that may outlive the caller's session.
+
+    Args:
+        db (Session): The caller's session.
+
+    Returns:
+        Session: A session of the same class, bound to the same database and routed to the same shard.
+    """
+    session = type(db)(bind=db.bind)
+    session.info.update(db.info)
+    return session
+
+
+async def read(db: Session, key: Hashable, query: Callable[[Session], object]):
+    """
+    Run a read-only query once for all concurrent identical callers.
+
+    The query runs in a worker thread on a clone of the caller's session, so it
+    neither blocks the event loop nor depends on the session of the caller that
+    happened to start it.
+
+    Args:
+        db (Session): The caller's session.
+        key (Hashable): Identifies identical queries, including the owner; the database is added to it.
+        query (Callable[[Session], object]): Runs the query and returns plain data.
+
+    Returns:
+        The query's result, shared between the callers.
+    """
+    def run():
+        with clone_session(db) as session:
+            return query(session)
+
+    return await single_flight.do((db.bind, key), lambda: asyncio.to_thread(run))
+
+
+single_flight = SingleFlight()
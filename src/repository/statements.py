@@ -0,0 +1,14 @@
+from sqlalchemy import bindparam, select
+
+from src.configuration import models
+
+# Statements that run on nearly every request, built once at import. Executing
+# the same statement object with new parameter values skips building the
+# construct and finds the compiled SQL in the engine's cache at once; the SQL
+# text never changes, so psycopg 3 can also prepare it on the server.
+
+USER_BY_EMAIL = select(models.User).where(models.User.email == bindparam("email"))
+
+CONTACT_BY_ID = select(models.Contact).where(models.Contact.id == bindparam("contact_id"))
+
+OWNED_CONTACT_BY_ID = CONTACT_BY_ID.where(models.Contact.user_id == bindparam("user_id"))
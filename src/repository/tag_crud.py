@@ -0,0 +1,189 @@
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.configuration import models
+from src.repository.cache import contact_cache
+from src.repository.contact_crud import _DIALECT_INSERTS, _find_contact
+from src.repository.ids import id_allocator
+
+
+class TagExists(Exception):
+    """Exception raised when the user already has a tag with this name."""
+    pass
+
+
+async def get_tags(db: Session, user_id: int):
+    """
+    Retrieve the tags of a user.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The owner's ID.
+
+    Returns:
+        List[models.Tag]: The tags, sorted by name.
+    """
+    return db.scalars(select(models.Tag).where(models.Tag.user_id == user_id).order_by(models.Tag.name)).all()
+
+
+def _find_tag(db: Session, tag_id: int, user_id: int) -> Optional[models.Tag]:
+    return db.scalars(select(models.Tag).where(models.Tag.id == tag_id, models.Tag.user_id == user_id)).first()
+
+
+async def create_tag(db: Session, name: str, user_id: int):
+    """
+    Create a tag.
+
+    The ID is unique across shards, so tags keep their IDs when their owner moves
+    to another shard.
+
+    Args:
+        db (Session): The database session.
+        name (str): The tag's name.
+        user_id (int): The owner's ID.
+
+    Returns:
+        models.Tag: The created tag.
+
+    Raises:
+        TagExists: If the user already has a tag with this name.
+    """
+    tag = models.Tag(id=id_allocator.allocate(db), user_id=user_id, name=name)
+    db.add(tag)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise TagExists(name)
+    db.refresh(tag)
+    return tag
+
+
+async def rename_tag(db: Session, tag_id: int, name: str, user_id: int):
+    """
+    Rename a tag.
+
+    Args:
+        db (Session): The database session.
+        tag_id (int): The ID of the tag.
+        name (str): The new name.
+        user_id (int): The owner's ID.
+
+    Returns:
+        Optional[models.Tag]: The renamed tag, or None if it does not exist.
+
+    Raises:
+        TagExists: If the user already has a tag with this name.
+    """
+    tag = _find_tag(db, tag_id, user_id)
+    if tag is None:
+        return None
+    tag.name = name
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise TagExists(name)
+    db.refresh(tag)
+    contact_cache.invalidate(user_id)
+    return tag
+
+
+async def delete_tag(db: Session, tag_id: int, user_id: int):
+    """
+    Delete a tag and remove it from every contact.
+
+    Args:
+        db (Session): The database session.
+        tag_id (int): The ID of the tag.
+        user_id (int): The owner's ID.
+
+    Returns:
+        Optional[models.Tag]: The deleted tag, or None if it does not exist.
+    """
+    tag = _find_tag(db, tag_id, user_id)
+    if tag is None:
+        return None
+    db.execute(delete(models.ContactTag).where(models.ContactTag.tag_id == tag_id))
+    db.delete(tag)
+    db.commit()
+    contact_cache.invalidate(user_id)
+    return tag
+
+
+async def get_contact_tags(db: Session, contact_id: int, user_id: int):
+    """
+    Retrieve the tags of a contact.
+
+    Args:
+        db (Session): The database session.
+        contact_id (int): The ID of the contact.
+        user_id (int): The owner's ID.
+
+    Returns:
+        Optional[List[models.Tag]]: The tags sorted by name, or None if the contact does not exist.
+    """
+    if _find_contact(db, contact_id, user_id) is None:
+        return None
+    return db.scalars(
+        select(models.Tag).join(models.ContactTag, models.ContactTag.tag_id == models.Tag.id)
+        .where(models.ContactTag.contact_id == contact_id).order_by(models.Tag.name)
+    ).all()
+
+
+async def tag_contact(db: Session, contact_id: int, tag_id: int, user_id: int) -> bool:
+    """
+    Add a tag to a contact; adding it again changes nothing.
+
+    The link is inserted with ``ON CONFLICT DO NOTHING``, so concurrent requests
+    adding the same tag both succeed.
+
+    Args:
+        db (Session): The database session.
+        contact_id (int): The ID of the contact.
+        tag_id (int): The ID of the tag.
+        user_id (int): The owner's ID.
+
+    Returns:
+        bool: False if the contact or the tag does not exist.
+    """
+    if _find_contact(db, contact_id, user_id) is None or _find_tag(db, tag_id, user_id) is None:
+        return False
+    links = models.ContactTag
+    dialect_insert = _DIALECT_INSERTS.get(db.get_bind(links.__mapper__).dialect.name)
+    if dialect_insert is not None:
+        db.execute(dialect_insert(links).values(tag_id=tag_id, contact_id=contact_id).on_conflict_do_nothing())
+        db.commit()
+    else:
+        try:
+            db.execute(insert(links).values(tag_id=tag_id, contact_id=contact_id))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    contact_cache.invalidate(user_id)
+    return True
+
+
+async def untag_contact(db: Session, contact_id: int, tag_id: int, user_id: int) -> bool:
+    """
+    Remove a tag from a contact.
+
+    Args:
+        db (Session): The database session.
+        contact_id (int): The ID of the contact.
+        tag_id (int): The ID of the tag.
+        user_id (int): The owner's ID.
+
+    Returns:
+        bool: False if the contact or the tag does not exist.
+    """
+    if _find_contact(db, contact_id, user_id) is None or _find_tag(db, tag_id, user_id) is None:
+        return False
+    db.execute(delete(models.ContactTag).where(models.ContactTag.contact_id == contact_id,
+                                               models.ContactTag.tag_id == tag_id))
+    db.commit()
+    contact_cache.invalidate(user_id)
+    return True
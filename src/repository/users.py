@@ -1,11 +1,15 @@
+
 from src.schemas import UserModel
 from src.repository.auth import Hash, create_access_token
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from src.configuration.models import User
 from typing import Optional,Union,Dict
-from fastapi import UploadFile
-from src.utils.cloudinary import upload_file_to_cloudinary
+from src.repository.statements import USER_BY_EMAIL
+from src.utils.avatars import avatar_store
 
 hash_handler = Hash()
 
@@ -23,6 +27,9 @@ class LoginFailed(Exception):
     pass 
 
 
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
 class UserService:
     """
     Service class for handling user-related operations.
@@ -40,8 +47,7 @@ class UserService:
         Returns:
             Optional[User]: The user object if found, else None.
         """
-        user = db.query(User).filter(User.email == username).first()
-        return user
+        return db.scalars(USER_BY_EMAIL, {"email": username}).first()
 
 
     @staticmethod
@@ -61,22 +67,45 @@ class UserService:
             raise UsernameToken
         
     @staticmethod
-    def create_new_user(body:UserModel, db: Session) -> Optional[Dict]:
+    def create_new_user(body:UserModel, db: Session, commit: bool = True) -> Optional[Dict]:
         """
         Create a new user.
 
+        A taken email is rejected with an indexed lookup before the password is hashed,
+        so repeated signups with an existing email do not cost a bcrypt hash each. The
+        user is then inserted with ``INSERT ... ON CONFLICT DO NOTHING RETURNING``, so
+        concurrent signups with the same email that both pass the lookup cannot both
+        succeed.
+
         Args:
             body (UserModel): The user data.
             db (Session): The database session.
+            commit (bool): Whether to commit the user at once; with False the caller commits it
+                together with its own writes.
 
         Returns:
             Optional[Dict]: The newly created user object.
+
+        Raises:
+            UsernameToken: If a user with the given email already exists.
         """
-        UserService.check_user_available(username=body.email, db=db)
-        new_user = User(username=body.username,email=body.email,password=hash_handler.get_password_hash(body.password))
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        UserService.check_user_available(body.email, db)
+        values = {"username": body.username, "email": body.email,
+                  "password": hash_handler.get_password_hash(body.password)}
+        dialect_insert = _DIALECT_INSERTS.get(db.get_bind().dialect.name)
+        if dialect_insert is not None:
+            statement = dialect_insert(User).values(**values).on_conflict_do_nothing(index_elements=[User.email])
+            new_user = db.scalars(statement.returning(User)).first()
+        else:
+            try:
+                new_user = db.scalars(insert(User).values(**values).returning(User)).first()
+            except IntegrityError:
+                db.rollback()
+                new_user = None
+        if new_user is None:
+            raise UsernameToken
+        if commit:
+            db.commit()
         return new_user
 
     
@@ -129,22 +158,32 @@ class UserService:
         Returns:
             User: The user object.
         """
-        return db.query(User).filter(User.email == email).first()
+        return db.scalars(USER_BY_EMAIL, {"email": email}).first()
 
     @staticmethod
-    def confirmed_email(email: str, db: Session) -> None:
+    def confirmed_email(email: str, db: Session) -> bool:
         """
         Confirm the email of a user.
 
         Args:
             email (str): The email to confirm.
             db (Session): The database session.
+
+        Returns:
+            bool: True if the email was confirmed now, False if the user does not exist
+            or was already confirmed.
         """
-        user = UserService.get_user_by_email(email, db)
-        user.confirmed = True
+        confirmed = db.execute(
+            update(User)
+            .where(User.email == email, User.confirmed.isnot(True))
+            .values(confirmed=True)
+            .returning(User.id)
+        ).first()
         db.commit()
+        return confirmed is not None
 
-    def update_token(user: User, token: Union[str, None], db: Session) -> None:
+    @staticmethod
+    def update_token(user: User, token: Union[str, None], db: Session, password_hash: Optional[str] = None) -> None:
         """
         Update the refresh token of a user.
 
@@ -152,43 +191,63 @@ class UserService:
             user (User): The user object.
             token (Union[str, None]): The new refresh token.
             db (Session): The database session.
+            password_hash (Optional[str]): A rehashed password to store in the same statement.
         """
-        user.refresh_token = token
+        values = {"refresh_token": token}
+        if password_hash is not None:
+            values["password"] = password_hash
+        db.execute(update(User).where(User.id == user.id).values(**values))
         db.commit()
 
     @staticmethod
-    def save_user(user_to_save: User, db: Session) -> User:
+    def rotate_refresh_token(email: str, old_token: str, new_token: str, db: Session) -> bool:
         """
-        Save the user to the database.
+        Replace a refresh token only if it is still the current one.
 
         Args:
-            user_to_save (User): The user object to save.
+            email (str): The email of the user.
+            old_token (str): The refresh token presented by the client.
+            new_token (str): The new refresh token.
             db (Session): The database session.
 
         Returns:
-            User: The saved user object.
+            bool: True if the token was replaced, False if the old token is not current.
         """
-        db.add(user_to_save)
+        rotated = db.execute(
+            update(User)
+            .where(User.email == email, User.refresh_token == old_token)
+            .values(refresh_token=new_token)
+            .returning(User.id)
+        ).first()
         db.commit()
-        db.refresh(user_to_save)
-        return user_to_save
+        return rotated is not None
 
     @staticmethod
-    def update_avatar(user: User, file: UploadFile,db: Session):
+    def set_avatar(user_id: int, digest: str, path, db: Session, store=None) -> bool:
         """
-        Update the avatar of a user.
+        Store an avatar image under its digest and make it the user's avatar.
+
+        Images are stored once per content: an image that some user already has, or
+        that the store already holds, is not uploaded again.
 
         Args:
-            user (User): The user object.
-            file (UploadFile): The uploaded file object.
+            user_id (int): The user's ID.
+            digest (str): The SHA-256 digest of the image.
+            path (Path): The image file.
             db (Session): The database session.
+            store: The avatar store, the configured one by default.
 
         Returns:
-            User: The updated user object with the new avatar.
+            bool: True if the image was uploaded, False if it was already stored.
         """
-        user.avatar = upload_file_to_cloudinary(file.file, f'user_avatar{user.id}')
-        UserService.save_user(user,db)
-        return user
+        store = store or avatar_store
+        known = db.query(User.id).filter(User.avatar_hash == digest).first() is not None
+        uploaded = not known and not store.exists(digest)
+        if uploaded:
+            store.put(digest, path)
+        db.execute(update(User).where(User.id == user_id).values(avatar=store.url(digest), avatar_hash=digest))
+        db.commit()
+        return uploaded
 
 
 
@@ -1,17 +1,22 @@
+import math
+import uuid
+
 from fastapi import (
     APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request,UploadFile, File
 )
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
-from fastapi_mail import MessageSchema,FastMail,MessageType
 
 from src.configuration.models import User
 from src.configuration.database import get_db
-from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail,UserDisplayModel
-from src.repository.users import UserService 
+from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail,UserDisplayModel,AvatarModel
+from src.repository.users import UserService, UsernameToken
 from src.services.auth import auth_service
-from src.services.email import send_email
-from settings import limiter,conf
+from src.services.login_throttle import login_throttle
+from src.jobs.queue import enqueue
+from src.utils.avatars import avatar_urls, spool
+from settings import limiter,AVATAR_SPOOL_DIR
+from slowapi.util import get_remote_address
 
 
 
@@ -21,13 +26,12 @@ security = HTTPBearer()
 
 @router.post("/signup", response_model=UserResponse,response_model_include={'email','detail'}, status_code=status.HTTP_201_CREATED)
 # @limiter.limit('1/minute')
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: Session = Depends(get_db)):
     """
-    Register a new user.
+    Register a new user and queue the confirmation email.
 
     Args:
         body (UserModel): The user data for registration.
-        background_tasks (BackgroundTasks): Background tasks for sending email.
         request (Request): The request object.
         db (Session): The database session.
 
@@ -37,12 +41,14 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     Raises:
         HTTPException: If the user already exists.
     """
-    exist_user = UserService.get_user_by_email(body.email, db)
-    if exist_user:
+    try:
+        new_user = UserService.create_new_user(body, db, commit=False)
+    except UsernameToken:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = UserService.create_new_user(body, db)
-    background_tasks.add_task(send_email, new_user.email,new_user.username, request.base_url)
+    # One transaction, so a user is never created without their confirmation email queued.
+    enqueue(db, "email", {"kind": "confirmation", "email": new_user.email, "username": new_user.username,
+                          "host": str(request.base_url)}, commit=False)
+    db.commit()
     return new_user
 
 
@@ -61,19 +67,32 @@ async def login(request: Request, body: OAuth2PasswordRequestForm = Depends(), d
         TokenModel: The access and refresh tokens.
 
     Raises:
-        HTTPException: If the user is not found, email not confirmed, or password is incorrect.
+        HTTPException: If the user is not found, email not confirmed, or password is incorrect,
+            or with status 429 if the account or the client is locked after repeated failures.
     """
+    ip = get_remote_address(request)
+    retry_after = login_throttle.check(body.username, ip)
+    if retry_after:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many failed login attempts",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    if login_throttle.is_malformed(body.username, body.password):
+        login_throttle.record_failure(body.username, ip)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     user = UserService.get_user_by_email(body.username, db)
     if user is None:
+        login_throttle.record_failure(body.username, ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if auth_service.verify_password(body.password, user.password):
+    verified, new_hash = auth_service.verify_and_update(body.password, user.password)
+    if not verified:
+        login_throttle.record_failure(body.username, ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    login_throttle.record_success(body.username)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    UserService.update_token(user, refresh_token, db)
+    UserService.update_token(user, refresh_token, db, password_hash=new_hash)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
@@ -90,17 +109,18 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
         TokenModel: The new access and refresh tokens.
 
     Raises:
-        HTTPException: If the refresh token is invalid.
+        HTTPException: If the refresh token is invalid. Reusing a replaced refresh token
+            revokes the current one as well.
     """
     token = credentials.credentials
-    email = auth_service.decode_refresh_token(token)
-    user = UserService.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        UserService.update_token(user, None, db)
+    email = await auth_service.decode_refresh_token(token)
+    access_token = await auth_service.create_access_token(data={"sub": email})
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
+    if not UserService.rotate_refresh_token(email, token, refresh_token, db):
+        user = UserService.get_user_by_email(email, db)
+        if user is not None:
+            UserService.update_token(user, None, db)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-    access_token = auth_service.create_access_token(data={"sub": email})
-    refresh_token = auth_service.create_refresh_token(data={"sub": email})
-    UserService.update_token(user, refresh_token, db)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
@@ -120,13 +140,11 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
         HTTPException: If the verification fails.
     """
     email = await auth_service.get_email_from_token(token)
-    user = UserService.get_user_by_email(email, db)
-    if user is None:
+    if UserService.confirmed_email(email, db):
+        return {"message": "Email confirmed"}
+    if UserService.get_user_by_email(email, db) is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error")
-    if user.confirmed:
-        return {"message": "Your email is already confirmed"}
-    UserService.confirmed_email(email, db)
-    return {"message": "Email confirmed"}
+    return {"message": "Your email is already confirmed"}
 
 
 @router.post('/request_email')
@@ -152,33 +170,31 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
 
 @router.post("/send_test_email")
 # @limiter.limit('1/minute')
-async def send_test_email(request : Request ,email_to_send: str, background_tasks: BackgroundTasks):
+async def send_test_email(request : Request ,email_to_send: str, db: Session = Depends(get_db)):
     """
-    Send a test email.
+    Queue a test email.
 
     Args:
         request (Request): The request object.
         email_to_send (str): The email address to send the test email to.
-        background_tasks (BackgroundTasks): Background tasks for sending email.
+        db (Session): The database session.
 
     Returns:
-        Dict: A message indicating the email has been sent.
-    """
-    message = MessageSchema(
-        subject="Fastapi mail module",
-        recipients=[email_to_send],
-        template_body={"fullname": "Billy Jones"},
-        subtype=MessageType.html
-    )
-    fm = FastMail(conf)
-    background_tasks.add_task(fm.send_message, message,template_name='example_template.html')
+        Dict: A message indicating the email has been queued.
+    """
+    enqueue(db, "email", {"kind": "test", "email": email_to_send})
     return {"message": "email has been sent"}
 
-@router.patch('/avatar', response_model=UserDisplayModel)
+@router.patch('/avatar', status_code=status.HTTP_202_ACCEPTED)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
                              db: Session = Depends(get_db)):
     """
-    Update the user's avatar.
+    Queue the upload of a new avatar for the user.
+
+    The image is spooled to local disk and hashed on receipt. An image identical
+    to the current avatar is dropped; any other is stored by the job worker, which
+    skips the upload when the same image is already stored and then sets the
+    user's avatar URL.
 
     Args:
         file (UploadFile): The uploaded file object.
@@ -186,7 +202,28 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
         db (Session): The database session.
 
     Returns:
-        UserDisplayModel: The updated user object with the new avatar.
+        Dict: A message indicating whether the avatar update has been queued.
+    """
+    AVATAR_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    path = AVATAR_SPOOL_DIR / f"{current_user.id}-{uuid.uuid4().hex}"
+    digest = spool(file.file, path)
+    if digest == current_user.avatar_hash:
+        path.unlink(missing_ok=True)
+        return {"message": "Avatar unchanged"}
+    enqueue(db, "avatar", {"user_id": current_user.id, "path": str(path), "digest": digest})
+    return {"message": "Avatar update queued"}
+
+
+@router.get('/avatar', response_model=AvatarModel)
+async def get_avatar(current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Get the URLs of the user's avatar and its variants.
+
+    Args:
+        current_user (User): The current authenticated user.
+
+    Returns:
+        AvatarModel: The avatar URL and the URL of every variant, empty without an avatar.
     """
-    user = UserService.update_avatar(current_user,file,db)
-    return user
\ No newline at end of file
+    variants = avatar_urls(current_user.avatar_hash) if current_user.avatar_hash else {}
+    return {"avatar": current_user.avatar, "variants": variants}
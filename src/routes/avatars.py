@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Path, status
+from fastapi.responses import FileResponse
+
+from src.utils import avatars
+
+router = APIRouter(prefix='/avatars', tags=["avatars"])
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@router.get('/{digest}/{variant}')
+async def get_avatar_variant(digest: str = Path(pattern="^[0-9a-f]{64}$"), variant: str = Path()):
+    """
+    Serve an avatar variant kept by the local avatar store.
+
+    The URL names the image by its content digest, so the response never changes
+    and clients and proxies may cache it forever.
+
+    Args:
+        digest (str): The SHA-256 digest of the image.
+        variant (str): The variant name.
+
+    Returns:
+        FileResponse: The image.
+
+    Raises:
+        HTTPException: If avatars are not stored locally, or the image or variant does not exist.
+    """
+    store = avatars.avatar_store
+    if not isinstance(store, avatars.LocalAvatarStore) or variant not in store.variants:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    path = store.path(digest, variant)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    with path.open("rb") as file:
+        media_type = avatars.media_type(file.read(16))
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": IMMUTABLE})
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException,Request
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException,Request,Response,Query,WebSocket,WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from src.configuration import database,models
-from src.repository import contact_crud
+from src.repository import contact_crud, contact_stats
 from src.repository.auth import get_current_user
+from src.repository.cache import contact_cache
+from src.repository.contact_crud import ContactExists
+from src.services.autocomplete import contact_index
+from src.services.change_feed import OVERFLOW, change_broker, sse_events
+from src.utils.phone import normalize_phone
+from src.utils.content import MSGPACK_RESPONSES, negotiate
+from src.jobs.duplicates import get_duplicate_groups, request_duplicate_scan
 from src.configuration.models import User
 from src import schemas
-from sqlalchemy import select
-from datetime import datetime,timedelta
-from settings import limiter
+from settings import limiter,ADMIN_TOKEN,AUTOCOMPLETE_MAX_RESULTS,CHANGE_FEED_HEARTBEAT
 
 
 
@@ -27,25 +35,60 @@ async def create_contact(request: Request,contact: schemas.ContactCreate, db: Se
 
     Returns:
         schemas.Contact: The newly created contact.
+
+    Raises:
+        HTTPException: If the user already has a contact with this email.
     """
-    return await contact_crud.create_contact(db=db, contact=contact)
+    try:
+        return await contact_crud.create_contact(db=db, contact=contact, user_id=user.id)
+    except ContactExists:
+        raise HTTPException(status_code=409, detail="Contact with this email already exists")
 
-@router_contacts.get("/contacts/", response_model=list[schemas.Contact])
+@router_contacts.post("/contacts/import/", response_model=list[schemas.Contact],status_code=201)
 @limiter.limit('5/minute')
-async def read_contacts(request: Request,db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+async def import_contacts(request: Request,contacts: list[schemas.ContactCreate], db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
     """
-    Retrieve all contacts.
+    Create many contacts at once.
 
     Args:
         request (Request): The request object.
+        contacts (list[schemas.ContactCreate]): The contacts to import.
         db (Session): The database session.
         user (User): The current authenticated user.
 
     Returns:
-        List[schemas.Contact]: A list of contacts.
+        List[schemas.Contact]: The created contacts.
+
+    Raises:
+        HTTPException: If an email repeats in the import or the user already has a contact with it.
+    """
+    try:
+        return await contact_crud.create_contacts(db=db, contacts=contacts, user_id=user.id)
+    except ContactExists:
+        raise HTTPException(status_code=409, detail="Contact with this email already exists")
+
+@router_contacts.get("/contacts/", response_model=list[schemas.Contact], responses=MSGPACK_RESPONSES)
+@limiter.limit('5/minute')
+async def read_contacts(request: Request, tag: list[str] = Query([]), any_tag: list[str] = Query([]),
+                        not_tag: list[str] = Query([]), db: Session = Depends(database.get_db),
+                        user: User=Depends(get_current_user)):
     """
-    contacts = await contact_crud.get_contacts(db=db)
-    return contacts
+    Retrieve all contacts, optionally filtered by tags.
+
+    Args:
+        request (Request): The request object.
+        tag (list[str]): Only return contacts that have all of these tags.
+        any_tag (list[str]): Only return contacts that have at least one of these tags.
+        not_tag (list[str]): Leave out contacts that have any of these tags.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        List[schemas.Contact]: A list of contacts, as MessagePack if the client accepts ``application/msgpack``.
+    """
+    tags = schemas.TagFilter(all=tag, any=any_tag, none=not_tag) if tag or any_tag or not_tag else None
+    contacts = await contact_crud.get_contacts(db=db, user_id=user.id, tags=tags)
+    return negotiate(request, contacts, schemas.Contact)
 
 @router_contacts.get("/contacts/{contact_id}")
 @limiter.limit('5/minute')
@@ -65,7 +108,7 @@ async def read_contact(request: Request,contact_id: int, db: Session = Depends(d
     Raises:
         HTTPException: If the contact is not found.
     """
-    db_contact = await contact_crud.get_contact(db=db, contact_id=contact_id)
+    db_contact = await contact_crud.get_contact(db=db, contact_id=contact_id, user_id=user.id)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
@@ -87,9 +130,12 @@ async def update_contact(request: Request,contact_id: int, contact: schemas.Cont
         schemas.Contact: The updated contact.
 
     Raises:
-        HTTPException: If the contact is not found.
+        HTTPException: If the contact is not found, or the user has another contact with this email.
     """
-    db_contact = await contact_crud.update_contact(db=db, contact_id=contact_id, contact=contact)
+    try:
+        db_contact = await contact_crud.update_contact(db=db, contact_id=contact_id, contact=contact, user_id=user.id)
+    except ContactExists:
+        raise HTTPException(status_code=409, detail="Contact with this email already exists")
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
@@ -112,13 +158,13 @@ async def delete_contact(request: Request,contact_id: int, db: Session = Depends
     Raises:
         HTTPException: If the contact is not found.
     """
-    db_contact = await contact_crud.delete_contact(db=db, contact_id=contact_id)
+    db_contact = await contact_crud.delete_contact(db=db, contact_id=contact_id, user_id=user.id)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
 
 
-@router_contacts.get("/contacts/search/", response_model=list[schemas.Contact])
+@router_contacts.get("/contacts/search/", response_model=list[schemas.Contact], responses=MSGPACK_RESPONSES)
 @limiter.limit('5/minute')
 async def search_contacts(request: Request,query: str, db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
     """
@@ -131,19 +177,139 @@ async def search_contacts(request: Request,query: str, db: Session = Depends(dat
         user (User): The current authenticated user.
 
     Returns:
-        List[schemas.Contact]: A list of contacts that match the search query.
+        List[schemas.Contact]: A list of contacts that match the search query, as MessagePack if requested.
+    """
+    contacts = await contact_crud.search_contacts(db=db, query=query, user_id=user.id)
+    return negotiate(request, contacts, schemas.Contact)
+
+@router_contacts.get("/contacts/by_phone/{number}", response_model=list[schemas.Contact], responses=MSGPACK_RESPONSES)
+@limiter.limit('60/minute')
+async def contacts_by_phone(request: Request,number: str, db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+    """
+    Find contacts by phone number, whatever format it is written in.
+
+    Args:
+        request (Request): The request object.
+        number (str): The phone number to look up.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        List[schemas.Contact]: The contacts with this phone number, as MessagePack if requested.
+
+    Raises:
+        HTTPException: If the phone number cannot be normalized.
+    """
+    phone_e164 = normalize_phone(number)
+    if phone_e164 is None:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
+    contacts = await contact_crud.get_contacts_by_phone(db=db, phone_e164=phone_e164, user_id=user.id)
+    return negotiate(request, contacts, schemas.Contact)
+
+@router_contacts.get("/contacts/autocomplete/", response_model=list[schemas.ContactSuggestion])
+@limiter.limit('120/minute')
+async def autocomplete_contacts(request: Request, q: str = Query(min_length=1), limit: int = Query(AUTOCOMPLETE_MAX_RESULTS, ge=1, le=AUTOCOMPLETE_MAX_RESULTS), user: User=Depends(get_current_user)):
+    """
+    Suggest contacts whose first name, last name or email starts with the typed prefix.
+
+    The suggestions are served from the in-memory contact index, so a keystroke
+    does not run a query against the contacts table. The index is built in the
+    background when the application starts; until then the endpoint answers 503.
+
+    Args:
+        request (Request): The request object.
+        q (str): The typed prefix.
+        limit (int): The maximum number of suggestions.
+        user (User): The current authenticated user.
+
+    Returns:
+        List[schemas.ContactSuggestion]: The matching contacts.
+
+    Raises:
+        HTTPException: If the contact index is still being built.
     """
-    query = f"%{query}%"
-    result = db.execute(
-        select(models.Contact).filter(
-            (models.Contact.first_name.ilike(query)) |
-            (models.Contact.last_name.ilike(query)) |
-            (models.Contact.email.ilike(query))
+    if not contact_index.ready:
+        raise HTTPException(status_code=503, detail="Autocomplete is not available yet", headers={"Retry-After": "5"})
+    return contact_index.search(q, limit, user_id=user.id)
+
+@router_contacts.get("/contacts/cache/stats/")
+async def contact_cache_stats(x_admin_token: str | None = Header(None)):
+    """
+    Report the hit rate and size of the contact read cache.
+
+    Args:
+        x_admin_token (str | None): The ``X-Admin-Token`` header, which must equal ``ADMIN_TOKEN``.
+
+    Returns:
+        dict: The cache statistics.
+
+    Raises:
+        HTTPException: If the admin token is missing or wrong.
+    """
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return contact_cache.stats()
+
+@router_contacts.get("/contacts/duplicates/", response_model=list[schemas.DuplicateGroup])
+@limiter.limit('5/minute')
+async def list_duplicates(request: Request, response: Response, db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+    """
+    List groups of contacts that are likely duplicates of each other.
+
+    The groups are found by the ``duplicates`` job and stored; this endpoint only
+    reads them. When the user's contacts changed since the last job, a new one is
+    queued and the ``X-Duplicates-Pending`` header is set, and the stored groups
+    are returned without the contacts deleted in the meantime.
+
+    Args:
+        request (Request): The request object.
+        response (Response): The response, used to set the pending header.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        List[schemas.DuplicateGroup]: The candidate groups with the keys their contacts share.
+    """
+    if not request_duplicate_scan(db, user.id):
+        response.headers["X-Duplicates-Pending"] = "true"
+    groups = get_duplicate_groups(db, user.id)
+    contacts = {
+        contact.id: contact
+        for contact in await contact_crud.get_contacts_by_ids(
+            db=db, contact_ids=[contact_id for group in groups for contact_id in group["contact_ids"]], user_id=user.id
         )
-    )
-    return result.scalars().all()
+    }
+    groups = [
+        {"keys": group["keys"], "contacts": [contacts[contact_id] for contact_id in group["contact_ids"]
+                                             if contact_id in contacts]}
+        for group in groups
+    ]
+    return [group for group in groups if len(group["contacts"]) > 1]
 
-@router_contacts.get("/contacts/upcoming_birthdays/", response_model=list[schemas.Contact])
+@router_contacts.post("/contacts/duplicates/merge/", response_model=schemas.Contact)
+@limiter.limit('5/minute')
+async def merge_duplicates(request: Request,body: schemas.MergeContacts, db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+    """
+    Merge a group of duplicate contacts into one.
+
+    Args:
+        request (Request): The request object.
+        body (schemas.MergeContacts): The contact to keep and the contacts to merge into it.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        schemas.Contact: The merged contact.
+
+    Raises:
+        HTTPException: If any of the contacts is not found.
+    """
+    db_contact = await contact_crud.merge_contacts(db=db, keep_id=body.keep_id, merge_ids=body.merge_ids, user_id=user.id)
+    if db_contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return db_contact
+
+@router_contacts.get("/contacts/upcoming_birthdays/", response_model=list[schemas.Contact], responses=MSGPACK_RESPONSES)
 @limiter.limit('5/minute')
 async def upcoming_birthdays(request: Request,db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
     """
@@ -155,13 +321,103 @@ async def upcoming_birthdays(request: Request,db: Session = Depends(database.get
         user (User): The current authenticated user.
 
     Returns:
-        List[schemas.Contact]: A list of contacts with upcoming birthdays.
+        List[schemas.Contact]: A list of contacts with upcoming birthdays, as MessagePack if requested.
     """
-    today = datetime.today().date()
-    next_week = today + timedelta(days=7)
-    result = db.execute(
-        select(models.Contact).filter(
-            models.Contact.birth_date.between(today, next_week)
-        )
-    )
-    return result.scalars().all()
+    contacts = await contact_crud.get_upcoming_birthdays(db=db, days=7, user_id=user.id)
+    return negotiate(request, contacts, schemas.Contact)
+
+@router_contacts.get("/contacts/changes/", response_model=schemas.ContactChanges)
+@limiter.limit('60/minute')
+async def contact_changes(request: Request, since: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=1000),
+                          db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+    """
+    Return the contacts created, updated or deleted since the last sync.
+
+    Args:
+        request (Request): The request object.
+        since (int): The ``next`` token of the previous response, 0 for a full sync.
+        limit (int): The maximum number of changes in one page.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        schemas.ContactChanges: The changed contacts, the IDs of deleted contacts and the token
+        for the next call; while ``has_more`` is set, call again with the new token.
+    """
+    return await contact_crud.get_changes(db=db, since=since, limit=limit, user_id=user.id)
+
+@router_contacts.get("/contacts/stats/", response_model=schemas.ContactStats)
+@limiter.limit('60/minute')
+async def read_contact_stats(request: Request, db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+    """
+    Return the number of contacts, their birthdays per month and their most common email domains.
+
+    The counts are kept up to date as contacts change, so they are read without
+    scanning the contacts.
+
+    Args:
+        request (Request): The request object.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        schemas.ContactStats: The user's contact statistics.
+    """
+    return await contact_stats.get_contact_stats(db=db, user_id=user.id)
+
+@router_contacts.get("/contacts/events/")
+@limiter.limit('30/minute')
+async def contact_events(request: Request, db: Session = Depends(database.get_db), user: User=Depends(get_current_user)):
+    """
+    Stream create, update and delete events of the user's contacts as Server-Sent Events.
+
+    Args:
+        request (Request): The request object.
+        db (Session): The database session, released before streaming starts.
+        user (User): The current authenticated user.
+
+    Returns:
+        StreamingResponse: The ``text/event-stream`` response.
+    """
+    db.close()
+    subscriber = change_broker.subscribe(user.id)
+    return StreamingResponse(sse_events(change_broker, subscriber), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router_contacts.websocket("/contacts/events/ws")
+async def contact_events_ws(websocket: WebSocket, token: str = Query(), db: Session = Depends(database.get_db)):
+    """
+    Push create, update and delete events of the user's contacts over a WebSocket.
+
+    The access token is passed as the ``token`` query parameter. Clients that fall
+    too far behind are disconnected with code 1013 and should resync.
+
+    Args:
+        websocket (WebSocket): The WebSocket connection.
+        token (str): The access token.
+        db (Session): The database session, released once the user is known.
+    """
+    try:
+        user = await get_current_user(token, db)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        db.close()
+    await websocket.accept()
+    subscriber = change_broker.subscribe(user.id)
+    try:
+        while True:
+            try:
+                event = await subscriber.get(CHANGE_FEED_HEARTBEAT)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "keepalive"})
+                continue
+            if event is OVERFLOW:
+                await websocket.close(code=1013)
+                return
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        change_broker.unsubscribe(subscriber)
@@ -0,0 +1,177 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from settings import limiter
+from src import schemas
+from src.configuration import database
+from src.configuration.models import User
+from src.repository import tag_crud
+from src.repository.auth import get_current_user
+from src.repository.tag_crud import TagExists
+
+router_tags = APIRouter(tags=["tags"])
+
+
+@router_tags.get("/tags/", response_model=list[schemas.Tag])
+@limiter.limit('60/minute')
+async def read_tags(request: Request, db: Session = Depends(database.get_db), user: User = Depends(get_current_user)):
+    """
+    Retrieve the user's tags.
+
+    Args:
+        request (Request): The request object.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        List[schemas.Tag]: The tags, sorted by name.
+    """
+    return await tag_crud.get_tags(db=db, user_id=user.id)
+
+
+@router_tags.post("/tags/", response_model=schemas.Tag, status_code=201)
+@limiter.limit('60/minute')
+async def create_tag(request: Request, tag: schemas.TagBase, db: Session = Depends(database.get_db),
+                     user: User = Depends(get_current_user)):
+    """
+    Create a tag.
+
+    Args:
+        request (Request): The request object.
+        tag (schemas.TagBase): The tag's name.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        schemas.Tag: The created tag.
+
+    Raises:
+        HTTPException: If the user already has a tag with this name.
+    """
+    try:
+        return await tag_crud.create_tag(db=db, name=tag.name, user_id=user.id)
+    except TagExists:
+        raise HTTPException(status_code=409, detail="Tag already exists")
+
+
+@router_tags.put("/tags/{tag_id}", response_model=schemas.Tag)
+@limiter.limit('60/minute')
+async def rename_tag(request: Request, tag_id: int, tag: schemas.TagBase, db: Session = Depends(database.get_db),
+                     user: User = Depends(get_current_user)):
+    """
+    Rename a tag.
+
+    Args:
+        request (Request): The request object.
+        tag_id (int): The ID of the tag.
+        tag (schemas.TagBase): The new name.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        schemas.Tag: The renamed tag.
+
+    Raises:
+        HTTPException: If the tag is not found or the name is taken.
+    """
+    try:
+        db_tag = await tag_crud.rename_tag(db=db, tag_id=tag_id, name=tag.name, user_id=user.id)
+    except TagExists:
+        raise HTTPException(status_code=409, detail="Tag already exists")
+    if db_tag is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return db_tag
+
+
+@router_tags.delete("/tags/{tag_id}", response_model=schemas.Tag)
+@limiter.limit('60/minute')
+async def delete_tag(request: Request, tag_id: int, db: Session = Depends(database.get_db),
+                     user: User = Depends(get_current_user)):
+    """
+    Delete a tag and remove it from every contact.
+
+    Args:
+        request (Request): The request object.
+        tag_id (int): The ID of the tag.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        schemas.Tag: The deleted tag.
+
+    Raises:
+        HTTPException: If the tag is not found.
+    """
+    db_tag = await tag_crud.delete_tag(db=db, tag_id=tag_id, user_id=user.id)
+    if db_tag is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return db_tag
+
+
+@router_tags.get("/contacts/{contact_id}/tags/", response_model=list[schemas.Tag])
+@limiter.limit('60/minute')
+async def read_contact_tags(request: Request, contact_id: int, db: Session = Depends(database.get_db),
+                            user: User = Depends(get_current_user)):
+    """
+    Retrieve the tags of a contact.
+
+    Args:
+        request (Request): The request object.
+        contact_id (int): The ID of the contact.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Returns:
+        List[schemas.Tag]: The contact's tags, sorted by name.
+
+    Raises:
+        HTTPException: If the contact is not found.
+    """
+    tags = await tag_crud.get_contact_tags(db=db, contact_id=contact_id, user_id=user.id)
+    if tags is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return tags
+
+
+@router_tags.put("/contacts/{contact_id}/tags/{tag_id}", status_code=204)
+@limiter.limit('60/minute')
+async def tag_contact(request: Request, contact_id: int, tag_id: int, db: Session = Depends(database.get_db),
+                      user: User = Depends(get_current_user)):
+    """
+    Add a tag to a contact.
+
+    Args:
+        request (Request): The request object.
+        contact_id (int): The ID of the contact.
+        tag_id (int): The ID of the tag.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Raises:
+        HTTPException: If the contact or the tag is not found.
+    """
+    if not await tag_crud.tag_contact(db=db, contact_id=contact_id, tag_id=tag_id, user_id=user.id):
+        raise HTTPException(status_code=404, detail="Contact or tag not found")
+    return Response(status_code=204)
+
+
+@router_tags.delete("/contacts/{contact_id}/tags/{tag_id}", status_code=204)
+@limiter.limit('60/minute')
+async def untag_contact(request: Request, contact_id: int, tag_id: int, db: Session = Depends(database.get_db),
+                        user: User = Depends(get_current_user)):
+    """
+    Remove a tag from a contact.
+
+    Args:
+        request (Request): The request object.
+        contact_id (int): The ID of the contact.
+        tag_id (int): The ID of the tag.
+        db (Session): The database session.
+        user (User): The current authenticated user.
+
+    Raises:
+        HTTPException: If the contact or the tag is not found.
+    """
+    if not await tag_crud.untag_contact(db=db, contact_id=contact_id, tag_id=tag_id, user_id=user.id):
+        raise HTTPException(status_code=404, detail="Contact or tag not found")
+    return Response(status_code=204)
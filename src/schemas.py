@@ -18,11 +18,59 @@ class ContactUpdate(ContactBase):
 
 class Contact(ContactBase):
     id: int
+    phone_e164: str | None = None
 
     class Config:
         from_attributes = True
 
 
+class TagBase(BaseModel):
+    name: str = Field(min_length=1, max_length=50)
+
+
+class Tag(TagBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class TagFilter(BaseModel):
+    all: list[str] = []
+    any: list[str] = []
+    none: list[str] = []
+
+
+class ContactChanges(BaseModel):
+    upserts: list[Contact]
+    deletions: list[int]
+    next: int
+    has_more: bool
+
+
+class ContactStats(BaseModel):
+    total: int
+    birthdays_by_month: dict[int, int]
+    email_domains: dict[str, int]
+
+
+class DuplicateGroup(BaseModel):
+    keys: list[str]
+    contacts: list[Contact]
+
+
+class MergeContacts(BaseModel):
+    keep_id: int
+    merge_ids: list[int] = Field(min_length=1)
+
+
+class ContactSuggestion(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
     email: EmailStr
@@ -33,6 +81,11 @@ class UserDisplayModel(BaseModel):
     avatar : str
 
 
+class AvatarModel(BaseModel):
+    avatar: str | None = None
+    variants: dict[str, str]
+
+
 class UserDb(BaseModel):
     id: int
     username: str
@@ -3,7 +3,6 @@ from jose import  jwt
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from settings import SECRET_KEY,ALGORITHM, oauth2_scheme
@@ -11,10 +10,12 @@ from settings import SECRET_KEY,ALGORITHM, oauth2_scheme
 
 from src.configuration.database import get_db
 from src.repository import users as repository_users
+from src.services.hashing import pwd_context
+from src.services.tracing import tracer
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
     SECRET_KEY = SECRET_KEY
     ALGORITHM = ALGORITHM
     
@@ -30,7 +31,23 @@ class Auth:
         Returns:
             bool: True if passwords match, False otherwise.
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        with tracer.start_as_current_span("auth.verify_password"):
+            return self.pwd_context.verify(plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password, hashed_password):
+        """
+        Verify a password and rehash it if the stored hash does not match the current policy.
+
+        Args:
+            plain_password (str): The plain text password.
+            hashed_password (str): The hashed password.
+
+        Returns:
+            tuple[bool, Optional[str]]: Whether the password matches, and the new hash to store
+            if the old one is outdated.
+        """
+        with tracer.start_as_current_span("auth.verify_password"):
+            return self.pwd_context.verify_and_update(plain_password, hashed_password)
 
     def get_password_hash(self, password: str):
         """
@@ -42,7 +59,8 @@ class Auth:
         Returns:
             str: The hashed password.
         """
-        return self.pwd_context.hash(password)
+        with tracer.start_as_current_span("auth.hash_password"):
+            return self.pwd_context.hash(password)
 
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -129,7 +147,8 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            with tracer.start_as_current_span("auth.decode_token"):
+                payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -139,9 +158,12 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
-        user = repository_users.UserService.get_user_by_email(email, db)
+        with tracer.start_as_current_span("auth.lookup_user"):
+            user = repository_users.UserService.get_user_by_email(email, db)
         if user is None:
             raise credentials_exception
+        # Routes the session's contact queries to this user's shard.
+        db.info["user_id"] = user.id
         return user
 
     def create_email_token(self, data: dict):
@@ -0,0 +1,222 @@
+import logging
+import threading
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from settings import AUTOCOMPLETE_MAX_RESULTS
+from src.configuration import models
+from src.configuration.database import SessionLocal, each_shard
+from src.services.change_feed import OVERFLOW
+
+logger = logging.getLogger(__name__)
+
+
+class ContactIndex:
+    """
+    In-process prefix index over contact names and emails.
+
+    Every contact contributes a handful of lowercased terms (first name, last name,
+    "first last" and email) to a sorted list of ``(term, contact id)`` tuples kept
+    per owner, so a prefix lookup within one user's contacts is a binary search
+    followed by a walk over at most ``limit`` matching contacts, and a write only
+    shifts the list of its owner.
+
+    The index lives in the memory of one process: every API worker builds its own
+    copy with ``start``, in a background thread, and then follows the change
+    broker, which with the ``postgres`` backend also carries the writes of the
+    other processes. When the broker reports that events were lost, the index is
+    rebuilt. Lookups never touch the database.
+    """
+
+    def __init__(self, max_results: int = AUTOCOMPLETE_MAX_RESULTS):
+        self.max_results = max_results
+        self.ready = False
+        self._terms = {}
+        self._entries = {}
+        self._pending = None
+        self._loader = None
+        self._session_factory = SessionLocal
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_terms(first_name, last_name, email):
+        """
+        Build the searchable terms for a contact.
+
+        Args:
+            first_name (str): The contact's first name.
+            last_name (str): The contact's last name.
+            email (str): The contact's email.
+
+        Returns:
+            tuple[str, ...]: The distinct lowercased terms.
+        """
+        first_name = (first_name or "").strip().casefold()
+        last_name = (last_name or "").strip().casefold()
+        email = (email or "").strip().casefold()
+        terms = {first_name, last_name, email, f"{first_name} {last_name}".strip()}
+        terms.discard("")
+        return tuple(sorted(terms))
+
+    def _insert(self, contact_id, owner, first_name, last_name, email):
+        terms = self._make_terms(first_name, last_name, email)
+        suggestion = {"id": contact_id, "first_name": first_name, "last_name": last_name, "email": email}
+        self._entries[contact_id] = (owner, terms, suggestion)
+        owned = self._terms.setdefault(owner, [])
+        for term in terms:
+            insort(owned, (term, contact_id))
+
+    def _delete(self, contact_id):
+        entry = self._entries.pop(contact_id, None)
+        if entry is None:
+            return
+        owner, terms, _ = entry
+        owned = self._terms.get(owner, [])
+        for term in terms:
+            key = (term, contact_id)
+            position = bisect_left(owned, key)
+            if position < len(owned) and owned[position] == key:
+                del owned[position]
+        if not owned:
+            self._terms.pop(owner, None)
+
+    def _apply(self, event: dict):
+        self._delete(event["contact_id"])
+        if event["type"] != "deleted" and event["contact"] is not None:
+            contact = event["contact"]
+            self._insert(event["contact_id"], event["user_id"] or 0, contact["first_name"],
+                         contact["last_name"], contact["email"])
+
+    def load(self, db: Session):
+        """
+        Rebuild the index from the contacts table of every shard.
+
+        Changes received while the contacts are read are applied afterwards.
+
+        Args:
+            db (Session): The database session.
+        """
+        terms = {}
+        entries = {}
+        for _ in each_shard(db):
+            rows = db.execute(
+                select(models.Contact.id, models.Contact.user_id, models.Contact.first_name,
+                       models.Contact.last_name, models.Contact.email)
+                .execution_options(yield_per=1000)
+            )
+            for contact_id, user_id, first_name, last_name, email in rows:
+                owner = user_id or 0
+                contact_terms = self._make_terms(first_name, last_name, email)
+                entries[contact_id] = (
+                    owner,
+                    contact_terms,
+                    {"id": contact_id, "first_name": first_name, "last_name": last_name, "email": email},
+                )
+                terms.setdefault(owner, []).extend((term, contact_id) for term in contact_terms)
+        for owned in terms.values():
+            owned.sort()
+        with self._lock:
+            self._terms = terms
+            self._entries = entries
+            for event in self._pending or ():
+                self._apply(event)
+            self._pending = None
+            self.ready = True
+
+    def _load_in_background(self):
+        try:
+            with self._session_factory() as db:
+                self.load(db)
+        except Exception:
+            logger.exception("Loading the contact index failed")
+            with self._lock:
+                self._pending = None
+
+    def reload(self):
+        """
+        Rebuild the index from the database in a background thread.
+
+        The current index keeps answering lookups until the new one is built.
+        """
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+            self._loader = threading.Thread(target=self._load_in_background, name="contact-index-loader", daemon=True)
+        self._loader.start()
+
+    def start(self, broker, session_factory=SessionLocal):
+        """
+        Follow a change broker and build the index in a background thread.
+
+        Args:
+            broker (LocalBroker): The broker that publishes the contact changes.
+            session_factory (sessionmaker): Creates the session the index is built with.
+        """
+        self._session_factory = session_factory
+        broker.add_listener(self.on_change)
+        self.reload()
+
+    def on_change(self, event):
+        """
+        Apply a change event from the change broker.
+
+        Events without contact data, which the ``postgres`` backend sends for
+        contacts too large for a notification, are completed from the database.
+
+        Args:
+            event (Optional[dict]): The change event, or ``OVERFLOW`` to rebuild the index.
+        """
+        if event is OVERFLOW:
+            self.reload()
+            return
+        if event["type"] != "deleted" and event["contact"] is None:
+            try:
+                with self._session_factory() as db:
+                    db.info["user_id"] = event["user_id"]
+                    contact = db.get(models.Contact, event["contact_id"])
+            except Exception:
+                logger.exception("Reading contact %s for the contact index failed", event["contact_id"])
+                self.reload()
+                return
+            if contact is not None:
+                event = {**event, "contact": {"first_name": contact.first_name, "last_name": contact.last_name,
+                                              "email": contact.email}}
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(event)
+            self._apply(event)
+
+    def search(self, prefix: str, limit: int | None = None, user_id: int | None = None) -> list[dict]:
+        """
+        Find contacts of a user whose name or email starts with the given prefix.
+
+        Args:
+            prefix (str): The typed prefix.
+            limit (int | None): The maximum number of suggestions, capped by ``max_results``.
+            user_id (int | None): The owner's ID; None looks up contacts without an owner.
+
+        Returns:
+            list[dict]: Up to ``limit`` suggestions ordered by the matching term.
+        """
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        limit = min(limit or self.max_results, self.max_results)
+        found = {}
+        with self._lock:
+            owned = self._terms.get(user_id or 0, ())
+            position = bisect_left(owned, (prefix,))
+            while position < len(owned) and len(found) < limit:
+                term, contact_id = owned[position]
+                if not term.startswith(prefix):
+                    break
+                if contact_id not in found:
+                    found[contact_id] = self._entries[contact_id][2]
+                position += 1
+        return list(found.values())
+
+
+contact_index = ContactIndex()
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import text
+
+from settings import CHANGE_FEED_BACKEND, CHANGE_FEED_BUFFER, CHANGE_FEED_CHANNEL, CHANGE_FEED_HEARTBEAT
+from src import schemas
+
+OVERFLOW = None
+NOTIFY_MAX_BYTES = 7900
+LISTEN_POLL_SECONDS = 5
+RECONNECT_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+
+def contact_event(event_type: str, contact, user_id: Optional[int] = None) -> dict:
+    """
+    Build a change event for a contact.
+
+    Args:
+        event_type (str): ``created``, ``updated`` or ``deleted``.
+        contact: The contact, an ORM object or a ``schemas.Contact``.
+        user_id (Optional[int]): The owner's ID, taken from the contact if not given.
+
+    Returns:
+        dict: The event with its ``type``, ``contact_id``, ``user_id`` and the ``contact`` data.
+    """
+    return {
+        "type": event_type,
+        "contact_id": contact.id,
+        "user_id": user_id or getattr(contact, "user_id", None),
+        "contact": schemas.Contact.model_validate(contact).model_dump(mode="json"),
+    }
+
+
+class Subscriber:
+    """
+    A bounded buffer of events for one client connection.
+
+    When the client reads slower than changes arrive and the buffer fills up, the
+    buffered events are dropped and the subscriber receives ``OVERFLOW`` instead,
+    after which the connection is closed and the client is expected to resync.
+    """
+
+    def __init__(self, user_id: int, max_buffer: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.overflowed = False
+        self._queue = asyncio.Queue(max_buffer)
+
+    def deliver(self, event: dict):
+        """
+        Add an event to the buffer; must run on the subscriber's event loop.
+
+        Args:
+            event (dict): The change event.
+        """
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflow()
+
+    def overflow(self):
+        """
+        Drop the buffered events and tell the client to resync; must run on the subscriber's event loop.
+        """
+        if self.overflowed:
+            return
+        self.overflowed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(OVERFLOW)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Wait for the next event.
+
+        Args:
+            timeout (Optional[float]): The number of seconds to wait.
+
+        Returns:
+            Optional[dict]: The event, or ``OVERFLOW`` if the subscriber fell behind.
+
+        Raises:
+            asyncio.TimeoutError: If no event arrived in time.
+        """
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+async def sse_events(broker, subscriber: Subscriber, heartbeat: float = CHANGE_FEED_HEARTBEAT):
+    """
+    Stream a subscriber's events in the Server-Sent Events format.
+
+    A comment line is sent after ``heartbeat`` idle seconds to keep proxies from
+    closing the connection. A subscriber that overflowed gets an ``overflow``
+    event and the stream ends.
+
+    Args:
+        broker (LocalBroker): The broker the subscriber belongs to.
+        subscriber (Subscriber): The subscriber to stream.
+        heartbeat (float): The number of idle seconds between keep-alive comments.
+
+    Yields:
+        str: The SSE messages.
+    """
+    try:
+        while True:
+            try:
+                event = await subscriber.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is OVERFLOW:
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+class LocalBroker:
+    """
+    Fan change events out to the subscribers of their owner within this process.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int, max_buffer: int = CHANGE_FEED_BUFFER) -> Subscriber:
+        """
+        Register a subscriber for the changes of one user's contacts.
+
+        Must be called from the event loop that will read the events.
+
+        Args:
+            user_id (int): The owner whose changes are wanted.
+            max_buffer (int): The number of events buffered before the subscriber is dropped.
+
+        Returns:
+            Subscriber: The new subscriber.
+        """
+        subscriber = Subscriber(user_id, max_buffer, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """
+        Remove a subscriber.
+
+        Args:
+            subscriber (Subscriber): The subscriber to remove.
+        """
+        with self._lock:
+            self._subscribers[subscriber.user_id].discard(subscriber)
+            if not self._subscribers[subscriber.user_id]:
+                del self._subscribers[subscriber.user_id]
+
+    def add_listener(self, listener):
+        """
+        Call a function with every event this process receives, whatever its owner.
+
+        Listeners run on the thread that dispatches the event, the publisher's or
+        the Postgres listener's, and must return quickly. They are called with
+        ``OVERFLOW`` when events may have been lost.
+
+        Args:
+            listener (Callable[[Optional[dict]], None]): The function to call.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def dispatch(self, event: dict):
+        """
+        Hand an event to the local subscribers of its owner.
+
+        Args:
+            event (dict): The change event.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(event["user_id"], ()))
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+
+    def overflow_all(self):
+        """
+        Make every local subscriber resync, after events may have been lost.
+        """
+        with self._lock:
+            subscribers = [subscriber for owned in self._subscribers.values() for subscriber in owned]
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(OVERFLOW)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.overflow)
+
+    def publish(self, event: dict):
+        """
+        Publish a change event.
+
+        Args:
+            event (dict): The change event.
+        """
+        self.dispatch(event)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Fan change events out across processes with Postgres ``LISTEN/NOTIFY``.
+
+    Events are published with ``pg_notify`` and every process, this one included,
+    dispatches them to its local subscribers from a listener thread that holds one
+    dedicated connection. Contact data is left out of events that would exceed the
+    notification payload limit; clients then fetch the contact by its ID. When the
+    connection fails the listener logs the error and reconnects with growing delays,
+    and since events may have been missed meanwhile, every subscriber receives
+    ``OVERFLOW`` and resyncs.
+    """
+
+    def __init__(self, engine, channel: str = CHANGE_FEED_CHANNEL):
+        super().__init__()
+        self.engine = engine
+        self.channel = channel
+        self._listener = None
+
+    def _ensure_listener(self):
+        """Start the listener thread unless it is running."""
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="change-feed-listener", daemon=True)
+                self._listener.start()
+
+    def subscribe(self, user_id: int, max_buffer: int = CHANGE_FEED_BUFFER) -> Subscriber:
+        """Register a subscriber, see ``LocalBroker.subscribe``, and start listening if needed."""
+        self._ensure_listener()
+        return super().subscribe(user_id, max_buffer)
+
+    def add_listener(self, listener):
+        """Register a listener, see ``LocalBroker.add_listener``, and start listening if needed."""
+        super().add_listener(listener)
+        self._ensure_listener()
+
+    def publish(self, event: dict):
+        """Publish a change event to every process."""
+        payload = json.dumps(event)
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            payload = json.dumps({**event, "contact": None})
+        with self.engine.begin() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                               {"channel": self.channel, "payload": payload})
+
+    def _listen(self):
+        delay = RECONNECT_SECONDS
+        connected = False
+        while True:
+            connection = None
+            try:
+                connection = self.engine.raw_connection()
+                connection.detach()
+                raw = connection.dbapi_connection
+                raw.autocommit = True
+                cursor = raw.cursor()
+                cursor.execute(f'LISTEN "{self.channel}"')
+                if connected:
+                    # Notifications sent while the listener was away are lost.
+                    logger.warning("Change feed listener reconnected; subscribers must resync")
+                    self.overflow_all()
+                connected = True
+                delay = RECONNECT_SECONDS
+                for payload in self._notifications(raw, cursor):
+                    self.dispatch(json.loads(payload))
+            except Exception:
+                logger.exception("Change feed listener failed; reconnecting in %s s", delay)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def _notifications(self, raw, cursor):
+        """
+        Yield the payloads of the notifications a listening connection receives.
+
+        Supports the ``psycopg2`` and ``psycopg`` (3) drivers. The connection runs
+        ``SELECT 1`` after every ``LISTEN_POLL_SECONDS`` idle seconds, so a connection
+        that was dropped without notice raises instead of waiting forever.
+
+        Args:
+            raw: The driver's connection.
+            cursor: A cursor of the connection.
+
+        Yields:
+            str: The notification payloads.
+        """
+        if self.engine.dialect.driver == "psycopg":
+            while True:
+                received = False
+                for notify in raw.notifies(timeout=LISTEN_POLL_SECONDS):
+                    received = True
+                    yield notify.payload
+                if not received:
+                    cursor.execute("SELECT 1")
+        while True:
+            if select.select([raw], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                cursor.execute("SELECT 1")
+            else:
+                raw.poll()
+            while raw.notifies:
+                yield raw.notifies.pop(0).payload
+
+
+def make_broker(backend: str = CHANGE_FEED_BACKEND):
+    """
+    Create the change broker.
+
+    Args:
+        backend (str): ``postgres`` to fan out across processes, anything else for in-process delivery.
+
+    Returns:
+        LocalBroker | PostgresBroker: The broker.
+    """
+    if backend == "postgres":
+        from src.configuration.database import engine
+
+        return PostgresBroker(engine)
+    return LocalBroker()
+
+
+change_broker = make_broker()
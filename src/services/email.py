@@ -1,12 +1,16 @@
+from email.utils import formataddr
 from pathlib import Path
 
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from fastapi_mail.connection import Connection
+from fastapi_mail.msg import MailMsg
 from pydantic import EmailStr
 from settings import conf
 from src.services.auth import auth_service
+from src.services.tracing import traced
 
 
+@traced("email.send", **{"email.template": "email_template.html"})
 async def send_email(email: EmailStr, username: str, host: str):
     """
     Send an email for email verification.
@@ -18,19 +22,36 @@ async def send_email(email: EmailStr, username: str, host: str):
 
     Returns:
         None
+
+    Raises:
+        ConnectionErrors: If the mail server cannot be reached, so the job queue can retry.
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
+    token_verification = auth_service.create_email_token({"sub": email})
+    message = MessageSchema(
+        subject="Confirm your email ",
+        recipients=[email],
+        template_body={"host": host, "username": username, "token": token_verification},
+        subtype=MessageType.html
+    )
+
+    fm = FastMail(conf)
+    await fm.send_message(message, template_name="email_template.html")
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
 
+@traced("email.send_batch")
+async def send_messages(messages: list[MessageSchema]):
+    """
+    Send several ready-made messages over a single SMTP connection.
+
+    Args:
+        messages (list[MessageSchema]): The messages to send.
 
+    Returns:
+        None
+    """
+    sender = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM)) if conf.MAIL_FROM_NAME else conf.MAIL_FROM
+    async with Connection(conf) as connection:
+        for message in messages:
+            prepared = await MailMsg(message)._message(sender)
+            if not conf.SUPPRESS_SEND:
+                await connection.session.send_message(prepared)
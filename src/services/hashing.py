@@ -0,0 +1,79 @@
+import argparse
+import time
+
+from passlib.context import CryptContext
+
+from settings import BCRYPT_ROUNDS
+
+BCRYPT_MIN_ROUNDS = 4
+BCRYPT_MAX_ROUNDS = 31
+
+
+def make_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    """
+    Build the password hashing policy.
+
+    Hashes made with a different number of rounds are reported by ``needs_update``,
+    so they are replaced on the next successful login after the policy changes.
+
+    Args:
+        rounds (int): The bcrypt cost factor (log2 of the number of iterations).
+
+    Returns:
+        CryptContext: The hashing context.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+pwd_context = make_context()
+
+
+def calibrate(target_ms: float, password: str = "calibration-password") -> tuple[int, float]:
+    """
+    Find the bcrypt cost that takes closest to the target time on this host without going over it.
+
+    Every extra round doubles the hashing time, so one measurement at the minimum
+    cost gives an estimate that is then checked and corrected upwards or downwards.
+
+    Args:
+        target_ms (float): The desired time of one hash in milliseconds.
+        password (str): The password used for the benchmark.
+
+    Returns:
+        tuple[int, float]: The chosen number of rounds and its measured time in milliseconds.
+    """
+    def measure(rounds):
+        context = make_context(rounds)
+        started = time.perf_counter()
+        context.hash(password)
+        return (time.perf_counter() - started) * 1000
+
+    base = measure(BCRYPT_MIN_ROUNDS)
+    rounds = BCRYPT_MIN_ROUNDS
+    while rounds < BCRYPT_MAX_ROUNDS and base * 2 ** (rounds + 1 - BCRYPT_MIN_ROUNDS) <= target_ms:
+        rounds += 1
+    elapsed = measure(rounds)
+    while elapsed > target_ms and rounds > BCRYPT_MIN_ROUNDS:
+        rounds -= 1
+        elapsed = measure(rounds)
+    while rounds < BCRYPT_MAX_ROUNDS:
+        slower = measure(rounds + 1)
+        if slower > target_ms:
+            break
+        rounds, elapsed = rounds + 1, slower
+    return rounds, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the bcrypt cost for a target hashing time on this host.")
+    parser.add_argument("--target-ms", type=float, default=250, help="the desired time of one hash")
+    args = parser.parse_args()
+    chosen_rounds, chosen_ms = calibrate(args.target_ms)
+    print(f"# one hash takes {chosen_ms:.0f} ms (currently {BCRYPT_ROUNDS} rounds)")
+    print(f"BCRYPT_ROUNDS={chosen_rounds}")
@@ -0,0 +1,88 @@
+from settings import (
+    LOGIN_MAX_FAILURES, LOGIN_MAX_IP_FAILURES, LOGIN_LOCKOUT_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS, LOGIN_FAILURE_WINDOW
+)
+from src.utils.kvstore import store
+
+MAX_USERNAME_LENGTH = 254
+MAX_PASSWORD_LENGTH = 1024
+
+
+class LoginThrottle:
+    """
+    Failed-login counters per account and per client IP with exponential lockout.
+
+    Once an account or an IP reaches its failure limit within ``window`` seconds it
+    is locked for ``lockout`` seconds, doubling with every further failure up to
+    ``max_lockout``. ``check`` only reads two lock keys, so locked attempts are
+    rejected before the user lookup and password hashing.
+    """
+
+    def __init__(self, store, max_failures: int = LOGIN_MAX_FAILURES, max_ip_failures: int = LOGIN_MAX_IP_FAILURES,
+                 lockout: float = LOGIN_LOCKOUT_SECONDS, max_lockout: float = LOGIN_LOCKOUT_MAX_SECONDS,
+                 window: float = LOGIN_FAILURE_WINDOW):
+        self.store = store
+        self.max_failures = max_failures
+        self.max_ip_failures = max_ip_failures
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.window = window
+
+    @staticmethod
+    def is_malformed(username: str, password: str) -> bool:
+        """
+        Tell whether login credentials cannot possibly be valid.
+
+        Args:
+            username (str): The submitted email.
+            password (str): The submitted password.
+
+        Returns:
+            bool: True if the attempt can be rejected without looking anything up.
+        """
+        return (not username or not password or "@" not in username
+                or len(username) > MAX_USERNAME_LENGTH or len(password) > MAX_PASSWORD_LENGTH)
+
+    def check(self, username: str, ip: str) -> float:
+        """
+        Return how long the account or the IP is still locked.
+
+        Args:
+            username (str): The submitted email.
+            ip (str): The client address.
+
+        Returns:
+            float: The number of seconds until another attempt is allowed, 0 if it is allowed now.
+        """
+        return max(self.store.ttl(f"login:lock:account:{username.casefold()}") or 0,
+                   self.store.ttl(f"login:lock:ip:{ip}") or 0)
+
+    def _lock_if_exceeded(self, key: str, failures: int, limit: int):
+        if failures >= limit:
+            # The exponent is capped, so a flood of failures cannot overflow the float.
+            duration = min(self.lockout * 2 ** min(failures - limit, 30), self.max_lockout)
+            self.store.set(f"login:lock:{key}", 1, duration)
+
+    def record_failure(self, username: str, ip: str):
+        """
+        Count a failed attempt and lock the account or the IP when its limit is reached.
+
+        Args:
+            username (str): The submitted email.
+            ip (str): The client address.
+        """
+        account = f"account:{username.casefold()}"
+        self._lock_if_exceeded(account, self.store.incr(f"login:fail:{account}", self.window), self.max_failures)
+        ip_key = f"ip:{ip}"
+        self._lock_if_exceeded(ip_key, self.store.incr(f"login:fail:{ip_key}", self.window), self.max_ip_failures)
+
+    def record_success(self, username: str):
+        """
+        Reset the failure counter of an account after a successful login.
+
+        Args:
+            username (str): The email of the logged-in user.
+        """
+        self.store.delete(f"login:fail:account:{username.casefold()}")
+
+
+login_throttle = LoginThrottle(store)
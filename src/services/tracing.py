@@ -0,0 +1,144 @@
+import functools
+import inspect
+import os
+from typing import Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from settings import TRACING_EXPORTER, TRACING_FILE, TRACING_SAMPLE_RATE, TRACING_SERVICE_NAME
+
+# Spans go through the OpenTelemetry API. Until a provider is installed, every
+# span is a no-op, so tracing costs next to nothing when it is turned off.
+tracer = trace.get_tracer("contacts")
+
+
+def make_provider(sample_rate: float = TRACING_SAMPLE_RATE) -> TracerProvider:
+    """
+    Create the SDK tracer provider.
+
+    Sampling is parent-based: spans continue the decision of their parent, local or
+    from an incoming ``traceparent``, and a share of ``sample_rate`` new traces is
+    sampled by trace ID.
+
+    Args:
+        sample_rate (float): The share of new traces to sample, from 0 to 1.
+
+    Returns:
+        TracerProvider: The provider, without span processors.
+    """
+    return TracerProvider(sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+                          resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+
+
+def configure(processor, sample_rate: float = TRACING_SAMPLE_RATE) -> TracerProvider:
+    """
+    Export spans through a span processor.
+
+    OpenTelemetry allows one global provider per process, so the first call
+    installs it and later calls add their processor to it.
+
+    Args:
+        processor (SpanProcessor): Receives the ended spans.
+        sample_rate (float): The share of new traces to sample, used by the first call.
+
+    Returns:
+        TracerProvider: The global provider.
+    """
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = make_provider(sample_rate)
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(processor)
+    return provider
+
+
+def _exporter_from_settings():
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if TRACING_EXPORTER == "file":
+        return ConsoleSpanExporter(out=open(TRACING_FILE, "a", encoding="utf-8"),
+                                   formatter=lambda span: span.to_json(indent=None) + os.linesep)
+    if TRACING_EXPORTER == "otlp":
+        # Reads OTEL_EXPORTER_OTLP_ENDPOINT and the other standard variables.
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    return None
+
+
+def inject(carrier: dict) -> dict:
+    """
+    Add the context of the active span to a carrier, for propagating it.
+
+    Args:
+        carrier (dict): The headers or payload to propagate the context in.
+
+    Returns:
+        dict: A copy of the carrier with a ``traceparent`` entry when a span is active.
+    """
+    carrier = dict(carrier)
+    propagate.inject(carrier)
+    return carrier
+
+
+def extract(carrier: Optional[dict]):
+    """
+    Read a propagated span context from a carrier.
+
+    Args:
+        carrier (Optional[dict]): The headers or payload with a ``traceparent`` entry.
+
+    Returns:
+        Context: The context to start child spans in; empty if the carrier has none.
+    """
+    return propagate.extract(carrier or {})
+
+
+def traced(name: str, **attributes):
+    """
+    Decorate a function or coroutine function to run inside a span.
+
+    Args:
+        name (str): The span name.
+        **attributes: The span attributes.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(name, attributes=attributes):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name, attributes=attributes):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engines(engines: list):
+    """
+    Record a client span for every statement run through the given SQLAlchemy engines.
+
+    The OpenTelemetry instrumentation can be set up once per process, so pass every
+    engine in one call.
+
+    Args:
+        engines (list[Engine]): The engines to instrument.
+    """
+    SQLAlchemyInstrumentor().instrument(engines=engines)
+
+
+_exporter = _exporter_from_settings()
+if _exporter is not None:
+    configure(BatchSpanProcessor(_exporter))
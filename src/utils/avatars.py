@@ -0,0 +1,241 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+
+from settings import AVATAR_STORAGE, AVATAR_LOCAL_DIR, AVATAR_BASE_URL, AVATAR_VARIANTS
+from src.utils import cloudinary
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+IMAGE_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+    b"GIF8": "image/gif",
+    b"RIFF": "image/webp",
+}
+
+DEFAULT_VARIANT = "medium"
+
+
+def spool(file: BinaryIO, path: Path) -> str:
+    """
+    Copy an upload to disk while hashing it.
+
+    Args:
+        file (BinaryIO): The uploaded image.
+        path (Path): Where to write it.
+
+    Returns:
+        str: The SHA-256 digest of the image, which identifies it in storage.
+    """
+    digest = hashlib.sha256()
+    with path.open("wb") as spooled:
+        while chunk := file.read(64 * 1024):
+            digest.update(chunk)
+            spooled.write(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """
+    Hash a stored image.
+
+    Args:
+        path (Path): The image file.
+
+    Returns:
+        str: The SHA-256 digest of the image.
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while chunk := file.read(64 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_type(data: bytes) -> str:
+    """
+    Recognize an image format from the first bytes of a file.
+
+    Args:
+        data (bytes): The beginning of the file.
+
+    Returns:
+        str: The media type, ``application/octet-stream`` if the format is unknown.
+    """
+    for signature, kind in IMAGE_SIGNATURES.items():
+        if data.startswith(signature):
+            return kind
+    return "application/octet-stream"
+
+
+class LocalAvatarStore:
+    """
+    Avatars stored on local disk and served by the API.
+
+    Every image is stored once under its digest, with one file per variant, and
+    variants are never rewritten, so their URLs can be cached forever. Variants are
+    square crops made with Pillow; without Pillow the original image is stored for
+    every variant.
+    """
+
+    def __init__(self, root: Path = AVATAR_LOCAL_DIR, base_url: str = AVATAR_BASE_URL,
+                 variants: dict = AVATAR_VARIANTS):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        self.variants = variants
+
+    def path(self, digest: str, variant: str) -> Path:
+        """
+        Return the file of an avatar variant.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+            variant (str): The variant name.
+
+        Returns:
+            Path: The file.
+        """
+        return self.root / digest[:2] / digest / variant
+
+    def exists(self, digest: str) -> bool:
+        """
+        Tell whether every variant of an image is stored.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+
+        Returns:
+            bool: True if the image need not be stored again.
+        """
+        return all(self.path(digest, variant).is_file() for variant in self.variants)
+
+    def put(self, digest: str, source: Path):
+        """
+        Store the variants of an image.
+
+        Every file is written under a unique temporary name and then renamed, so a
+        reader never sees a partial variant and concurrent uploads of the same image
+        do not write to the same file.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+            source (Path): The original image.
+        """
+        for variant, size in self.variants.items():
+            target = self.path(digest, variant)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            descriptor, partial = tempfile.mkstemp(prefix=f".{variant}.", suffix=".partial", dir=target.parent)
+            os.close(descriptor)
+            partial = Path(partial)
+            try:
+                if Image is None:
+                    shutil.copyfile(source, partial)
+                else:
+                    with Image.open(source) as image:
+                        ImageOps.fit(image.convert("RGBA"), (size, size)).save(partial, format="PNG")
+                partial.replace(target)
+            finally:
+                partial.unlink(missing_ok=True)
+
+    def url(self, digest: str, variant: str = DEFAULT_VARIANT) -> str:
+        """
+        Build the URL of an avatar variant.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+            variant (str): The variant name.
+
+        Returns:
+            str: The URL.
+        """
+        return f"{self.base_url}/{digest}/{variant}"
+
+
+class CloudinaryAvatarStore:
+    """
+    Avatars stored on Cloudinary under their digest.
+
+    Cloudinary generates the variants once, at upload time, and serves them from
+    its CDN.
+    """
+
+    def __init__(self, variants: dict = AVATAR_VARIANTS):
+        self.variants = variants
+
+    def exists(self, digest: str) -> bool:
+        """
+        Tell whether an image has already been uploaded.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+
+        Returns:
+            bool: True if the image need not be uploaded again.
+        """
+        return cloudinary.avatar_exists(digest)
+
+    def put(self, digest: str, source: Path):
+        """
+        Upload an image and have its variants generated.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+            source (Path): The original image.
+        """
+        with source.open("rb") as file:
+            cloudinary.upload_avatar(file, digest, list(self.variants.values()))
+
+    def url(self, digest: str, variant: str = DEFAULT_VARIANT) -> str:
+        """
+        Build the URL of an avatar variant.
+
+        Args:
+            digest (str): The SHA-256 digest of the image.
+            variant (str): The variant name.
+
+        Returns:
+            str: The URL.
+        """
+        return cloudinary.avatar_url(digest, self.variants[variant])
+
+
+def make_store(kind: str = AVATAR_STORAGE):
+    """
+    Create the avatar store.
+
+    Args:
+        kind (str): ``local`` or ``cloudinary``.
+
+    Returns:
+        LocalAvatarStore | CloudinaryAvatarStore: The store.
+    """
+    if kind == "local":
+        return LocalAvatarStore()
+    if kind == "cloudinary":
+        return CloudinaryAvatarStore()
+    raise ValueError(f"Unknown avatar storage {kind!r}")
+
+
+avatar_store = make_store()
+
+
+def avatar_urls(digest: str, store=None) -> dict:
+    """
+    List the URLs of every variant of an avatar.
+
+    Args:
+        digest (str): The SHA-256 digest of the image.
+        store: The avatar store, the configured one by default.
+
+    Returns:
+        dict: The URL of every variant, by name.
+    """
+    store = store or avatar_store
+    return {variant: store.url(digest, variant) for variant in store.variants}
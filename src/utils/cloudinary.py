@@ -1,7 +1,9 @@
 import cloudinary
+import cloudinary.api
+import cloudinary.exceptions
 import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
 from settings import CLOUDINARY_API_KEY,CLOUDINARY_API_SECRET,CLOUDINARY_NAME
+from src.services.tracing import traced
 
 # Configuration       
 cloudinary.config( 
@@ -11,21 +13,62 @@ cloudinary.config(
     secure=True
 )
 
-def upload_file_to_cloudinary(file, filename):
+def avatar_public_id(digest: str) -> str:
     """
-    Upload a file to Cloudinary.
+    Return the Cloudinary public ID of an avatar.
 
     Args:
-        file (file-like object): The file to be uploaded.
-        filename (str): The desired filename for the uploaded file.
+        digest (str): The SHA-256 digest of the image.
 
     Returns:
-        str: The URL of the uploaded image.
-    """
-    r = cloudinary.uploader.upload(
-        file, public_id=f'NotesApp/{filename}', overwrite=True
-        )
-    return cloudinary.CloudinaryImage(
-        f'NotesApp/{filename}').build_url(
-            width=250, height=250, crop='fill', version=r.get('version')
-        )
\ No newline at end of file
+        str: The public ID.
+    """
+    return f'NotesApp/avatars/{digest}'
+
+
+@traced("cloudinary.exists")
+def avatar_exists(digest: str) -> bool:
+    """
+    Tell whether an avatar has already been uploaded.
+
+    Args:
+        digest (str): The SHA-256 digest of the image.
+
+    Returns:
+        bool: True if Cloudinary has the image.
+    """
+    try:
+        cloudinary.api.resource(avatar_public_id(digest))
+    except cloudinary.exceptions.NotFound:
+        return False
+    return True
+
+
+@traced("cloudinary.upload")
+def upload_avatar(file, digest: str, sizes: list[int]):
+    """
+    Upload an avatar under its digest and have Cloudinary generate its variants right away.
+
+    Args:
+        file (file-like object): The image.
+        digest (str): The SHA-256 digest of the image.
+        sizes (list[int]): The side lengths of the square variants.
+    """
+    cloudinary.uploader.upload(
+        file, public_id=avatar_public_id(digest), overwrite=False,
+        eager=[{"width": size, "height": size, "crop": "fill"} for size in sizes],
+    )
+
+
+def avatar_url(digest: str, size: int) -> str:
+    """
+    Build the URL of an avatar variant.
+
+    Args:
+        digest (str): The SHA-256 digest of the image.
+        size (int): The side length of the square variant.
+
+    Returns:
+        str: The URL.
+    """
+    return cloudinary.CloudinaryImage(avatar_public_id(digest)).build_url(width=size, height=size, crop='fill')
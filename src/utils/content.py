@@ -0,0 +1,100 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+import msgpack
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+MSGPACK_RESPONSES = {200: {"content": {MSGPACK_MEDIA_TYPE: {}}}}
+
+# Negotiated responses differ by Accept, which shared caches must take into account.
+VARY_HEADERS = {"Vary": "Accept"}
+
+
+class MsgPackResponse(Response):
+    """A response encoded with MessagePack."""
+
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content) -> bytes:
+        """
+        Encode the content.
+
+        Args:
+            content: JSON-compatible data.
+
+        Returns:
+            bytes: The MessagePack document.
+        """
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def accept_quality(accept: str, media_type: str) -> float:
+    """
+    Find the weight an ``Accept`` header gives a media type.
+
+    The most specific matching range counts: ``type/subtype`` over ``type/*`` over ``*/*``.
+
+    Args:
+        accept (str): The header value.
+        media_type (str): The media type, for example ``application/json``.
+
+    Returns:
+        float: The ``q`` value of the matching range, 1 if it has none, 0 if no range matches.
+    """
+    main_type = media_type.split("/", 1)[0]
+    ranges = {}
+    for item in accept.split(","):
+        media_range, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges[media_range.strip().lower()] = quality
+    for candidate in (media_type, f"{main_type}/*", "*/*"):
+        if candidate in ranges:
+            return ranges[candidate]
+    return 0.0
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    Tell whether the client asked for MessagePack.
+
+    Args:
+        request (Request): The request object.
+
+    Returns:
+        bool: True if ``Accept`` lists ``application/msgpack`` with a weight above 0 and
+        at least that of ``application/json``.
+    """
+    accept = request.headers.get("accept", "")
+    if MSGPACK_MEDIA_TYPE not in accept.lower():
+        return False
+    quality = accept_quality(accept, MSGPACK_MEDIA_TYPE)
+    return quality > 0 and quality >= accept_quality(accept, "application/json")
+
+
+def negotiate(request: Request, items: list, schema: type[BaseModel]) -> Response:
+    """
+    Return a list of records in the representation the client asked for.
+
+    Both representations carry ``Vary: Accept``.
+
+    Args:
+        request (Request): The request object.
+        items (list): The records, ORM objects or dictionaries.
+        schema (type[BaseModel]): The schema of one record.
+
+    Returns:
+        JSONResponse | MsgPackResponse: The validated records as JSON or MessagePack.
+    """
+    records = [schema.model_validate(item).model_dump(mode="json") for item in items]
+    if not wants_msgpack(request):
+        return JSONResponse(records, headers=VARY_HEADERS)
+    return MsgPackResponse(records, headers=VARY_HEADERS)
@@ -0,0 +1,202 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from settings import REDIS_URL
+
+
+class MemoryStore:
+    """
+    Process-local key-value store with per-key expiry.
+
+    Keys are kept in least-recently-used order, and the least recently used key is
+    evicted once the store grows past ``max_keys``; an evicted key reads as missing,
+    like an expired one. Expiry times are kept in a heap, so every write drops the
+    keys that have expired without scanning the store.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._data = OrderedDict()
+        # (expires, key) pairs; a pair whose key was rewritten or removed since is skipped.
+        self._expiries = []
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return item
+
+    def _store(self, key, value, expires: Optional[float]):
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        if expires is not None:
+            heapq.heappush(self._expiries, (expires, key))
+        now = self.clock()
+        while self._expiries and self._expiries[0][0] <= now:
+            expired, old = heapq.heappop(self._expiries)
+            item = self._data.get(old)
+            if item is not None and item[1] == expired:
+                del self._data[old]
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+        if len(self._expiries) > 2 * self.max_keys:
+            # Rebuilt at most once per max_keys writes, which keeps writes amortized O(log n).
+            self._expiries = [(item[1], key) for key, item in self._data.items() if item[1] is not None]
+            heapq.heapify(self._expiries)
+
+    def get(self, key: str):
+        """
+        Read a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            The stored value, or None if the key is missing or expired.
+        """
+        with self._lock:
+            item = self._live(key)
+            return item[0] if item is not None else None
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        """
+        Store a value.
+
+        Args:
+            key (str): The key.
+            value: The value.
+            ttl (Optional[float]): The number of seconds to keep the key, or None to keep it.
+        """
+        with self._lock:
+            self._store(key, value, self.clock() + ttl if ttl is not None else None)
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """
+        Increment a counter, creating it with the given expiry if it does not exist.
+
+        Args:
+            key (str): The key.
+            ttl (Optional[float]): The number of seconds to keep a new counter.
+
+        Returns:
+            int: The new value.
+        """
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                self._store(key, 1, self.clock() + ttl if ttl is not None else None)
+                return 1
+            self._data[key] = (item[0] + 1, item[1])
+            return item[0] + 1
+
+    def ttl(self, key: str) -> Optional[float]:
+        """
+        Return the remaining lifetime of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[float]: The number of seconds left, or None if the key is missing or does not expire.
+        """
+        with self._lock:
+            item = self._live(key)
+            if item is None or item[1] is None:
+                return None
+            return item[1] - self.clock()
+
+    def delete(self, key: str):
+        """
+        Remove a key.
+
+        Args:
+            key (str): The key.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisStore:
+    """
+    Key-value store shared by all processes, backed by Redis.
+
+    When Redis cannot be reached the operations fall back to a process-local
+    ``MemoryStore``, so a Redis outage degrades sharing instead of failing requests.
+    """
+
+    def __init__(self, url: str, fallback: Optional[MemoryStore] = None):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.fallback = fallback or MemoryStore()
+        self._errors = (redis.ConnectionError, redis.TimeoutError)
+
+    def get(self, key: str):
+        """Read a key, see ``MemoryStore.get``."""
+        try:
+            return self.client.get(key)
+        except self._errors:
+            return self.fallback.get(key)
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        """Store a value, see ``MemoryStore.set``."""
+        try:
+            self.client.set(key, value, px=int(ttl * 1000) if ttl is not None else None)
+        except self._errors:
+            self.fallback.set(key, value, ttl)
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Increment a counter, see ``MemoryStore.incr``."""
+        try:
+            value = self.client.incr(key)
+            if value == 1 and ttl is not None:
+                self.client.pexpire(key, int(ttl * 1000))
+            return value
+        except self._errors:
+            return self.fallback.incr(key, ttl)
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Return the remaining lifetime of a key, see ``MemoryStore.ttl``."""
+        try:
+            milliseconds = self.client.pttl(key)
+        except self._errors:
+            return self.fallback.ttl(key)
+        return milliseconds / 1000 if milliseconds >= 0 else None
+
+    def delete(self, key: str):
+        """Remove a key, see ``MemoryStore.delete``."""
+        try:
+            self.client.delete(key)
+        except self._errors:
+            self.fallback.delete(key)
+
+
+def make_store(url: Optional[str] = REDIS_URL):
+    """
+    Create the shared key-value store.
+
+    Args:
+        url (Optional[str]): The Redis URL; without it, or without the ``redis`` package,
+            a process-local store is used.
+
+    Returns:
+        MemoryStore | RedisStore: The store.
+    """
+    if url:
+        try:
+            return RedisStore(url)
+        except ImportError:
+            pass
+    return MemoryStore()
+
+
+store = make_store()
@@ -0,0 +1,39 @@
+import re
+from typing import Optional
+
+from settings import DEFAULT_PHONE_COUNTRY_CODE
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone_number: str, country_code: str = DEFAULT_PHONE_COUNTRY_CODE) -> Optional[str]:
+    """
+    Normalize a free-form phone number to E.164.
+
+    Numbers written with ``+`` or ``00`` are treated as international. Numbers with a
+    national trunk prefix (``0671234567``) or without any prefix get the default
+    country code, so ``"+380 (67) 123-45-67"`` and ``"0671234567"`` both become
+    ``"+380671234567"``.
+
+    Args:
+        phone_number (str): The phone number as entered by the user.
+        country_code (str): The calling code used for national numbers.
+
+    Returns:
+        Optional[str]: The E.164 number, or None if it cannot be normalized.
+    """
+    if not phone_number:
+        return None
+    phone_number = phone_number.strip()
+    digits = _NON_DIGITS.sub("", phone_number)
+    if phone_number.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = country_code + digits[1:]
+    elif not digits.startswith(country_code):
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
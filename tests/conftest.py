@@ -4,8 +4,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from main import app
-from src.configuration.models import Base
+from src.configuration.models import Base, User
 from src.configuration.database import get_db
+from src.repository.auth import create_access_token
+from src.repository.cache import contact_cache
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -16,6 +18,12 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def empty_contact_cache():
+    # Tests use different databases with overlapping owner IDs.
+    contact_cache.clear()
+
+
 @pytest.fixture(scope="module")
 def session():
     # Create the database
@@ -48,3 +56,16 @@ def client(session):
 @pytest.fixture(scope="module")
 def user():
     return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
+
+
+@pytest.fixture(scope="module")
+def owner(session):
+    owner = User(username="wolverine", email="wolverine@example.com", password="secret", confirmed=True)
+    session.add(owner)
+    session.commit()
+    return owner
+
+
+@pytest.fixture(scope="module")
+def token(owner):
+    return create_access_token(data={"sub": owner.email})
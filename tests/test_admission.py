@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from src.middleware.admission import AdmissionMiddleware, Gate, route_class
+
+
+def test_route_classes():
+    assert route_class("GET", "/api/contacts/search/") == "search"
+    assert route_class("GET", "/api/contacts/") == "export"
+    assert route_class("POST", "/api/contacts/import/") == "import"
+    assert route_class("PATCH", "/api/auth/avatar") == "avatar"
+    assert route_class("POST", "/api/contacts/") is None
+
+
+def test_gate_hands_slots_over_in_order_and_sheds_past_the_deadline():
+    async def main():
+        gate = Gate(limit=1, queue_size=1)
+        assert await gate.acquire(time.monotonic() + 1)
+        waiter = asyncio.ensure_future(gate.acquire(time.monotonic() + 1))
+        await asyncio.sleep(0)
+        assert not await gate.acquire(time.monotonic() + 1)
+        gate.release()
+        assert await waiter
+        assert not await gate.acquire(time.monotonic() + 0.01)
+        gate.release()
+        return gate.stats()
+
+    stats = asyncio.run(main())
+    assert stats["active"] == 0 and stats["waiting"] == 0
+    assert stats["admitted"] == 2 and stats["shed"] == 2
+
+
+def test_overload_is_shed_with_retry_after():
+    release = None
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionMiddleware(app, max_concurrency=4, queue_size=4, queue_timeout=0.05, retry_after=2,
+                                     route_limits={"search": 1})
+
+    async def request(path):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "method": "GET", "path": path}, None, send)
+        return messages[0]["status"], dict(messages[0]["headers"]).get(b"retry-after")
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.ensure_future(request("/api/contacts/search/"))
+        await asyncio.sleep(0)
+        shed = await request("/api/contacts/search/")
+        other = asyncio.ensure_future(request("/api/contacts/1"))
+        await asyncio.sleep(0)
+        release.set()
+        return await first, shed, await other
+
+    first, shed, other = asyncio.run(main())
+    assert first == (200, None) and other == (200, None)
+    assert shed == (503, b"2")
+    assert calls == ["/api/contacts/search/", "/api/contacts/1"]
+    assert middleware.stats()["search"]["shed"] == 1
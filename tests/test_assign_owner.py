@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src import schemas
+from src.configuration import database, models
+from src.configuration.database import ShardedSession, ShardMap
+from src.jobs.assign_owner import assign_unowned_contacts, count_unowned
+from src.repository import contact_crud, contact_stats
+from src.repository.contact_crud import ContactExists
+
+
+def test_unowned_contacts_are_assigned_and_synced(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'owners.db'}")
+    models.Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "shard_map", ShardMap(engine, [engine], ttl=0))
+    session_factory = sessionmaker(bind=engine, class_=ShardedSession)
+    with engine.begin() as connection:
+        connection.execute(insert(models.Contact), [
+            {"id": number, "first_name": "Old", "last_name": "Entry", "email": f"old{number}@example.com",
+             "phone_number": "0671234567", "change_seq": number} for number in range(1, 5)])
+        connection.execute(insert(models.Contact).values(id=5, first_name="New", last_name="Entry", user_id=7,
+                                                         email="old4@example.com", change_seq=1))
+    assert count_unowned(session_factory) == 4
+
+    assert assign_unowned_contacts(7, session_factory, chunk_size=2) == 3
+    # The user already has a contact with the fourth email.
+    assert count_unowned(session_factory) == 1
+    with session_factory() as db:
+        db.info["user_id"] = 7
+        changes = asyncio.run(contact_crud.get_changes(db, since=0, user_id=7))
+        stats = asyncio.run(contact_stats.get_contact_stats(db, 7))
+    assert sorted(contact.id for contact in changes["upserts"]) == [1, 2, 3, 5]
+    assert stats.total == 4
+    assert assign_unowned_contacts(7, session_factory) == 0
+    engine.dispose()
+
+
+def _contact(email):
+    return schemas.ContactCreate(first_name="Same", last_name="Person", email=email, phone_number="0671234567",
+                                 birth_date="1990-01-02")
+
+
+def test_emails_are_unique_per_owner(session):
+    users = [models.User(username=f"emailowner{number}", email=f"emailowner{number}@example.com", password="x")
+             for number in range(2)]
+    session.add_all(users)
+    session.commit()
+    first, second = (asyncio.run(contact_crud.create_contact(session, _contact("shared@example.com"), user.id))
+                     for user in users)
+    assert first.email == second.email
+
+    with pytest.raises(ContactExists):
+        asyncio.run(contact_crud.create_contact(session, _contact("shared@example.com"), users[0].id))
+    with pytest.raises(ContactExists):
+        asyncio.run(contact_crud.create_contacts(session, [_contact("one@example.com"), _contact("one@example.com")],
+                                                 users[0].id))
+    other = asyncio.run(contact_crud.create_contact(session, _contact("other@example.com"), users[0].id))
+    with pytest.raises(ContactExists):
+        asyncio.run(contact_crud.update_contact(session, other.id, _contact("shared@example.com"), users[0].id))
+    assert asyncio.run(contact_stats.get_contact_stats(session, users[0].id)).total == 2
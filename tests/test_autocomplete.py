@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+from src.configuration.models import Contact, User
+from src.routes import contacts as contact_routes
+from src.services import change_feed
+from src.services.autocomplete import ContactIndex
+from src.services.change_feed import LocalBroker, contact_event
+from tests.conftest import TestingSessionLocal
+
+
+def change(contact_id, first_name, last_name, email, user_id=1, event_type="created"):
+    contact = SimpleNamespace(id=contact_id, user_id=user_id, first_name=first_name, last_name=last_name, email=email,
+                              phone_number="0671234567", phone_e164=None, birth_date="1990-01-01", additional_data=None)
+    return contact_event(event_type, contact)
+
+
+def test_prefix_matches_name_and_email():
+    index = ContactIndex(max_results=10)
+    index.on_change(change(1, "John", "Doe", "john.doe@example.com"))
+    index.on_change(change(2, "Jane", "Johnson", "jane@example.com"))
+    index.on_change(change(3, "Bob", "Smith", "bob@example.com"))
+
+    assert [s["id"] for s in index.search("jo", user_id=1)] == [1, 2]
+    assert [s["id"] for s in index.search("JANE@", user_id=1)] == [2]
+    assert [s["id"] for s in index.search("john d", user_id=1)] == [1]
+    assert index.search("zed", user_id=1) == []
+
+
+def test_search_is_scoped_to_owner():
+    index = ContactIndex(max_results=10)
+    index.on_change(change(1, "John", "Doe", "john.doe@example.com", user_id=1))
+    index.on_change(change(2, "Johanna", "Doe", "johanna@example.com", user_id=2))
+
+    assert [s["id"] for s in index.search("jo", user_id=1)] == [1]
+    assert [s["id"] for s in index.search("jo", user_id=2)] == [2]
+    assert index.search("jo", user_id=3) == []
+
+
+def test_update_and_remove_keep_index_in_sync():
+    index = ContactIndex(max_results=10)
+    index.on_change(change(1, "John", "Doe", "john.doe@example.com"))
+    index.on_change(change(1, "Jack", "Doe", "jack.doe@example.com", event_type="updated"))
+
+    assert index.search("john", user_id=1) == []
+    assert [s["first_name"] for s in index.search("ja", user_id=1)] == ["Jack"]
+
+    index.on_change(change(1, "Jack", "Doe", "jack.doe@example.com", event_type="deleted"))
+    assert index.search("doe", user_id=1) == []
+
+
+def test_results_are_bounded():
+    index = ContactIndex(max_results=3)
+    for contact_id in range(10):
+        index.on_change(change(contact_id, "Anna", f"Last{contact_id}", f"anna{contact_id}@example.com"))
+
+    assert len(index.search("anna", user_id=1)) == 3
+    assert len(index.search("anna", limit=2, user_id=1)) == 2
+    assert len(index.search("anna", limit=50, user_id=1)) == 3
+
+
+def test_index_is_built_in_the_background_and_follows_the_broker(session):
+    owner = User(username="indexed", email="indexed@example.com", password="secret")
+    session.add(owner)
+    session.commit()
+    scott = Contact(first_name="Scott", last_name="Summers", email="scott@example.com", user_id=owner.id)
+    session.add(scott)
+    session.commit()
+
+    broker = LocalBroker()
+    index = ContactIndex(max_results=10)
+    index.start(broker, TestingSessionLocal)
+    index._loader.join(5)
+    assert [s["id"] for s in index.search("sc", user_id=owner.id)] == [scott.id]
+
+    jean = {"first_name": "Jean", "last_name": "Grey", "email": "jean@example.com"}
+    broker.publish({"type": "created", "contact_id": scott.id + 1, "user_id": owner.id, "contact": jean})
+    broker.publish({"type": "deleted", "contact_id": scott.id, "user_id": owner.id, "contact": None})
+    assert [s["first_name"] for s in index.search("j", user_id=owner.id)] == ["Jean"]
+    assert index.search("sc", user_id=owner.id) == []
+
+    # Events that were lost make the index rebuild from the table, which still has Scott.
+    broker.overflow_all()
+    index._loader.join(5)
+    assert [s["id"] for s in index.search("sc", user_id=owner.id)] == [scott.id]
+
+    # Events without contact data are completed from the database.
+    scott.first_name = "Cyclops"
+    session.commit()
+    broker.publish({"type": "updated", "contact_id": scott.id, "user_id": owner.id, "contact": None})
+    assert [s["first_name"] for s in index.search("cy", user_id=owner.id)] == ["Cyclops"]
+
+
+def test_autocomplete_route(client, token, session, monkeypatch):
+    index = ContactIndex()
+    monkeypatch.setattr(contact_routes, "contact_index", index)
+    monkeypatch.setattr(change_feed.change_broker, "_listeners", [])
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/api/contacts/autocomplete/", params={"q": "how"}, headers=headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+    index.start(change_feed.change_broker, TestingSessionLocal)
+    index._loader.join(5)
+    contact = {
+        "first_name": "Logan",
+        "last_name": "Howlett",
+        "email": "logan@example.com",
+        "phone_number": "0671234567",
+        "birth_date": "1980-05-01",
+    }
+    response = client.post("/api/contacts/", json=contact, headers=headers)
+    assert response.status_code == 201, response.text
+
+    response = client.get("/api/contacts/autocomplete/", params={"q": "how"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert [s["email"] for s in response.json()] == ["logan@example.com"]
@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.configuration.models import User
+from src.repository.users import UserService
+from src.services.auth import auth_service
+from src.utils import avatars
+from src.utils.avatars import LocalAvatarStore, file_digest
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"not really an image"
+OTHER_PNG = PNG + b" either"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalAvatarStore(tmp_path / "avatars", "/api/avatars", {"small": 64, "medium": 250})
+    monkeypatch.setattr(avatars, "Image", None)
+    monkeypatch.setattr(avatars, "avatar_store", store)
+    return store
+
+
+def test_identical_images_are_stored_once(session, store, tmp_path):
+    image = tmp_path / "upload"
+    image.write_bytes(PNG)
+    digest = file_digest(image)
+    users = [User(username=f"face{n}", email=f"face{n}@example.com", password="x") for n in range(2)]
+    session.add_all(users)
+    session.commit()
+
+    assert UserService.set_avatar(users[0].id, digest, image, session, store) is True
+    assert UserService.set_avatar(users[1].id, digest, image, session, store) is False
+    assert store.exists(digest)
+    assert {user.avatar for user in users} == {f"/api/avatars/{digest}/medium"}
+    assert avatars.avatar_urls(digest, store)["small"] == f"/api/avatars/{digest}/small"
+
+
+def test_concurrent_uploads_of_one_image_do_not_share_temporary_files(store, tmp_path):
+    image = tmp_path / "upload"
+    image.write_bytes(PNG * 1000)
+    digest = file_digest(image)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: store.put(digest, image), range(16)))
+
+    assert all(store.path(digest, variant).read_bytes() == PNG * 1000 for variant in store.variants)
+    assert not list(store.root.rglob("*.partial"))
+
+
+def test_variants_are_served_as_immutable(client, owner, session, store, tmp_path):
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    headers = {"Authorization": f"Bearer {token}"}
+    image = tmp_path / "upload"
+    image.write_bytes(OTHER_PNG)
+    digest = file_digest(image)
+    UserService.set_avatar(owner.id, digest, image, session, store)
+
+    response = client.get(f"/api/avatars/{digest}/small")
+    assert response.status_code == 200 and response.content == OTHER_PNG
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    assert client.get(f"/api/avatars/{digest}/huge").status_code == 404
+    assert client.get("/api/auth/avatar", headers=headers).json()["variants"]["medium"] == owner.avatar
+
+    unchanged = client.patch("/api/auth/avatar", headers=headers, files={"file": ("me.png", OTHER_PNG, "image/png")})
+    assert unchanged.json() == {"message": "Avatar unchanged"}
@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.configuration.models import Contact, JobCheckpoint, User
+from src.jobs.birthday_digest import send_birthday_digests
+from src.repository.contact_crud import upcoming_month_days
+
+
+def test_upcoming_month_days_wraps_year_and_leap_day():
+    assert upcoming_month_days(date(2025, 12, 30), 3) == [1230, 1231, 101, 102]
+    assert 229 in upcoming_month_days(date(2025, 2, 27), 3)
+    assert 229 not in upcoming_month_days(date(2024, 3, 1), 3)
+
+
+@pytest.mark.asyncio
+async def test_digest_resumes_from_checkpoint(session):
+    users = [User(username=f"user{i}", email=f"user{i}@example.com", password="x", confirmed=True) for i in range(5)]
+    users.append(User(username="pending", email="pending@example.com", password="x", confirmed=False))
+    session.add_all(users)
+    session.commit()
+    for user in users:
+        session.add(Contact(first_name="Birthday", last_name=user.username, email=f"friend-of-{user.email}",
+                            phone_number="", birth_date=date(1990, 1, 2), user_id=user.id))
+    session.add(Contact(first_name="Later", last_name="Contact", email="later@example.com", phone_number="",
+                        birth_date=date(1990, 6, 1), user_id=users[0].id))
+    session.commit()
+    session_factory = sessionmaker(bind=session.get_bind())
+
+    batches = []
+
+    async def flaky_send(messages):
+        if batches:
+            raise ConnectionError("SMTP went away")
+        batches.append(messages)
+
+    with pytest.raises(ConnectionError):
+        await send_birthday_digests(session_factory, today=date(2025, 12, 30), batch_size=2, chunk_size=3,
+                                    send=flaky_send)
+    assert [message.recipients[0].email for message in batches[0]] == ["user0@example.com", "user1@example.com"]
+    assert "Later" not in batches[0][0].body
+
+    resumed = []
+
+    async def send(messages):
+        resumed.extend(message.recipients[0].email for message in messages)
+
+    sent = await send_birthday_digests(session_factory, today=date(2025, 12, 30), batch_size=2, chunk_size=3, send=send)
+    assert sent == 3
+    assert resumed == ["user2@example.com", "user3@example.com", "user4@example.com"]
+    assert await send_birthday_digests(session_factory, today=date(2025, 12, 30), send=send) == 0
+    assert session.get(JobCheckpoint, "birthday_digest:2025-12-30") is not None
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import change_feed
+from src.services.change_feed import OVERFLOW, LocalBroker, PostgresBroker, sse_events
+
+
+@pytest.mark.asyncio
+async def test_events_reach_only_the_owner():
+    broker = LocalBroker()
+    mine = broker.subscribe(user_id=1)
+    other = broker.subscribe(user_id=2)
+    broker.publish({"type": "created", "contact_id": 10, "user_id": 1, "contact": {}})
+
+    assert (await mine.get(1))["contact_id"] == 10
+    with pytest.raises(asyncio.TimeoutError):
+        await other.get(0.05)
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_overflows_and_is_dropped():
+    broker = LocalBroker()
+    subscriber = broker.subscribe(user_id=1, max_buffer=2)
+    for contact_id in range(3):
+        broker.publish({"type": "updated", "contact_id": contact_id, "user_id": 1, "contact": {}})
+    await asyncio.sleep(0)
+
+    messages = [message async for message in sse_events(broker, subscriber, heartbeat=1)]
+    assert messages == ["event: overflow\ndata: {}\n\n"]
+    assert broker._subscribers == {}
+
+
+def test_websocket_receives_contact_changes(client, token):
+    with client.websocket_connect(f"/api/contacts/events/ws?token={token}") as websocket:
+        response = client.post("/api/contacts/", headers={"Authorization": f"Bearer {token}"}, json={
+            "first_name": "Logan", "last_name": "Howlett", "email": "logan@example.com",
+            "phone_number": "0501234567", "birth_date": "1990-01-01",
+        })
+        assert response.status_code == 201, response.text
+        event = websocket.receive_json()
+    assert event["type"] == "created"
+    assert event["contact_id"] == response.json()["id"]
+    assert event["contact"]["email"] == "logan@example.com"
+
+
+class FakePsycopgConnection:
+    """A psycopg 3 connection that hands out queued notifications and then fails, or waits if it has no error."""
+
+    def __init__(self, payloads, end):
+        self.payloads = payloads
+        self.end = end
+        self.autocommit = False
+        self.listening = []
+
+    def cursor(self):
+        return SimpleNamespace(execute=self.listening.append)
+
+    def notifies(self, timeout):
+        while self.payloads:
+            yield SimpleNamespace(payload=self.payloads.pop(0))
+        if self.end is None:
+            threading.Event().wait()
+        raise self.end
+
+
+class FakeEngine:
+    def __init__(self, connections):
+        self.dialect = SimpleNamespace(driver="psycopg")
+        self.connections = connections
+        self.ready = [threading.Event() for _ in connections]
+
+    def raw_connection(self):
+        self.ready[len(self.ready) - len(self.connections)].wait()
+        return SimpleNamespace(dbapi_connection=self.connections.pop(0), detach=lambda: None, close=lambda: None)
+
+
+def test_listener_reconnects_and_makes_subscribers_resync(monkeypatch):
+    monkeypatch.setattr(change_feed.time, "sleep", lambda seconds: None)
+    event = {"type": "created", "contact_id": 10, "user_id": 1, "contact": {}}
+    connections = [FakePsycopgConnection([json.dumps(event)], ConnectionError("server closed the connection")),
+                   FakePsycopgConnection([], None)]
+    engine = FakeEngine(list(connections))
+    broker = PostgresBroker(engine, channel="changes")
+
+    async def listen():
+        subscriber = broker.subscribe(user_id=1)
+        engine.ready[0].set()
+        received = [await subscriber.get(5)]
+        # Reconnecting drops buffered events, so reconnect only after the first was read.
+        engine.ready[1].set()
+        return received + [await subscriber.get(5)]
+
+    assert asyncio.run(listen()) == [event, OVERFLOW]
+    assert [connection.listening for connection in connections] == [['LISTEN "changes"']] * 2
+    assert all(connection.autocommit for connection in connections)
+
+
+def test_listener_thread_starts_for_process_listeners():
+    event = {"type": "deleted", "contact_id": 10, "user_id": 1, "contact": None}
+    engine = FakeEngine([FakePsycopgConnection([json.dumps(event)], None)])
+    broker = PostgresBroker(engine, channel="changes")
+    received = []
+    delivered = threading.Event()
+    broker.add_listener(lambda change: (received.append(change), delivered.set()))
+    assert broker._listener.is_alive()
+
+    engine.ready[0].set()
+    assert delivered.wait(5)
+    assert received == [event]
@@ -0,0 +1,30 @@
+def contact(number):
+    return {"first_name": f"Sync{number}", "last_name": "Test", "email": f"sync{number}@example.com",
+            "phone_number": f"050123{number:04d}", "birth_date": "1990-01-01"}
+
+
+def test_changes_since_token(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    start = client.get("/api/contacts/changes/", headers=headers, params={"limit": 1000}).json()
+    while start["has_more"]:
+        start = client.get("/api/contacts/changes/", headers=headers,
+                           params={"since": start["next"], "limit": 1000}).json()
+
+    created = client.post("/api/contacts/import/", headers=headers, json=[contact(n) for n in range(3)]).json()
+    first, second, third = (item["id"] for item in created)
+    client.put(f"/api/contacts/{first}", headers=headers, json={**contact(0), "first_name": "Renamed"})
+    client.delete(f"/api/contacts/{second}", headers=headers)
+
+    page = client.get("/api/contacts/changes/", headers=headers,
+                      params={"since": start["next"], "limit": 1}).json()
+    assert [item["id"] for item in page["upserts"]] == [third]
+    assert page["deletions"] == []
+    assert page["has_more"]
+
+    rest = client.get("/api/contacts/changes/", headers=headers, params={"since": page["next"]}).json()
+    assert [(item["id"], item["first_name"]) for item in rest["upserts"]] == [(first, "Renamed")]
+    assert rest["deletions"] == [second]
+    assert not rest["has_more"]
+
+    empty = client.get("/api/contacts/changes/", headers=headers, params={"since": rest["next"]}).json()
+    assert empty == {"upserts": [], "deletions": [], "next": rest["next"], "has_more": False}
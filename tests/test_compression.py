@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from starlette.requests import Request
+
+from src import schemas
+from src.middleware.compression import CompressionMiddleware, choose_encoding
+from src.repository import contact_crud
+from src.utils.content import negotiate
+
+
+class Named(BaseModel):
+    name: str
+
+
+@pytest.fixture(scope="module")
+def compressed_client():
+    app = FastAPI()
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return {"items": ["contact"] * 1000}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for number in range(3):
+                yield f"chunk {number}\n".encode() * 100
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    encodings = {"br": None, "gzip": None}
+    assert choose_encoding("gzip, deflate, br", encodings) == "br"
+    assert choose_encoding("br;q=0.5, gzip", encodings) == "gzip"
+    assert choose_encoding("identity", encodings) is None
+    assert choose_encoding("*;q=0", encodings) is None
+
+
+def test_large_response_is_gzipped(compressed_client):
+    response = compressed_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == {"items": ["contact"] * 1000}
+
+
+def test_small_response_is_not_compressed(compressed_client):
+    response = compressed_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_per_chunk(compressed_client):
+    with compressed_client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == b"".join(f"chunk {number}\n".encode() * 100 for number in range(3))
+
+
+@pytest.mark.parametrize("encoding, module, decompress", [
+    ("br", "brotli", lambda module, raw: module.decompress(raw)),
+    ("zstd", "zstandard", lambda module, raw: module.ZstdDecompressor().decompressobj().decompress(raw)),
+])
+def test_optional_encodings_round_trip(compressed_client, encoding, module, decompress):
+    module = pytest.importorskip(module)
+    with compressed_client.stream("GET", "/large", headers={"Accept-Encoding": encoding}) as response:
+        assert response.headers["content-encoding"] == encoding
+        raw = b"".join(response.iter_raw())
+    assert decompress(module, raw) == b'{"items":[' + b",".join([b'"contact"'] * 1000) + b"]}"
+
+
+def test_contacts_as_msgpack(client, token, session, owner):
+    asyncio.run(contact_crud.create_contact(session, schemas.ContactCreate(
+        first_name="Packed", last_name="Contact", email="packed@example.com", phone_number="0671234567",
+        birth_date="1990-01-02"), user_id=owner.id))
+    response = client.get("/api/contacts/", headers={"Authorization": f"Bearer {token}",
+                                                     "Accept": "application/msgpack"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"].split(", ")
+    contacts = msgpack.unpackb(response.content)
+    assert [schemas.Contact.model_validate(contact).model_dump(mode="json") for contact in contacts] == contacts
+    assert "packed@example.com" in [contact["email"] for contact in contacts]
+
+
+@pytest.mark.parametrize("accept, media_type", [
+    ("application/msgpack;q=0", "application/json"),
+    ("application/json, application/msgpack;q=0.5", "application/json"),
+    ("application/json;q=0.5, application/msgpack", "application/msgpack"),
+    ("*/*", "application/json"),
+])
+def test_accept_weights_choose_the_format(accept, media_type):
+    request = Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+    response = negotiate(request, [{"name": "packed"}], Named)
+    assert response.media_type == media_type
+    assert response.headers["vary"] == "Accept"
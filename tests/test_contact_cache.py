@@ -0,0 +1,105 @@
+import asyncio
+
+from src import schemas
+from src.configuration.models import User
+from src.repository import contact_crud
+from src.repository.cache import ContactCache, LRUCache, contact_cache
+from src.repository.single_flight import SingleFlight
+from src.utils.kvstore import MemoryStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired():
+    clock = FakeClock()
+    cache = LRUCache(max_entries=2, max_bytes=10, clock=clock)
+    cache.set("a", b"1111", 10)
+    cache.set("b", b"2222", 10)
+    assert cache.get("a") == b"1111"
+    cache.set("c", b"3333", 10)
+    assert cache.get("b") is None and cache.evictions == 1
+    cache.set("d", b"444444", 10)
+    assert cache.get("a") is None and cache.size == 10
+    clock.now = 11
+    assert cache.get("d") is None and cache.size == 4
+
+
+def test_invalidation_is_scoped_to_the_owner():
+    cache = ContactCache(LRUCache(), MemoryStore(), shared=False, ttl=30)
+    loads = []
+
+    def get(owner, value):
+        async def load(key):
+            loads.append(value)
+            return value
+
+        return asyncio.run(cache.get_or_load(owner, "list", None, load))
+
+    assert get(1, "one") == "one"
+    assert get(2, "two") == "two"
+    cache.invalidate(1)
+    assert get(1, "one again") == "one again"
+    assert get(2, "two again") == "two"
+    assert loads == ["one", "two", "one again"]
+    assert cache.stats()["hit_rate"] == 0.25
+
+
+def test_read_running_during_a_write_is_not_shared_after_it():
+    cache = ContactCache(LRUCache(), MemoryStore(), shared=False, ttl=30)
+    flight = SingleFlight(grace=0)
+    stored = {"value": "old"}
+
+    async def read(started=None, release=None):
+        async def work():
+            value = stored["value"]
+            if started is not None:
+                started.set()
+                await release.wait()
+            return value
+
+        async def load(key):
+            return await flight.do(key, work)
+
+        return await cache.get_or_load(1, "list", None, load)
+
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+        slow = asyncio.ensure_future(read(started, release))
+        await started.wait()
+        stored["value"] = "new"
+        cache.invalidate(1)
+        after_write = asyncio.ensure_future(read())
+        await asyncio.sleep(0)
+        release.set()
+        return await slow, await after_write, await read()
+
+    assert asyncio.run(main()) == ("old", "new", "new")
+
+
+def test_writes_invalidate_cached_reads(session):
+    user = User(username="cached", email="cached@example.com", password="x", confirmed=True)
+    session.add(user)
+    session.commit()
+    contact = schemas.ContactCreate(first_name="Cache", last_name="Me", email="cache.me@example.com",
+                                    phone_number="0671234567", birth_date="1990-01-02")
+
+    created = asyncio.run(contact_crud.create_contact(session, contact, user_id=user.id))
+    assert [c.id for c in asyncio.run(contact_crud.get_contacts(session, user_id=user.id))] == [created.id]
+    assert asyncio.run(contact_crud.get_contact(session, created.id, user_id=user.id)).first_name == "Cache"
+    assert asyncio.run(contact_crud.get_contacts(session, user_id=user.id))[0].first_name == "Cache"
+    assert contact_cache.stats()["local_hits"] == 1
+
+    update = schemas.ContactUpdate(**{**contact.dict(), "first_name": "Fresh"})
+    asyncio.run(contact_crud.update_contact(session, created.id, update, user_id=user.id))
+    assert asyncio.run(contact_crud.get_contact(session, created.id, user_id=user.id)).first_name == "Fresh"
+    assert asyncio.run(contact_crud.search_contacts(session, "fresh", user_id=user.id))[0].id == created.id
+
+    asyncio.run(contact_crud.delete_contact(session, created.id, user_id=user.id))
+    assert asyncio.run(contact_crud.get_contact(session, created.id, user_id=user.id)) is None
+    assert asyncio.run(contact_crud.get_contacts(session, user_id=user.id)) == []
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from src import schemas
+from src.configuration import models
+from src.configuration.models import User
+from src.jobs.stats_reconcile import reconcile_contact_stats
+from src.repository import contact_crud, contact_stats
+
+
+def _contact(number, domain="example.com", birth_date="1990-03-04"):
+    return schemas.ContactCreate(first_name=f"Counted{number}", last_name="Person", phone_number="0671234567",
+                                 email=f"counted{number}@{domain}", birth_date=birth_date)
+
+
+def _stats(session, user_id):
+    return asyncio.run(contact_stats.get_contact_stats(session, user_id))
+
+
+@pytest.fixture(scope="module")
+def counted(session):
+    user = User(username="counter", email="counter@example.com", password="x", confirmed=True)
+    session.add(user)
+    session.commit()
+    return user.id
+
+
+def test_writes_keep_the_counters_up_to_date(session, counted):
+    first = asyncio.run(contact_crud.create_contact(session, _contact(0), user_id=counted))
+    created = asyncio.run(contact_crud.create_contacts(session, [
+        _contact(1, "Gmail.com"), _contact(2, "gmail.com", "1985-12-31"), _contact(3, "ukr.net"),
+    ], user_id=counted))
+    stats = _stats(session, counted)
+    assert stats.total == 4
+    assert stats.birthdays_by_month[3] == 3 and stats.birthdays_by_month[12] == 1
+    assert stats.email_domains == {"gmail.com": 2, "example.com": 1, "ukr.net": 1}
+
+    asyncio.run(contact_crud.update_contact(session, first.id, _contact(0, "ukr.net", "1990-07-01"), counted))
+    asyncio.run(contact_crud.delete_contact(session, created[0].id, counted))
+    asyncio.run(contact_crud.merge_contacts(session, created[1].id, [created[2].id], counted))
+    stats = _stats(session, counted)
+    assert stats.total == 2
+    assert stats.birthdays_by_month[3] == 0 and stats.birthdays_by_month[7] == 1
+    assert stats.email_domains == {"gmail.com": 1, "ukr.net": 1}
+
+
+def test_reconciliation_repairs_drift(session, counted):
+    expected = _stats(session, counted)
+    stat = models.ContactStat
+    session.execute(update(stat).where(stat.user_id == counted, stat.kind == "total").values(count=40))
+    session.add(stat(user_id=counted, kind="email_domain", key="stale.com", count=3))
+    session.commit()
+    assert _stats(session, counted) != expected
+
+    session_factory = sessionmaker(bind=session.get_bind())
+    assert reconcile_contact_stats(session_factory, chunk_size=1) == 1
+    assert _stats(session, counted) == expected
+    assert reconcile_contact_stats(session_factory) == 0
+
+
+def test_every_counter_change_locks_the_total_first(monkeypatch):
+    written = []
+    monkeypatch.setattr(contact_stats, "_write_counts", lambda db, user_id, counts, add: written.append(counts))
+    # Moving a contact to another email domain leaves the total unchanged.
+    deltas = contact_stats.contact_deltas(added=[("a@new.com", 304)], removed=[("a@old.com", 304)])
+    contact_stats.apply_deltas(None, 1, deltas)
+    contact_stats.apply_deltas(None, 1, contact_stats.contact_deltas(added=[("a@same.com", 304)],
+                                                                     removed=[("a@same.com", 304)]))
+    assert written == [{contact_stats.TOTAL: 0, ("email_domain", "new.com"): 1, ("email_domain", "old.com"): -1}]
+
+
+def test_stats_route(client, token, session, owner):
+    asyncio.run(contact_crud.create_contact(session, _contact(10, "i.ua"), user_id=owner.id))
+    response = client.get("/api/contacts/stats/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] >= 1 and body["email_domains"]["i.ua"] == 1
+    assert sorted(body["birthdays_by_month"], key=int) == [str(month) for month in range(1, 13)]
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from src.configuration.database import set_deadline
+from src.middleware.deadline import DeadlineMiddleware
+
+SLOW_QUERY = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+                  "SELECT count(*) FROM n")
+
+
+def test_statements_are_interrupted_at_the_deadline(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}", pool_size=1)
+    with Session(engine) as db:
+        set_deadline(db, time.monotonic() + 0.05)
+        started = time.monotonic()
+        with pytest.raises(OperationalError, match="interrupted"):
+            db.execute(SLOW_QUERY)
+        assert time.monotonic() - started < 5
+    with engine.connect() as connection:
+        # The pooled connection no longer carries the expired deadline.
+        assert connection.execute(text("SELECT count(*) FROM (SELECT 1 UNION SELECT 2)")).scalar() == 2
+    engine.dispose()
+
+
+def _call(middleware, path="/api/contacts/1", headers=(), disconnect_after=None):
+    messages = []
+
+    async def receive():
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": list(headers)}
+    asyncio.run(middleware(scope, receive, send))
+    return scope, messages
+
+
+def test_slow_requests_get_504_and_are_cancelled():
+    cancelled = []
+
+    async def app(scope, receive, send):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(scope["path"])
+            raise
+
+    middleware = DeadlineMiddleware(app, timeout=10, timeout_max=60, route_timeouts={"search": 0.05})
+    scope, messages = _call(middleware, "/api/contacts/search/")
+    assert messages[0]["status"] == 504 and cancelled == ["/api/contacts/search/"]
+    assert scope["state"]["deadline"] <= time.monotonic()
+
+    _, messages = _call(middleware, headers=[(b"x-request-timeout", b"0.05")])
+    assert messages[0]["status"] == 504
+
+    _, messages = _call(middleware, disconnect_after=0.05)
+    assert messages == [] and len(cancelled) == 3
+
+
+def test_fast_requests_pass_through():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    _, messages = _call(DeadlineMiddleware(app, timeout=1, timeout_max=1, route_timeouts={}))
+    assert [message.get("status") for message in messages] == [200, None]
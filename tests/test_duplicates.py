@@ -0,0 +1,67 @@
+import asyncio
+from datetime import date
+
+from src.configuration.models import Contact, Job
+from src.jobs.duplicates import blocking_keys, find_duplicate_groups
+from src.jobs.worker import process_next
+
+
+def test_blocking_keys_normalize_name_phone_and_email():
+    keys = blocking_keys("Zoë", "O'Brien", "Zoe.OBrien+work@Example.com", "+380671234567")
+    assert keys == ["name:brien o zoe", "phone:+380671234567", "email:zoeobrien"]
+    assert blocking_keys("O'Brien", "Zoe", "zoe@example.com", None)[0] == "name:brien o zoe"
+
+
+def test_find_and_merge_duplicate_groups(client, session, owner, token):
+    contacts = [
+        Contact(first_name="Scott", last_name="Summers", email="scott@example.com",
+                phone_number="067 000 11 22", phone_e164="+380670001122", birth_date=date(1980, 1, 1), additional_data="Leader"),
+        Contact(first_name="SCOTT", last_name="summers", email="cyclops@example.com",
+                phone_number="", birth_date=date(1980, 1, 1), additional_data="Visor"),
+        Contact(first_name="Cyclops", last_name="", email="Scott+x@example.org",
+                phone_number="+380670001122", phone_e164="+380670001122", birth_date=date(1980, 1, 1)),
+        Contact(first_name="Jean", last_name="Grey", email="jean@example.com", phone_number="0509998877",
+                phone_e164="+380509998877", birth_date=date(1982, 3, 3)),
+    ]
+    for contact in contacts:
+        contact.user_id = owner.id
+    session.add_all(contacts)
+    session.add(Contact(first_name="Scott", last_name="Summers", email="scott@elsewhere.com", phone_number="",
+                        birth_date=date(1980, 1, 1), user_id=owner.id + 1))
+    session.commit()
+
+    groups = find_duplicate_groups(session, user_id=owner.id)
+    assert len(groups) == 1
+    assert len(groups[0]["contact_ids"]) == 3
+    assert len(find_duplicate_groups(session)) == 1
+
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/api/contacts/duplicates/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+    assert response.headers["X-Duplicates-Pending"] == "true"
+    # The job is queued once until the contacts change again.
+    assert client.get("/api/contacts/duplicates/", headers=headers).status_code == 200
+    assert session.query(Job).filter(Job.type == "duplicates").count() == 1
+
+    assert asyncio.run(process_next(session, "duplicates"))
+    response = client.get("/api/contacts/duplicates/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert "X-Duplicates-Pending" not in response.headers
+    [group] = response.json()
+    keep_id, *merge_ids = [contact["id"] for contact in group["contacts"]]
+
+    response = client.post("/api/contacts/duplicates/merge/", json={"keep_id": keep_id, "merge_ids": merge_ids},
+                           headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["additional_data"] == "Leader\nVisor"
+    assert find_duplicate_groups(session) == []
+    # The merged contacts are gone, so the stored group no longer has two contacts.
+    response = client.get("/api/contacts/duplicates/", headers=headers)
+    assert response.json() == []
+    assert response.headers["X-Duplicates-Pending"] == "true"
+    assert session.query(Contact).filter(Contact.user_id == owner.id).count() == 2
+
+    response = client.post("/api/contacts/duplicates/merge/", json={"keep_id": keep_id, "merge_ids": merge_ids},
+                           headers=headers)
+    assert response.status_code == 404, response.text
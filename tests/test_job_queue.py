@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import pytest
+
+from src.configuration.models import Job
+from src.jobs import queue
+from src.jobs.worker import process_next
+
+
+def test_claim_takes_due_jobs_once(session):
+    first = queue.enqueue(session, "report", {"n": 1})
+    queue.enqueue(session, "report", {"n": 2}, delay=3600)
+    queue.enqueue(session, "other", {"n": 3})
+
+    job = queue.claim(session, "report")
+    assert job.id == first.id
+    assert job.status == queue.RUNNING
+    assert job.attempts == 1
+    assert queue.claim(session, "report") is None
+
+
+def test_failed_jobs_back_off_and_dead_letter(session, monkeypatch):
+    monkeypatch.setattr(queue, "JOB_BACKOFF_SECONDS", 10)
+    job = queue.enqueue(session, "flaky", {}, max_attempts=2)
+
+    job = queue.claim(session, "flaky")
+    before = queue.utcnow()
+    queue.fail(session, job, "boom")
+    assert job.status == queue.QUEUED
+    assert job.run_at >= before + timedelta(seconds=10)
+    assert queue.claim(session, "flaky") is None
+
+    job.run_at = queue.utcnow()
+    session.commit()
+    job = queue.claim(session, "flaky")
+    queue.fail(session, job, "boom again")
+    assert job.status == queue.DEAD
+    assert job.last_error == "boom again"
+
+
+def test_stale_running_jobs_are_requeued(session):
+    job = queue.enqueue(session, "slow", {})
+    job = queue.claim(session, "slow")
+    job.locked_at = queue.utcnow() - timedelta(hours=1)
+    session.commit()
+
+    assert queue.requeue_stale(session, stale_after=60) == 1
+    assert queue.claim(session, "slow").id == job.id
+
+
+def test_stale_jobs_without_attempts_left_are_dead_lettered(session):
+    queue.enqueue(session, "crashing", {}, max_attempts=1)
+    job = queue.claim(session, "crashing")
+    job.locked_at = queue.utcnow() - timedelta(hours=1)
+    session.commit()
+
+    assert queue.requeue_stale(session, stale_after=60) == 0
+    session.refresh(job)
+    assert job.status == queue.DEAD
+    assert queue.claim(session, "crashing") is None
+
+
+def test_uncommitted_job_rolls_back_with_the_caller(session):
+    queue.enqueue(session, "together", {}, commit=False)
+    session.rollback()
+    assert queue.claim(session, "together") is None
+
+
+@pytest.mark.asyncio
+async def test_process_next_runs_handler(session):
+    done = []
+
+    async def handler(payload, db):
+        done.append(payload["value"])
+
+    async def broken(payload, db):
+        raise RuntimeError("no route to host")
+
+    queue.enqueue(session, "ok", {"value": 42})
+    queue.enqueue(session, "broken", {})
+
+    assert await process_next(session, "ok", {"ok": handler})
+    assert done == [42]
+    assert await process_next(session, "broken", {"broken": broken})
+    failed = session.query(Job).filter(Job.type == "broken").one()
+    assert failed.status == queue.QUEUED
+    assert "no route to host" in failed.last_error
+    assert not await process_next(session, "ok", {"ok": handler})
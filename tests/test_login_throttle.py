@@ -0,0 +1,90 @@
+import pytest
+
+from src.services.auth import auth_service
+from src.services.login_throttle import LoginThrottle, login_throttle
+from src.utils.kvstore import MemoryStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_store_expires_keys():
+    clock = Clock()
+    store = MemoryStore(clock=clock)
+    assert store.incr("hits", ttl=10) == 1
+    assert store.incr("hits", ttl=10) == 2
+    clock.now = 10
+    assert store.get("hits") is None
+    assert store.incr("hits", ttl=10) == 1
+
+
+def test_memory_store_evicts_least_recently_used_and_expired_keys():
+    clock = Clock()
+    store = MemoryStore(max_keys=3, clock=clock)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.set("c", 3, ttl=5)
+    assert store.get("a") == 1
+    store.set("d", 4)
+    assert [store.get(key) for key in "abcd"] == [1, None, 3, 4]
+    clock.now = 5
+    store.set("e", 5)
+    assert len(store._data) == 3 and store.get("a") == 1
+    for number in range(1000):
+        store.set("short", number, ttl=1)
+    assert len(store._expiries) <= 2 * store.max_keys
+
+
+def test_lockout_doubles_with_every_failure():
+    clock = Clock()
+    throttle = LoginThrottle(MemoryStore(clock=clock), max_failures=3, max_ip_failures=100,
+                             lockout=30, max_lockout=100, window=3600)
+    for _ in range(2):
+        throttle.record_failure("Bob@example.com", "10.0.0.1")
+    assert throttle.check("bob@example.com", "10.0.0.1") == 0
+
+    throttle.record_failure("bob@example.com", "10.0.0.1")
+    assert throttle.check("bob@example.com", "10.0.0.2") == 30
+    clock.now = 30
+    throttle.record_failure("bob@example.com", "10.0.0.1")
+    assert throttle.check("bob@example.com", "10.0.0.2") == 60
+    clock.now = 90
+    throttle.record_failure("bob@example.com", "10.0.0.1")
+    assert throttle.check("bob@example.com", "10.0.0.2") == 100
+    assert throttle.check("alice@example.com", "10.0.0.2") == 0
+
+
+def test_lockout_stays_capped_after_many_failures():
+    throttle = LoginThrottle(MemoryStore(), max_failures=3, max_ip_failures=10_000,
+                             lockout=30, max_lockout=3600, window=3600)
+    for _ in range(2000):
+        throttle.record_failure("bob@example.com", "10.0.0.1")
+    assert throttle.check("bob@example.com", "10.0.0.2") == pytest.approx(3600, abs=1)
+
+
+def test_ip_is_locked_across_accounts():
+    throttle = LoginThrottle(MemoryStore(), max_failures=100, max_ip_failures=3, lockout=30)
+    for number in range(3):
+        throttle.record_failure(f"user{number}@example.com", "10.0.0.1")
+    assert throttle.check("someone@example.com", "10.0.0.1") == pytest.approx(30, abs=1)
+    assert throttle.check("someone@example.com", "10.0.0.2") == 0
+
+
+def test_locked_login_skips_password_check(client, monkeypatch):
+    monkeypatch.setattr(login_throttle, "store", MemoryStore())
+    form = {"username": "nobody@example.com", "password": "guess"}
+    for _ in range(login_throttle.max_failures):
+        assert client.post("/api/auth/login", data=form).status_code == 401
+
+    def fail(*args):
+        raise AssertionError("password was checked")
+
+    monkeypatch.setattr(auth_service, "verify_and_update", fail)
+    response = client.post("/api/auth/login", data=form)
+    assert response.status_code == 429, response.text
+    assert int(response.headers["Retry-After"]) > 0
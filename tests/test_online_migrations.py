@@ -0,0 +1,43 @@
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from migrations import online
+
+
+@pytest.fixture
+def connection(tmp_path, monkeypatch):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'online.db'}")
+    with engine.connect() as connection:
+        connection.exec_driver_sql("CREATE TABLE items (id INTEGER PRIMARY KEY, name VARCHAR, upper_name VARCHAR)")
+        connection.exec_driver_sql("CREATE TABLE job_checkpoints (name VARCHAR(100) PRIMARY KEY, "
+                                   "value VARCHAR(255) NOT NULL, updated_at DATETIME)")
+        connection.execute(sa.text("INSERT INTO items (id, name) VALUES (:id, :name)"),
+                           [{"id": number, "name": f"item{number}"} for number in range(1, 11)])
+        connection.commit()
+        context = MigrationContext.configure(connection)
+        with Operations.context(context), context.begin_transaction():
+            yield connection
+    engine.dispose()
+
+
+def test_backfill_applies_sql_in_batches(connection):
+    assert online.backfill("items", {"upper_name": "upper(name)"}, where="id > 2", batch_size=3) == 8
+    rows = connection.execute(sa.text("SELECT id, upper_name FROM items ORDER BY id")).all()
+    assert rows[1] == (2, None) and rows[2] == (3, "ITEM3") and rows[-1] == (10, "ITEM10")
+
+
+def test_backfill_resumes_from_checkpoint(connection):
+    connection.execute(sa.text("INSERT INTO job_checkpoints (name, value) VALUES ('migration:test', '6')"))
+    connection.commit()
+    visited = online.backfill("items", lambda row: {"upper_name": row.name.upper()}, columns=["name"],
+                              batch_size=3, checkpoint="migration:test")
+    assert visited == 4
+    assert connection.execute(sa.text("SELECT count(*) FROM items WHERE upper_name IS NOT NULL")).scalar() == 4
+    assert connection.execute(sa.text("SELECT count(*) FROM job_checkpoints")).scalar() == 0
+
+
+def test_add_column_rejects_not_null_without_default(connection):
+    with pytest.raises(ValueError):
+        online.add_column("items", sa.Column("price", sa.Integer(), nullable=False))
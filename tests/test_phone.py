@@ -0,0 +1,37 @@
+import pytest
+
+from src.utils.phone import normalize_phone
+
+
+@pytest.mark.parametrize("raw", ["+380 (67) 123-45-67", "0671234567", "380671234567", "00380671234567", "67 123 45 67"])
+def test_normalize_phone_formats(raw):
+    assert normalize_phone(raw) == "+380671234567"
+
+
+def test_normalize_phone_keeps_foreign_numbers():
+    assert normalize_phone("+1 (202) 555-0143") == "+12025550143"
+
+
+@pytest.mark.parametrize("raw", ["", "12", "+1234567890123456", "call me"])
+def test_normalize_phone_rejects_garbage(raw):
+    assert normalize_phone(raw) is None
+
+
+def test_lookup_by_phone_after_import(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    contacts = [
+        {"first_name": "Ororo", "last_name": "Munroe", "email": "storm@example.com",
+         "phone_number": "+380 (67) 123-45-67", "birth_date": "1975-10-10"},
+        {"first_name": "Kurt", "last_name": "Wagner", "email": "kurt@example.com",
+         "phone_number": "050 111 22 33", "birth_date": "1976-02-02"},
+    ]
+    response = client.post("/api/contacts/import/", json=contacts, headers=headers)
+    assert response.status_code == 201, response.text
+    assert [c["phone_e164"] for c in response.json()] == ["+380671234567", "+380501112233"]
+
+    response = client.get("/api/contacts/by_phone/0671234567", headers=headers)
+    assert response.status_code == 200, response.text
+    assert [c["email"] for c in response.json()] == ["storm@example.com"]
+
+    response = client.get("/api/contacts/by_phone/abc", headers=headers)
+    assert response.status_code == 400, response.text
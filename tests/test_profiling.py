@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware.profiling import ProfilingMiddleware
+
+
+def make_client(output_dir, **options):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"items": [str(number) for number in range(1000)]}
+
+    app.add_middleware(ProfilingMiddleware, output_dir=output_dir, **options)
+    return TestClient(app)
+
+
+def test_requests_are_not_profiled_without_token(tmp_path):
+    client = make_client(tmp_path, token="secret", sample_rate=0)
+    response = client.get("/ping", headers={"X-Profile-Token": "wrong", "X-Profile": "cpu"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert "x-profile-id" not in client.get("/ping", headers={"X-Profile": "cpu"}).headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile_cpu_and_allocations(tmp_path):
+    client = make_client(tmp_path, token="secret", sample_rate=0)
+    response = client.get("/ping", headers={"X-Profile-Token": "secret", "X-Profile": "cpu,alloc"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    assert (tmp_path / f"{profile_id}.folded").exists()
+    assert (tmp_path / f"{profile_id}.alloc.txt").read_text()
+
+
+def test_sampled_requests_are_profiled(tmp_path):
+    client = make_client(tmp_path, token=None, sample_rate=1)
+    response = client.get("/ping")
+    assert (tmp_path / f"{response.headers['x-profile-id']}.folded").exists()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from scripts.generate_data import generate
+from src import schemas
+from src.configuration.models import Base
+from src.jobs.queue import claim
+from src.repository import contact_crud, contact_stats
+from src.repository.users import UserService
+
+# Queries that must be answered from an index. Set QUERY_PLAN_DATABASE_URL to an
+# empty Postgres database to check the plans there instead of on SQLite.
+QUERIES = {
+    "get_contact": lambda db: contact_crud.get_contact(db, 10, user_id=1),
+    "get_contacts": lambda db: contact_crud.get_contacts(db, user_id=1),
+    "get_contacts_by_ids": lambda db: contact_crud.get_contacts_by_ids(db, [1, 2, 3], user_id=1),
+    "get_contacts_by_phone": lambda db: contact_crud.get_contacts_by_phone(db, "+380671234567", user_id=1),
+    "search_contacts": lambda db: contact_crud.search_contacts(db, "olen", user_id=1),
+    "get_upcoming_birthdays": lambda db: contact_crud.get_upcoming_birthdays(db, 7, user_id=1,
+                                                                              today=date(2024, 6, 1)),
+    "get_contacts_by_tags": lambda db: contact_crud.get_contacts(
+        db, user_id=1, tags=schemas.TagFilter(all=["work", "vip"], any=["family", "clients"], none=["school"])),
+    "get_contact_stats": lambda db: contact_stats.get_contact_stats(db, user_id=1),
+    "get_changes": lambda db: contact_crud.get_changes(db, since=100, user_id=1),
+    "get_user_by_email": lambda db: UserService.get_user_by_email("user1@example.com", db),
+    "claim_job": lambda db: claim(db, "email"),
+}
+LARGE_TABLES = {"contacts", "contact_tombstones", "contact_tags", "tags", "contact_stats", "users", "jobs"}
+
+
+@pytest.fixture(scope="module")
+def plan_engine(tmp_path_factory):
+    url = os.getenv("QUERY_PLAN_DATABASE_URL") or f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    generate(engine, users=50, contacts=5000, seed=1)
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(connection, statement, parameters) -> list[str]:
+    """Return the plan steps that read a large table without an index."""
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).scalars().all()
+        return [step for step in plan if "Seq Scan" in step and any(f" {t} " in f"{step} " for t in LARGE_TABLES)]
+    plan = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    return [step for step in plan if step.startswith("SCAN ") and step.split()[1] in LARGE_TABLES]
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_uses_index(plan_engine, name):
+    with Session(plan_engine) as db, captured_statements(plan_engine) as statements:
+        result = QUERIES[name](db)
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
+        db.rollback()
+    assert statements, f"{name} ran no queries"
+    with plan_engine.connect() as connection:
+        for statement, parameters in statements:
+            assert not full_scans(connection, statement, parameters), f"{name} scans a table:\n{statement}"
+
+
+def test_contact_list_is_read_in_index_order(plan_engine):
+    if plan_engine.dialect.name != "sqlite":
+        pytest.skip("temporary sort steps are only named in SQLite plans")
+    with Session(plan_engine) as db, captured_statements(plan_engine) as statements:
+        asyncio.run(contact_crud.get_contacts(db, user_id=1))
+    with plan_engine.connect() as connection:
+        plan = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statements[0][0]}",
+                                                             statements[0][1])]
+    assert not any("TEMP B-TREE" in step for step in plan), plan
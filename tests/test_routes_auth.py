@@ -1,11 +1,11 @@
-from unittest.mock import MagicMock
 import pytest
-from src.configuration.models import User
+from settings import BCRYPT_ROUNDS
+from src.configuration.models import Job, User
+from src.services.auth import auth_service
+from src.services.hashing import calibrate, make_context
 
 
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_create_user(client, session, user):
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -14,9 +14,16 @@ def test_create_user(client, user, monkeypatch):
     data = response.json()
     assert data["email"] == user.get("email")
     assert "email" in data
+    job = session.query(Job).filter(Job.type == "email").one()
+    assert job.payload["kind"] == "confirmation"
+    assert job.payload["email"] == user.get("email")
 
 
-def test_repeat_create_user(client, user):
+def test_repeat_create_user(client, user, monkeypatch):
+    def hash_password(password):
+        raise AssertionError("a taken email is rejected before the password is hashed")
+
+    monkeypatch.setattr("src.repository.users.hash_handler.get_password_hash", hash_password)
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -26,6 +33,18 @@ def test_repeat_create_user(client, user):
     assert data["detail"] == "Account already exists"
 
 
+def test_signup_keeps_no_user_without_their_email_job(client, session, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("queue unavailable")
+
+    monkeypatch.setattr("src.routes.auth.enqueue", broken)
+    with pytest.raises(RuntimeError):
+        client.post("/api/auth/signup", json={"username": "rogue", "email": "rogue@example.com",
+                                              "password": "123456789"})
+    session.rollback()
+    assert session.query(User).filter(User.email == "rogue@example.com").first() is None
+
+
 def test_login_user_not_confirmed(client, user):
     response = client.post(
         "/api/auth/login",
@@ -49,6 +68,33 @@ def test_login_user(client, session, user):
     assert data["token_type"] == "bearer"
 
 
+def test_login_wrong_password(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": "wrong password"},
+    )
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid password"
+
+
+def test_login_rehashes_outdated_hash(client, session, user):
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.password = make_context(rounds=4).hash(user.get('password'))
+    session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+    current_user = session.query(User).filter(User.email == user.get('email')).first()
+    assert current_user.password.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+
+
+def test_calibrate_stays_under_target():
+    rounds, elapsed = calibrate(target_ms=0)
+    assert rounds == 4
+
+
 def test_login_wrong_email(client, user):
     response = client.post(
         "/api/auth/login",
@@ -57,3 +103,32 @@ def test_login_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == "Invalid email"
+
+
+def test_confirmed_email(client, session):
+    client.post("/api/auth/signup", json={"username": "storm", "email": "storm@example.com", "password": "123456789"})
+    token = auth_service.create_email_token({"sub": "storm@example.com"})
+
+    response = client.get(f"/api/auth/confirmed_email/{token}")
+    assert response.json() == {"message": "Email confirmed"}
+    response = client.get(f"/api/auth/confirmed_email/{token}")
+    assert response.json() == {"message": "Your email is already confirmed"}
+    response = client.get(f"/api/auth/confirmed_email/{auth_service.create_email_token({'sub': 'x@example.com'})}")
+    assert response.status_code == 400, response.text
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    refresh_token = response.json()["refresh_token"]
+    response = client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {refresh_token}"})
+    assert response.status_code == 200, response.text
+
+    stale_token = await auth_service.create_refresh_token(data={"sub": user.get('email')}, expires_delta=60)
+    response = client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {stale_token}"})
+    assert response.status_code == 401, response.text
+    response = client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {refresh_token}"})
+    assert response.status_code == 401, response.text
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, select
+
+from src import schemas
+from src.configuration import database, models
+from src.configuration.database import ShardedSession, ShardMap
+from src.jobs import rebalance
+from src.jobs.rebalance import move_user
+from src.repository import contact_crud, contact_stats, tag_crud
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    engines = [create_engine(f"sqlite:///{tmp_path / f'shard{number}.db'}") for number in range(2)]
+    models.Base.metadata.create_all(primary)
+    for engine in engines:
+        models.Base.metadata.create_all(engine, tables=[table for table in models.Base.metadata.sorted_tables
+                                                        if table.info.get("sharded")])
+    shard_map = ShardMap(primary, engines, ttl=0)
+    monkeypatch.setattr(database, "shard_map", shard_map)
+    yield shard_map
+    for engine in [primary, *engines]:
+        engine.dispose()
+
+
+def _create(shard_map, user_id, email):
+    with ShardedSession(bind=shard_map.directory) as db:
+        db.info["user_id"] = user_id
+        contact = schemas.ContactCreate(first_name="Ann", last_name="Lee", email=email, phone_number="0671234567",
+                                        birth_date=date(1990, 1, 2))
+        return asyncio.run(contact_crud.create_contact(db, contact, user_id=user_id)).id
+
+
+def _rename(shard_map, contact_id, first_name, shard=None):
+    with ShardedSession(bind=shard_map.directory) as db:
+        db.info["user_id"] = 1
+        if shard is not None:
+            db.info["shard"] = shard
+        contact = schemas.ContactUpdate(first_name=first_name, last_name="Lee", email=f"{contact_id}@example.com",
+                                        phone_number="0671234567", birth_date=date(1990, 1, 2))
+        asyncio.run(contact_crud.update_contact(db, contact_id, contact, user_id=1))
+
+
+def _owners(engine):
+    with engine.connect() as connection:
+        return sorted(connection.execute(select(models.Contact.user_id)).scalars())
+
+
+def test_contacts_are_routed_to_the_owner_shard(shards):
+    shards.assign(1, 0)
+    shards.assign(2, 1)
+    ids = {_create(shards, 1, "one@example.com"), _create(shards, 2, "two@example.com")}
+    assert len(ids) == 2
+    assert _owners(shards.shards[0]) == [1]
+    assert _owners(shards.shards[1]) == [2]
+    with ShardedSession(bind=shards.directory) as db:
+        assert db.get(models.ChangeCounter, "ids").value >= max(ids)
+        with pytest.raises(LookupError):
+            db.execute(select(models.Contact)).all()
+        assert [len(db.execute(select(models.Contact)).all()) for _ in database.each_shard(db)] == [1, 1]
+        # Every owner numbers their changes on their own shard.
+        assert [db.execute(select(models.ContactSequence.user_id, models.ContactSequence.value)).all()
+                for _ in database.each_shard(db)] == [[(1, 1)], [(2, 1)]]
+
+
+def test_new_users_are_placed_by_hash(shards):
+    assert shards.shard_for(7) == shards.hash_shard(7)
+    with shards.directory.connect() as connection:
+        assert connection.execute(select(models.UserShard.shard).where(models.UserShard.user_id == 7)).scalar() \
+               == shards.hash_shard(7)
+
+
+def test_move_user_keeps_ids_and_sync_state(shards):
+    shards.assign(1, 0)
+    kept = _create(shards, 1, "kept@example.com")
+    deleted = _create(shards, 1, "deleted@example.com")
+    with ShardedSession(bind=shards.directory) as db:
+        db.info["user_id"] = 1
+        asyncio.run(contact_crud.delete_contact(db, deleted, user_id=1))
+        tag = asyncio.run(tag_crud.create_tag(db, "family", user_id=1))
+        asyncio.run(tag_crud.tag_contact(db, kept, tag.id, user_id=1))
+
+    assert move_user(1, 1, shards, settle=0) == 1
+    assert shards.shard_for(1) == 1
+    assert _owners(shards.shards[0]) == []
+    with ShardedSession(bind=shards.directory) as db:
+        db.info["user_id"] = 1
+        changes = asyncio.run(contact_crud.get_changes(db, since=0, user_id=1))
+    assert [contact.id for contact in changes["upserts"]] == [kept]
+    assert changes["deletions"] == [deleted]
+    with ShardedSession(bind=shards.directory) as db:
+        db.info["user_id"] = 1
+        assert [tag.name for tag in asyncio.run(tag_crud.get_contact_tags(db, kept, user_id=1))] == ["family"]
+        stats = asyncio.run(contact_stats.get_contact_stats(db, user_id=1))
+    assert stats.total == 1 and stats.email_domains == {"example.com": 1}
+    with shards.shards[0].connect() as connection:
+        assert connection.execute(select(models.ContactTag)).all() == []
+        assert connection.execute(select(models.ContactStat)).all() == []
+
+
+def test_move_user_keeps_writes_made_while_copying(shards, monkeypatch):
+    shards.assign(1, 0)
+    first, second = _create(shards, 1, "first@example.com"), _create(shards, 1, "second@example.com")
+    monkeypatch.setattr(rebalance, "BATCH_SIZE", 1)
+    copying = [True]
+
+    def write_while_copying(connection):
+        # The first contact is already on the target when both change on the source.
+        if not copying:
+            return
+        copying.clear()
+        _rename(shards, first, "Copied", shard=0)
+        _rename(shards, second, "Copied", shard=0)
+
+    def write_while_settling(seconds):
+        # A process with a stale directory entry still writes to the old shard.
+        _rename(shards, first, "Stale", shard=0)
+        _rename(shards, second, "Stale", shard=0)
+        _rename(shards, first, "Fresh")
+
+    event.listen(shards.shards[1], "commit", write_while_copying)
+    monkeypatch.setattr(rebalance, "time", SimpleNamespace(sleep=write_while_settling))
+    with ShardedSession(bind=shards.directory) as db:
+        db.info["user_id"] = 1
+        token = asyncio.run(contact_crud.get_changes(db, since=0, user_id=1))["next"]
+
+    assert move_user(1, 1, shards, settle=0) == 2
+    with ShardedSession(bind=shards.directory) as db:
+        db.info["user_id"] = 1
+        names = {contact.id: contact.first_name
+                 for contact in asyncio.run(contact_crud.get_changes(db, since=token, user_id=1))["upserts"]}
+    assert names == {first: "Fresh", second: "Stale"}
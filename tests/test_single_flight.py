@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from src import schemas
+from src.configuration.models import User
+from src.repository import contact_crud
+from src.repository.single_flight import SingleFlight, single_flight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["result"]
+
+    async def main():
+        return await asyncio.gather(*(flight.do(("owner", "search", "ann"), work) for _ in range(5)),
+                                    flight.do(("owner", "search", "bob"), work))
+
+    results = asyncio.run(main())
+    assert results == [["result"]] * 6
+    assert len(calls) == 2 and flight.executions == 2 and flight.shared == 4
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == (42, True)
+    assert flight.executions == 1
+
+
+def test_grace_period_keeps_results_but_not_errors():
+    clock = FakeClock()
+    flight = SingleFlight(grace=5, clock=clock)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def failing():
+        calls.append(1)
+        raise ValueError("boom")
+
+    assert asyncio.run(flight.do("key", work)) == 1
+    clock.now = 4
+    assert asyncio.run(flight.do("key", work)) == 1
+    clock.now = 6
+    assert asyncio.run(flight.do("key", work)) == 2
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do("error", failing))
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do("error", failing))
+    assert len(calls) == 4
+
+
+def test_repository_reads_are_coalesced(session, monkeypatch):
+    monkeypatch.setattr(contact_crud.contact_cache, "ttl", 0)
+    user = User(username="herd", email="herd@example.com", password="x", confirmed=True)
+    session.add(user)
+    session.commit()
+    contact = schemas.ContactCreate(first_name="Herd", last_name="Member", email="herd.member@example.com",
+                                    phone_number="0671234567", birth_date="1990-01-02")
+    asyncio.run(contact_crud.create_contact(session, contact, user_id=user.id))
+    executions = single_flight.executions
+
+    async def main():
+        return await asyncio.gather(*(contact_crud.search_contacts(session, "herd", user_id=user.id)
+                                      for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert all([c.first_name for c in result] == ["Herd"] for result in results)
+    assert single_flight.executions == executions + 1
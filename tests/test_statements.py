@@ -0,0 +1,32 @@
+import asyncio
+
+from src import schemas
+from src.configuration.database import engine_options
+from src.configuration.models import User
+from src.repository import contact_crud
+from src.repository.users import UserService
+
+
+def test_prepared_statements_only_for_psycopg3():
+    assert engine_options("postgresql+psycopg://app@db/contacts", prepare_threshold=1) == \
+           {"connect_args": {"prepare_threshold": 1}}
+    assert engine_options("postgresql+psycopg://app@db/contacts", prepare_threshold=-1) == \
+           {"connect_args": {"prepare_threshold": None}}
+    assert engine_options("postgresql://app@db/contacts") == {}
+    assert engine_options("sqlite:///./app.db") == {}
+
+
+def test_pre_built_lookups_take_new_parameters(session):
+    users = [User(username=f"prebuilt{number}", email=f"prebuilt{number}@example.com", password="x")
+             for number in range(2)]
+    session.add_all(users)
+    session.commit()
+    assert [UserService.get_user_by_email(user.email, session).id for user in users] == [user.id for user in users]
+    assert UserService.get_user_by_email("nobody@example.com", session) is None
+
+    contact = asyncio.run(contact_crud.create_contact(session, schemas.ContactCreate(
+        first_name="Pre", last_name="Built", email="prebuilt@contacts.com", phone_number="0671234567",
+        birth_date="1990-01-02"), user_id=users[0].id))
+    assert contact_crud._find_contact(session, contact.id, users[0].id).id == contact.id
+    assert contact_crud._find_contact(session, contact.id, users[1].id) is None
+    assert contact_crud._find_contact(session, contact.id, None).id == contact.id
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from src import schemas
+from src.configuration.models import User
+from src.repository import contact_crud, tag_crud
+from src.repository.tag_crud import TagExists
+
+
+def _contact(number):
+    return schemas.ContactCreate(first_name=f"Tagged{number}", last_name="Person", phone_number="0671234567",
+                                 email=f"tagged{number}@example.com", birth_date="1990-01-02")
+
+
+@pytest.fixture(scope="module")
+def tagged(session):
+    user = User(username="tagger", email="tagger@example.com", password="x", confirmed=True)
+    session.add(user)
+    session.commit()
+    contacts = [asyncio.run(contact_crud.create_contact(session, _contact(number), user_id=user.id)).id
+                for number in range(4)]
+    tags = {name: asyncio.run(tag_crud.create_tag(session, name, user.id)).id for name in ("a", "b", "c")}
+    for contact_index, names in enumerate(["ab", "abc", "a", "c"]):
+        for name in names:
+            assert asyncio.run(tag_crud.tag_contact(session, contacts[contact_index], tags[name], user.id))
+    return user.id, contacts, tags
+
+
+def _filter(session, user_id, contacts, **tags):
+    result = asyncio.run(contact_crud.get_contacts(session, user_id=user_id, tags=schemas.TagFilter(**tags)))
+    return [contacts.index(contact.id) for contact in result]
+
+
+def test_filter_combines_and_or_not(session, tagged):
+    user_id, contacts, _ = tagged
+    assert _filter(session, user_id, contacts, all=["a", "b"]) == [0, 1]
+    assert _filter(session, user_id, contacts, all=["a", "b"], none=["c"]) == [0]
+    assert _filter(session, user_id, contacts, any=["b", "c"]) == [0, 1, 3]
+    assert _filter(session, user_id, contacts, none=["a"]) == [3]
+    assert _filter(session, user_id, contacts, all=["a", "unknown"]) == []
+
+
+def test_tag_changes_are_seen_by_cached_lists(session, tagged):
+    user_id, contacts, tags = tagged
+    assert _filter(session, user_id, contacts, all=["a", "c"]) == [1]
+    asyncio.run(tag_crud.untag_contact(session, contacts[1], tags["c"], user_id))
+    assert _filter(session, user_id, contacts, all=["a", "c"]) == []
+    with pytest.raises(TagExists):
+        asyncio.run(tag_crud.create_tag(session, "a", user_id))
+    asyncio.run(tag_crud.rename_tag(session, tags["c"], "d", user_id))
+    assert _filter(session, user_id, contacts, all=["d"]) == [3]
+
+
+def test_merge_and_delete_carry_tags(session, tagged):
+    user_id, contacts, tags = tagged
+    asyncio.run(contact_crud.merge_contacts(session, contacts[2], [contacts[3]], user_id=user_id))
+    assert [tag.name for tag in asyncio.run(tag_crud.get_contact_tags(session, contacts[2], user_id))] == ["a", "d"]
+    asyncio.run(tag_crud.delete_tag(session, tags["a"], user_id))
+    assert [tag.name for tag in asyncio.run(tag_crud.get_tags(session, user_id))] == ["b", "d"]
+    assert _filter(session, user_id, contacts, any=["b", "d"]) == [0, 1, 2]
+
+
+def test_tag_routes(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    contact = client.post("/api/contacts/", headers=headers, json={**_contact(10).model_dump(mode="json")}).json()
+    tag = client.post("/api/tags/", headers=headers, json={"name": "family"})
+    assert tag.status_code == 201
+    assert client.post("/api/tags/", headers=headers, json={"name": "family"}).status_code == 409
+    tag_id = tag.json()["id"]
+    assert client.put(f"/api/contacts/{contact['id']}/tags/{tag_id}", headers=headers).status_code == 204
+    assert client.put(f"/api/contacts/{contact['id']}/tags/{tag_id}", headers=headers).status_code == 204
+    assert client.get(f"/api/contacts/{contact['id']}/tags/", headers=headers).json() == [tag.json()]
+    assert client.put(f"/api/contacts/{contact['id']}/tags/999999", headers=headers).status_code == 404
@@ -0,0 +1,61 @@
+import pytest
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind
+from sqlalchemy import text
+
+from src.configuration import database
+from src.jobs import queue
+from src.services.tracing import configure, extract, inject, make_provider, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+TRACEPARENT = f"00-{TRACE_ID}-{PARENT_ID}-01"
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    configure(SimpleSpanProcessor(exporter), sample_rate=1.0)
+    yield exporter
+    exporter.shutdown()
+
+
+def test_sampling_follows_parent_and_rate():
+    exporter = InMemorySpanExporter()
+    never = make_provider(sample_rate=0.0)
+    never.add_span_processor(SimpleSpanProcessor(exporter))
+    local = never.get_tracer("test")
+    with local.start_as_current_span("root"):
+        with local.start_as_current_span("child"):
+            pass
+    with local.start_as_current_span("remote", context=extract({"traceparent": TRACEPARENT})):
+        pass
+    assert [span.name for span in exporter.get_finished_spans()] == ["remote"]
+
+
+def test_request_spans_continue_incoming_trace(client, token, exporter):
+    response = client.get("/api/contacts/", headers={"Authorization": f"Bearer {token}", "traceparent": TRACEPARENT})
+    assert response.status_code == 200
+    assert response.headers["traceresponse"].startswith(f"00-{TRACE_ID}-")
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert {f"{span.context.trace_id:032x}" for span in spans.values()} == {TRACE_ID}
+    server = next(finished for finished in spans.values() if finished.kind == SpanKind.SERVER)
+    assert f"{server.parent.span_id:016x}" == PARENT_ID
+    assert server.attributes["http.status_code"] == 200
+    assert spans["auth.decode_token"].parent.span_id == server.context.span_id
+    assert spans["auth.lookup_user"].parent.span_id == server.context.span_id
+
+
+def test_statements_and_jobs_are_traced(session, exporter):
+    with tracer.start_as_current_span("enqueue") as span:
+        job = queue.enqueue(session, "traced", {"n": 1})
+        with database.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    assert job.payload["traceparent"].split("-")[1] == f"{span.get_span_context().trace_id:032x}"
+    assert inject({}) == {}
+
+    statement = next(finished for finished in exporter.get_finished_spans() if finished.kind == SpanKind.CLIENT)
+    assert statement.attributes["db.system"] == "sqlite"
+    assert statement.parent.span_id == span.get_span_context().span_id